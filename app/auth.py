@@ -1,10 +1,184 @@
+import argparse
+import getpass
+import hashlib
+import hmac
+import os
+import secrets
 import sqlite3
+import threading
+import time
 
-def check_user(login,password):
-    conn = sqlite3.connect("data/users.db")
-    cur = conn.cursor()
+from app.db import get_data_dir
 
-    cur.execute("SELECT * FROM users WHERE login=? AND password=?",
-                (login,password))
+HASH_SCHEME = "pbkdf2_sha256"
+PBKDF2_ITERATIONS = 200_000
+SALT_BYTES = 16
+SESSION_TTL_S = 15 * 60
 
-    return cur.fetchone() is not None
+_conn = None
+_conn_path = None
+_conn_lock = threading.Lock()
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_users_db_path():
+    return os.path.join(get_data_dir(), "users.db")
+
+
+def _get_connection(db_path=None):
+    global _conn, _conn_path
+    if db_path is None:
+        db_path = get_users_db_path()
+    if _conn is None or _conn_path != db_path:
+        if _conn is not None:
+            _conn.close()
+        _conn = sqlite3.connect(db_path, check_same_thread=False)
+        _conn.execute("CREATE TABLE IF NOT EXISTS users(login TEXT UNIQUE, password TEXT)")
+        _conn.commit()
+        _conn_path = db_path
+    return _conn
+
+
+def close_connection():
+    global _conn, _conn_path
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = None
+        _conn_path = None
+
+
+def hash_password(password, iterations=None, salt=None):
+    if iterations is None:
+        iterations = PBKDF2_ITERATIONS
+    if salt is None:
+        salt = secrets.token_bytes(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def _parse_hash(stored):
+    parts = stored.split("$")
+    if len(parts) != 4 or parts[0] != HASH_SCHEME:
+        return None
+    try:
+        return int(parts[1]), bytes.fromhex(parts[2]), bytes.fromhex(parts[3])
+    except ValueError:
+        return None
+
+
+def verify_password(password, stored):
+    parsed = _parse_hash(stored)
+    if parsed is None:
+        # Legacy rows keep the password in plain text until the next successful login.
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    iterations, salt, expected = parsed
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return hmac.compare_digest(digest, expected)
+
+
+def _needs_rehash(stored, iterations):
+    parsed = _parse_hash(stored)
+    return parsed is None or parsed[0] != iterations
+
+
+def set_password(login, password, db_path=None, iterations=None):
+    stored = hash_password(password, iterations)
+    with _conn_lock:
+        conn = _get_connection(db_path)
+        cur = conn.cursor()
+        cur.execute("UPDATE users SET password=? WHERE login=?", (stored, login))
+        if cur.rowcount == 0:
+            cur.execute("INSERT INTO users(login, password) VALUES(?, ?)", (login, stored))
+        conn.commit()
+
+
+def check_user(login, password, db_path=None, iterations=None):
+    # The cost is read at call time, so raising it rehashes on the next login.
+    if iterations is None:
+        iterations = PBKDF2_ITERATIONS
+    with _conn_lock:
+        conn = _get_connection(db_path)
+        row = conn.execute("SELECT password FROM users WHERE login=?", (login,)).fetchone()
+    if row is None or row[0] is None:
+        # Spend the same hashing cost so unknown logins are not distinguishable by timing.
+        hash_password(password, iterations)
+        return False
+    stored = str(row[0])
+    if not verify_password(password, stored):
+        return False
+    if _needs_rehash(stored, iterations):
+        set_password(login, password, db_path, iterations)
+    return True
+
+
+def login(login_name, password, db_path=None):
+    if not check_user(login_name, password, db_path):
+        return None
+    token = secrets.token_urlsafe(32)
+    with _sessions_lock:
+        _sessions[token] = (login_name, time.monotonic() + SESSION_TTL_S)
+    return token
+
+
+def check_session(token):
+    now = time.monotonic()
+    with _sessions_lock:
+        session = _sessions.get(token)
+        if session is None:
+            return None
+        login_name, expires_at = session
+        if expires_at <= now:
+            del _sessions[token]
+            return None
+    return login_name
+
+
+def logout(token):
+    with _sessions_lock:
+        _sessions.pop(token, None)
+
+
+def _benchmark(rounds=20, verifies=100_000):
+    import tempfile
+
+    db_path = os.path.join(tempfile.mkdtemp(), "users_bench.db")
+    set_password("operator", "secret", db_path)
+
+    started = time.perf_counter()
+    token = None
+    for _ in range(rounds):
+        token = login("operator", "secret", db_path)
+    login_ms = (time.perf_counter() - started) * 1000 / rounds
+
+    started = time.perf_counter()
+    for _ in range(verifies):
+        check_session(token)
+    verify_per_s = verifies / (time.perf_counter() - started)
+    close_connection()
+    return {
+        "iterations": PBKDF2_ITERATIONS,
+        "login_ms": round(login_ms, 2),
+        "session_verify_per_s": int(verify_per_s),
+    }
+
+
+if __name__ == "__main__":
+    # Users who may clear history are added here; without an argument this
+    # benchmarks login and session checks.
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "command", nargs="?", choices=("benchmark", "set-password"), default="benchmark"
+    )
+    parser.add_argument("login", nargs="?")
+    args = parser.parse_args()
+
+    if args.command == "set-password":
+        if not args.login:
+            parser.error("set-password needs a login")
+        set_password(args.login, getpass.getpass("Password: "))
+        close_connection()
+    else:
+        for key, value in _benchmark().items():
+            print(f"{key}: {value}")
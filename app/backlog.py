@@ -0,0 +1,185 @@
+import argparse
+import csv
+import os
+import random
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from app.calculator_logic import RANGE_ROLL_LENGTH, RANGE_ROLL_WIDTH
+from app.db import get_data_dir
+
+BACKLOG_FILENAME = "backlog.csv"
+BACKLOG_HEADER = ["order_id", "roll_width", "roll_length", "order_rolls"]
+WIDTH_TOLERANCE_MM = 1e-6
+
+
+def get_backlog_path():
+    return os.path.join(get_data_dir(), BACKLOG_FILENAME)
+
+
+def _length_key(roll_length_m):
+    return round(float(roll_length_m), 1)
+
+
+class BacklogIndex:
+    def __init__(self, orders=()):
+        # Keys sort by (length, width, seq): one bisect finds the widest order
+        # of the strip's length that still fits inside the strip.
+        self._keys = []
+        self._orders = {}
+        self._key_by_id = {}
+        self._seq = 0
+        for order in orders:
+            self._store(order)
+        self._keys = sorted(self._key_by_id.values())
+
+    def __len__(self):
+        return len(self._orders)
+
+    def _store(self, order):
+        self._seq += 1
+        key = (
+            _length_key(order["roll_length"]),
+            float(order["roll_width"]),
+            self._seq,
+            order["order_id"],
+        )
+        self._orders[order["order_id"]] = dict(order)
+        self._key_by_id[order["order_id"]] = key
+        return key
+
+    def orders(self):
+        return list(self._orders.values())
+
+    def add(self, order):
+        if order["order_id"] in self._orders:
+            self.remove(order["order_id"])
+        insort(self._keys, self._store(order))
+
+    def remove(self, order_id):
+        key = self._key_by_id.pop(order_id, None)
+        if key is None:
+            return None
+        index = bisect_left(self._keys, key)
+        del self._keys[index]
+        return self._orders.pop(order_id)
+
+    def best_fit(self, strip_width_mm, roll_length_m):
+        length = _length_key(roll_length_m)
+        index = bisect_right(self._keys, (length, strip_width_mm + WIDTH_TOLERANCE_MM)) - 1
+        if index < 0:
+            return None
+        key_length, width, _, order_id = self._keys[index]
+        if key_length != length or width < RANGE_ROLL_WIDTH[0]:
+            return None
+        return self._orders[order_id]
+
+    def consume(self, order_id, rolls):
+        order = self._orders.get(order_id)
+        if order is None:
+            return
+        remaining = order["order_rolls"] - rolls
+        if remaining <= 0:
+            self.remove(order_id)
+        else:
+            order["order_rolls"] = remaining
+
+
+def load_backlog(path=None):
+    if path is None:
+        path = get_backlog_path()
+    if not os.path.exists(path):
+        return BacklogIndex()
+    orders = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            orders.append(
+                {
+                    "order_id": row["order_id"],
+                    "roll_width": float(row["roll_width"]),
+                    "roll_length": float(row["roll_length"]),
+                    "order_rolls": int(row["order_rolls"]),
+                }
+            )
+    return BacklogIndex(orders)
+
+
+def save_backlog(index, path=None):
+    if path is None:
+        path = get_backlog_path()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=BACKLOG_HEADER)
+        writer.writeheader()
+        writer.writerows(index.orders())
+    os.replace(tmp_path, path)
+
+
+def match_strip(result, index):
+    # The leftover strip goes to an open order when one fits; stock gets the rest.
+    strip_width = result["additional_width_mm"]
+    strip_rolls = result["total_additional_rolls"]
+    matched = dict(result, backlog_match=None)
+    if not strip_width or not strip_rolls:
+        return matched
+    order = index.best_fit(strip_width, result["roll_length_m"])
+    if order is None:
+        return matched
+    rolls = min(strip_rolls, order["order_rolls"])
+    trim_mm = strip_width - order["roll_width"]
+    matched["backlog_match"] = {
+        "order_id": order["order_id"],
+        "roll_width_mm": order["roll_width"],
+        "rolls": rolls,
+        "trim_mm": trim_mm,
+    }
+    matched["surplus_additional_rolls"] = strip_rolls - rolls
+    matched["surplus_rolls"] = result["surplus_main_rolls"] + strip_rolls - rolls
+    # calculate() counts the whole strip as useful; the trim beside each
+    # matched roll is cut off and scrapped.
+    trim_area_m2 = trim_mm / 1000 * result["roll_length_m"] * rolls
+    waste_area_m2 = result["waste_area_m2"] + trim_area_m2
+    total_area_m2 = result["total_area_m2"]
+    matched["useful_area_m2"] = round(result["useful_area_m2"] - trim_area_m2, 1)
+    matched["waste_area_m2"] = round(waste_area_m2, 1)
+    matched["waste_percent"] = (
+        round(waste_area_m2 / total_area_m2 * 100, 1) if total_area_m2 > 0 else 0
+    )
+    return matched
+
+
+def _benchmark(count=100_000, queries=100_000, seed=0):
+    rng = random.Random(seed)
+    lengths = [float(value) for value in range(RANGE_ROLL_LENGTH[0], 1001, 10)]
+    orders = [
+        {
+            "order_id": f"B{number}",
+            "roll_width": round(rng.uniform(*RANGE_ROLL_WIDTH), 1),
+            "roll_length": rng.choice(lengths),
+            "order_rolls": rng.randint(1, 500),
+        }
+        for number in range(count)
+    ]
+    started = time.perf_counter()
+    index = BacklogIndex(orders)
+    build_s = time.perf_counter() - started
+
+    probes = [
+        (rng.uniform(*RANGE_ROLL_WIDTH), rng.choice(lengths)) for _ in range(queries)
+    ]
+    started = time.perf_counter()
+    hits = sum(1 for width, length in probes if index.best_fit(width, length) is not None)
+    query_s = time.perf_counter() - started
+    print(f"{count} orders: build {build_s * 1000:.0f} ms")
+    print(
+        f"{queries} queries: {query_s / queries * 1e6:.2f} us/query, "
+        f"{hits} matched"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=100_000)
+    args = parser.parse_args()
+    _benchmark(args.count, args.queries)
@@ -0,0 +1,159 @@
+import argparse
+import os
+import random
+import sys
+import time
+import types
+from concurrent import futures
+
+from app import calculator_logic, layout_table, rate_tables
+
+CHUNK_SIZE = 2000
+MODES = ("serial", "threads", "interpreters", "processes")
+AUDITED_MODULES = (calculator_logic, layout_table, rate_tables)
+
+
+def free_threaded():
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def default_mode():
+    # Threads only scale without the GIL; subinterpreters share nothing but
+    # avoid spawning processes; processes are the portable fallback.
+    if free_threaded():
+        return "threads"
+    if hasattr(futures, "InterpreterPoolExecutor"):
+        return "interpreters"
+    return "processes"
+
+
+def _calculate_chunk(jobs):
+    # Results travel back as plain tuples; dict pickling dominates otherwise.
+    keys = None
+    rows = []
+    for args in jobs:
+        try:
+            result = calculator_logic.calculate(*args)
+        except ValueError as exc:
+            rows.append((None, str(exc)))
+            continue
+        if keys is None:
+            keys = tuple(result)
+        rows.append((tuple(result.values()), None))
+    return keys, rows
+
+
+def _unpack_chunk(chunk):
+    keys, rows = chunk
+    return [
+        {"error": error} if values is None else dict(zip(keys, values))
+        for values, error in rows
+    ]
+
+
+def _executor(mode, workers):
+    if mode == "threads":
+        return futures.ThreadPoolExecutor(workers)
+    if mode == "interpreters":
+        return futures.InterpreterPoolExecutor(workers)
+    return futures.ProcessPoolExecutor(workers)
+
+
+def calculate_batch(jobs, workers=None, mode=None, chunk_size=CHUNK_SIZE):
+    if mode is None:
+        mode = default_mode()
+    if mode not in MODES:
+        raise ValueError(f"Unknown batch mode: {mode}")
+    jobs = [tuple(args) for args in jobs]
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    if mode == "serial" or workers == 1 or len(chunks) <= 1:
+        return [result for chunk in chunks for result in _unpack_chunk(_calculate_chunk(chunk))]
+
+    results = []
+    with _executor(mode, workers) as pool:
+        for chunk in pool.map(_calculate_chunk, chunks):
+            results.extend(_unpack_chunk(chunk))
+    return results
+
+
+def _module_state():
+    state = {}
+    for module in AUDITED_MODULES:
+        for name, value in vars(module).items():
+            if name.startswith("__") or isinstance(
+                value, (types.ModuleType, types.FunctionType, type)
+            ):
+                continue
+            state[f"{module.__name__}.{name}"] = repr(value)
+    return state
+
+
+def audit_shared_state(jobs, workers=4):
+    # Anything calculate rebinds or mutates at module level would race between threads.
+    calculate_batch(jobs[:1], mode="serial")
+    before = _module_state()
+    calculate_batch(jobs, workers, mode="threads")
+    after = _module_state()
+    return sorted(name for name in before.keys() | after.keys() if before.get(name) != after.get(name))
+
+
+def sample_jobs(count, seed=0):
+    from app.differential import generate_case
+
+    rng = random.Random(seed)
+    return [generate_case(rng, invalid_ratio=0.0) for _ in range(count)]
+
+
+def benchmark(count=200_000, max_workers=None, modes=None, seed=0):
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if modes is None:
+        modes = [default_mode()]
+    jobs = sample_jobs(count, seed)
+    calculate_batch(jobs[:1], mode="serial")
+
+    started = time.perf_counter()
+    expected = calculate_batch(jobs, mode="serial")
+    serial_s = time.perf_counter() - started
+    report = {"serial_s": serial_s, "modes": {}}
+
+    for mode in modes:
+        timings = []
+        for workers in range(1, max_workers + 1):
+            started = time.perf_counter()
+            results = calculate_batch(jobs, workers, mode)
+            elapsed = time.perf_counter() - started
+            timings.append(
+                {
+                    "workers": workers,
+                    "seconds": elapsed,
+                    "speedup": serial_s / elapsed if elapsed else None,
+                    "identical": results == expected,
+                }
+            )
+        report["modes"][mode] = timings
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--max-workers", type=int, default=None)
+    parser.add_argument("--mode", action="append", choices=MODES[1:])
+    parser.add_argument("--audit", action="store_true")
+    args = parser.parse_args()
+
+    print(f"python {sys.version.split()[0]}, free-threaded: {free_threaded()}")
+    if args.audit:
+        changed = audit_shared_state(sample_jobs(min(args.count, 20_000)))
+        print(f"shared state changed by calculate: {', '.join(changed) or 'none'}")
+
+    report = benchmark(args.count, args.max_workers, args.mode)
+    print(f"serial: {report['serial_s']:.2f} s")
+    for mode, timings in report["modes"].items():
+        for timing in timings:
+            print(
+                f"{mode} x{timing['workers']}: {timing['seconds']:.2f} s, "
+                f"speedup {timing['speedup']:.2f}, identical: {timing['identical']}"
+            )
@@ -1,5 +1,13 @@
+import hashlib
 import math
 
+from app.layout_table import get_layout_table
+from app.rate_tables import get_rate_table, get_rate_tables
+
+# Bump when the calculation changes outside this module's code; the constants,
+# rate tables and the code of calculate and its helpers are hashed directly.
+RULES_VERSION = 1
+
 MAX_BIG_ROLL_LENGTH_M = 22000
 
 RANGE_MATERIAL_WIDTH = (550, 910)
@@ -9,22 +17,36 @@ MAX_ROLL_WIDTH_REDUCTION = 0.03
 SETUP_LENGTH_M = 10
 
 
-def _cycles_per_hour_by_width(roll_width_mm):
-    if 25 <= roll_width_mm < 45:
-        return 11
-    if 45 <= roll_width_mm <= 150:
-        return 12
-    return None
+def rules_signature():
+    tables = get_rate_tables()
+    rates = [
+        (name, table.width.keys, table.width.rates, table.length.keys, table.length.rates)
+        for name, table in sorted(tables.items())
+    ]
+    parts = (
+        RULES_VERSION,
+        MAX_BIG_ROLL_LENGTH_M,
+        RANGE_MATERIAL_WIDTH,
+        RANGE_ROLL_WIDTH,
+        RANGE_ROLL_LENGTH,
+        MAX_ROLL_WIDTH_REDUCTION,
+        SETUP_LENGTH_M,
+        rates,
+        layout_rules_digest(),
+        [
+            (code.co_code, code.co_consts, code.co_names)
+            for code in (calculate.__code__, _validate_inputs.__code__, _layout_step.__code__)
+        ],
+    )
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
 
+def _cycles_per_hour_by_width(roll_width_mm, machine=None):
+    return get_rate_table(machine).width.lookup(roll_width_mm)
 
-def _cycles_per_hour_by_length(roll_length_m):
-    if roll_length_m <= 300:
-        return 12
-    if roll_length_m <= 450:
-        return 11
-    if roll_length_m <= 600:
-        return 10
-    return 8
+
+def _cycles_per_hour_by_length(roll_length_m, machine=None):
+    return get_rate_table(machine).length.lookup(roll_length_m)
 
 
 def _apply_roll_width_adjustment(useful_width_mm, roll_width_mm):
@@ -56,6 +78,50 @@ def _apply_roll_width_adjustment(useful_width_mm, roll_width_mm):
     return roll_width_mm, main_count, remaining_width, False
 
 
+def layout_rules_digest():
+    # The layout table is only valid for the code and constants it was built
+    # from; line numbers are left out so moving the function costs nothing.
+    code = _apply_roll_width_adjustment.__code__
+    parts = (
+        code.co_code,
+        code.co_consts,
+        code.co_names,
+        RANGE_MATERIAL_WIDTH,
+        RANGE_ROLL_WIDTH,
+        MAX_ROLL_WIDTH_REDUCTION,
+    )
+    return hashlib.sha1(repr(parts).encode("utf-8")).digest()
+
+
+def _layout_from_table(useful_width_mm, roll_width_mm):
+    # get_layout_table only hands out a table built from the rules at load
+    # time; a replan may override the constants afterwards.
+    table = get_layout_table()
+    if table is None or not table.covers(
+        RANGE_MATERIAL_WIDTH[1], RANGE_ROLL_WIDTH, MAX_ROLL_WIDTH_REDUCTION
+    ):
+        return None
+    entry = table.lookup(useful_width_mm, roll_width_mm)
+    if entry is None:
+        return None
+    main_count, was_adjusted, adjusted_tenths = entry
+    if not was_adjusted:
+        remaining_width = useful_width_mm - main_count * roll_width_mm
+        return roll_width_mm, main_count, remaining_width, False
+    adjusted_width = adjusted_tenths / 10
+    adjusted_remaining = useful_width_mm - main_count * adjusted_width
+    if abs(adjusted_remaining) < 1e-6:
+        adjusted_remaining = 0
+    return adjusted_width, main_count, adjusted_remaining, True
+
+
+def _layout_step(useful_width_mm, roll_width_mm):
+    layout = _layout_from_table(useful_width_mm, roll_width_mm)
+    if layout is None:
+        layout = _apply_roll_width_adjustment(useful_width_mm, roll_width_mm)
+    return layout
+
+
 def _validate_inputs(
     material_width_mm,
     useful_width_mm,
@@ -85,6 +151,7 @@ def calculate(
     big_roll_length_m,
     order_rolls,
     additional_width_mm=None,
+    machine=None,
 ):
     _validate_inputs(
         material_width_mm,
@@ -114,7 +181,7 @@ def calculate(
 
     if additional_width_override is None:
         roll_width_mm, main_count, remaining_width, was_adjusted = (
-            _apply_roll_width_adjustment(useful_width_mm, roll_width_mm)
+            _layout_step(useful_width_mm, roll_width_mm)
         )
     else:
         main_count = int(useful_width_mm // roll_width_mm)
@@ -146,12 +213,7 @@ def calculate(
     cycles_needed = int(math.ceil(order_rolls / main_count))
     cycles_used = min(cycles_needed, length_count)
 
-    width_rate = _cycles_per_hour_by_width(roll_width_mm)
-    length_rate = _cycles_per_hour_by_length(roll_length_m)
-    if width_rate is None:
-        cycles_per_hour = length_rate
-    else:
-        cycles_per_hour = min(width_rate, length_rate)
+    cycles_per_hour = get_rate_table(machine).cycles_per_hour(roll_width_mm, roll_length_m)
     estimated_hours = cycles_needed / cycles_per_hour if cycles_per_hour else None
 
     total_main_rolls = main_count * cycles_used
@@ -209,4 +271,216 @@ def calculate(
         "waste_area_m2": round(waste_area_m2, 1),
         "waste_percent": round(waste_percent, 1),
         "waste_per_side_mm": waste_per_side_mm,
+        "machine": machine,
+    }
+
+
+SENSITIVITY_USEFUL_STEPS_MM = (-10, -5, -2, 0, 2, 5, 10)
+SENSITIVITY_ROLL_STEPS_MM = (-5, -2, -1, 0, 1, 2, 5)
+SENSITIVITY_KEYS = ("waste_percent", "total_rolls", "shortage_rolls", "estimated_hours")
+DISCONTINUITY_SEARCH_MM = 50
+DISCONTINUITY_SEARCH_M = 200
+
+
+def _nearest_change(value, step, limit, probe):
+    # Gallop out until the probe differs, then bisect back to the grid point
+    # where it changes: about 2 * log2(limit / step) probes per direction
+    # instead of one per step. The nearest change is found whenever the probe
+    # is monotone in the value, as the roll count and the rate bands are.
+    base = probe(value)
+    max_n = int(round(limit / step))
+    found = {}
+    for direction, key in ((1, "up"), (-1, "down")):
+        found[key] = None
+
+        def at(n, direction=direction):
+            return round(value + direction * n * step, 1)
+
+        low, high, n = 0, None, 1
+        while n <= max_n:
+            if probe(at(n)) != base:
+                high = n
+                break
+            low = n
+            n = max_n if n < max_n < 2 * n else 2 * n
+        if high is None:
+            continue
+        while high - low > 1:
+            middle = (low + high) // 2
+            if probe(at(middle)) == base:
+                low = middle
+            else:
+                high = middle
+        current = probe(at(high))
+        # Running off the valid range is not a change worth reporting.
+        if current is not None:
+            found[key] = (at(high), base, current)
+    return found
+
+
+def _layout_probe(useful_width_mm, roll_width_mm, additional_width_mm=None):
+    if useful_width_mm <= 0 or not (
+        RANGE_ROLL_WIDTH[0] <= roll_width_mm <= RANGE_ROLL_WIDTH[1]
+    ):
+        return None
+    if additional_width_mm is not None and additional_width_mm > 0:
+        # Same as calculate: an explicit strip width turns the adjustment off.
+        main_count = int(useful_width_mm // roll_width_mm)
+        remaining_width = useful_width_mm - main_count * roll_width_mm
+        if additional_width_mm - remaining_width > 1e-6:
+            return None
+        return main_count, False
+    _, main_count, _, was_adjusted = _layout_step(useful_width_mm, roll_width_mm)
+    return main_count, was_adjusted
+
+
+def _layout_discontinuities(parameter, base_value, changes):
+    items = []
+    for change in changes.values():
+        if change is None:
+            continue
+        value, (old_count, old_adjusted), (new_count, new_adjusted) = change
+        kind = "adjustment" if old_adjusted != new_adjusted else "count_jump"
+        items.append(
+            {
+                "kind": kind,
+                "parameter": parameter,
+                "value": value,
+                "delta": round(value - base_value, 1),
+                "main_count": new_count,
+            }
+        )
+    return items
+
+
+def _rate_discontinuities(parameter, base_value, changes):
+    items = []
+    for change in changes.values():
+        if change is None:
+            continue
+        value, _, new_rate = change
+        items.append(
+            {
+                "kind": "cycles_band",
+                "parameter": parameter,
+                "value": value,
+                "delta": round(value - base_value, 1),
+                "cycles_per_hour": new_rate,
+            }
+        )
+    return items
+
+
+def _find_discontinuities(
+    useful_width_mm, roll_width_mm, roll_length_m, machine=None, additional_width_mm=None
+):
+    rate_table = get_rate_table(machine)
+    items = []
+    items += _layout_discontinuities(
+        "useful_width_mm",
+        useful_width_mm,
+        _nearest_change(
+            useful_width_mm,
+            0.1,
+            DISCONTINUITY_SEARCH_MM,
+            lambda value: _layout_probe(value, roll_width_mm, additional_width_mm),
+        ),
+    )
+    items += _layout_discontinuities(
+        "roll_width_mm",
+        roll_width_mm,
+        _nearest_change(
+            roll_width_mm,
+            0.1,
+            DISCONTINUITY_SEARCH_MM,
+            lambda value: _layout_probe(useful_width_mm, value, additional_width_mm),
+        ),
+    )
+    items += _rate_discontinuities(
+        "roll_width_mm",
+        roll_width_mm,
+        _nearest_change(
+            roll_width_mm,
+            0.1,
+            DISCONTINUITY_SEARCH_MM,
+            lambda value: rate_table.cycles_per_hour(value, roll_length_m),
+        ),
+    )
+    items += _rate_discontinuities(
+        "roll_length_m",
+        roll_length_m,
+        _nearest_change(
+            roll_length_m,
+            0.1,
+            DISCONTINUITY_SEARCH_M,
+            lambda value: rate_table.cycles_per_hour(roll_width_mm, value),
+        ),
+    )
+    items.sort(key=lambda item: abs(item["delta"]))
+    return items
+
+
+def _delta(new_value, base_value):
+    if new_value is None or base_value is None:
+        return None
+    return round(new_value - base_value, 3)
+
+
+def sensitivity(
+    material_width_mm,
+    useful_width_mm,
+    roll_width_mm,
+    roll_length_m,
+    big_roll_length_m,
+    order_rolls,
+    additional_width_mm=None,
+    machine=None,
+    useful_steps_mm=SENSITIVITY_USEFUL_STEPS_MM,
+    roll_steps_mm=SENSITIVITY_ROLL_STEPS_MM,
+):
+    base = calculate(
+        material_width_mm,
+        useful_width_mm,
+        roll_width_mm,
+        roll_length_m,
+        big_roll_length_m,
+        order_rolls,
+        additional_width_mm,
+        machine,
+    )
+
+    grid = []
+    for useful_step in useful_steps_mm:
+        for roll_step in roll_steps_mm:
+            cell = {
+                "useful_delta_mm": useful_step,
+                "roll_delta_mm": roll_step,
+                "valid": True,
+            }
+            try:
+                result = calculate(
+                    material_width_mm,
+                    useful_width_mm + useful_step,
+                    roll_width_mm + roll_step,
+                    roll_length_m,
+                    big_roll_length_m,
+                    order_rolls,
+                    additional_width_mm,
+                    machine,
+                )
+            except ValueError:
+                cell["valid"] = False
+                grid.append(cell)
+                continue
+            for key in SENSITIVITY_KEYS:
+                cell[key] = result[key]
+                cell[f"{key}_delta"] = _delta(result[key], base[key])
+            grid.append(cell)
+
+    return {
+        "base": base,
+        "grid": grid,
+        "discontinuities": _find_discontinuities(
+            useful_width_mm, roll_width_mm, roll_length_m, machine, additional_width_mm
+        ),
     }
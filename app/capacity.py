@@ -0,0 +1,199 @@
+import argparse
+import csv
+import json
+import math
+import time
+
+from app.calculator_logic import SETUP_LENGTH_M, calculate
+
+SPLIT_MIN_CYCLES = 20
+SPLIT_TOLERANCE_H = 1e-6
+
+
+def load_order_book(path):
+    orders = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            orders.append(
+                {
+                    "order_id": row["order_id"],
+                    "roll_width": float(row["roll_width"]),
+                    "roll_length": float(row["roll_length"]),
+                    "order_rolls": int(row["order_rolls"]),
+                }
+            )
+    return orders
+
+
+def load_machines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        machines = json.load(f)
+    if not isinstance(machines, list):
+        raise ValueError("Machines file must contain a list.")
+    return machines
+
+
+def _machine_rate(machine, order):
+    # Cycles per hour and rolls per cycle of one order on one machine's jumbo.
+    try:
+        result = calculate(
+            machine["material_width"],
+            machine["useful_width"],
+            order["roll_width"],
+            order["roll_length"],
+            machine["big_roll_length"],
+            order["order_rolls"],
+            None,
+            machine.get("machine"),
+        )
+    except ValueError:
+        return None
+    if not result["cycles_per_hour"]:
+        return None
+    return result["cycles_per_hour"], result["main_count"]
+
+
+def _water_fill(rolls, options, loads, caps=None):
+    # Smallest finish time T such that cycles run before T cover the order,
+    # with no machine running more cycles than its jumbo holds.
+    def allocation(finish):
+        cycles = {}
+        for name, (cycles_per_hour, _) in options.items():
+            cycles[name] = max(0, math.floor((finish - loads[name]) * cycles_per_hour))
+            if caps is not None:
+                cycles[name] = min(cycles[name], caps[name])
+        return cycles
+
+    def covered(cycles):
+        return sum(cycles[name] * options[name][1] for name in cycles)
+
+    if caps is not None and covered(caps) < rolls:
+        # Not enough stock anywhere: run every jumbo out, the rest is short.
+        return {name: count for name, count in caps.items() if count > 0}
+    low = min(loads[name] for name in options)
+    if caps is None:
+        high = max(
+            loads[name] + math.ceil(rolls / options[name][1]) / options[name][0]
+            for name in options
+        )
+    else:
+        high = max(loads[name] + caps[name] / options[name][0] for name in options)
+    while high - low > SPLIT_TOLERANCE_H:
+        middle = (low + high) / 2
+        if covered(allocation(middle)) >= rolls:
+            high = middle
+        else:
+            low = middle
+    cycles = allocation(high)
+
+    # Each machine may overshoot by one cycle; trim from the latest finisher.
+    while True:
+        trimmable = [
+            name
+            for name, count in cycles.items()
+            if count > 0 and covered(cycles) - options[name][1] >= rolls
+        ]
+        if not trimmable:
+            break
+        latest = max(
+            trimmable, key=lambda name: loads[name] + cycles[name] / options[name][0]
+        )
+        cycles[latest] -= 1
+    return {name: count for name, count in cycles.items() if count > 0}
+
+
+def plan_capacity(orders, machines, split_min_cycles=SPLIT_MIN_CYCLES):
+    # Each machine cuts from the one jumbo stocked on it, and nothing is
+    # replenished during the plan: cycles are capped by the length left on
+    # that jumbo, and rolls beyond every cap are reported as shortage.
+    names = [machine["name"] for machine in machines]
+    loads = {name: 0.0 for name in names}
+    stock_m = {machine["name"]: machine["big_roll_length"] - SETUP_LENGTH_M for machine in machines}
+    timelines = {name: [] for name in names}
+    unassigned = []
+    shortages = {}
+
+    jobs = []
+    for order in orders:
+        options = {}
+        for machine in machines:
+            rate = _machine_rate(machine, order)
+            if rate is not None:
+                options[machine["name"]] = rate
+        if not options:
+            unassigned.append(order["order_id"])
+            continue
+        best_hours = min(
+            math.ceil(order["order_rolls"] / rolls_per_cycle) / cycles_per_hour
+            for cycles_per_hour, rolls_per_cycle in options.values()
+        )
+        jobs.append((best_hours, order, options))
+
+    # Longest processing time first keeps the greedy makespan close to optimal.
+    jobs.sort(key=lambda job: job[0], reverse=True)
+    for best_hours, order, options in jobs:
+        rolls = order["order_rolls"]
+        caps = {name: int(stock_m[name] // order["roll_length"]) for name in options}
+        options = {name: rate for name, rate in options.items() if caps[name] > 0}
+        if not options:
+            shortages[order["order_id"]] = rolls
+            continue
+        single = {
+            name: math.ceil(rolls / rolls_per_cycle)
+            for name, (_, rolls_per_cycle) in options.items()
+        }
+        fits = [name for name in options if single[name] <= caps[name]]
+        best_cycles = min(single.values())
+        if not fits or (best_cycles >= split_min_cycles and len(options) > 1):
+            allocation = _water_fill(rolls, options, loads, caps)
+        else:
+            name = min(fits, key=lambda name: loads[name] + single[name] / options[name][0])
+            allocation = {name: single[name]}
+
+        remaining = rolls
+        for name, cycles in allocation.items():
+            cycles_per_hour, rolls_per_cycle = options[name]
+            start = loads[name]
+            end = start + cycles / cycles_per_hour
+            produced = cycles * rolls_per_cycle
+            timelines[name].append(
+                {
+                    "order_id": order["order_id"],
+                    "start_hours": start,
+                    "end_hours": end,
+                    "cycles": cycles,
+                    "rolls": min(produced, remaining),
+                }
+            )
+            remaining = max(0, remaining - produced)
+            loads[name] = end
+            stock_m[name] -= cycles * order["roll_length"]
+        if remaining:
+            shortages[order["order_id"]] = remaining
+
+    return {
+        "makespan_hours": max(loads.values()) if loads else 0.0,
+        "machines": {
+            name: {"finish_hours": loads[name], "timeline": timelines[name]} for name in names
+        },
+        "unassigned": unassigned,
+        "shortages": shortages,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("orders")
+    parser.add_argument("machines")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    plan = plan_capacity(load_order_book(args.orders), load_machines(args.machines))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"makespan: {plan['makespan_hours']:.2f} h ({elapsed_ms:.0f} ms)")
+    for name, machine in plan["machines"].items():
+        print(f"{name}: {machine['finish_hours']:.2f} h, {len(machine['timeline'])} jobs")
+    if plan["unassigned"]:
+        print(f"unassigned: {', '.join(map(str, plan['unassigned']))}")
+    for order_id, rolls in plan["shortages"].items():
+        print(f"short: {order_id} by {rolls} rolls")
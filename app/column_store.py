@@ -0,0 +1,408 @@
+import json
+import math
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from contextlib import contextmanager
+
+from app.db import HISTORY_VIEW_KEYS, get_data_dir
+
+# Analytics copy of executed records, appended by app.db when
+# CALCULATOR_HISTORY_COLUMNS=1 and read through app.db.aggregate_history.
+# The weekly history wipe leaves it alone: this is the long-running record.
+STORE_DIRNAME = "history_columns"
+SEGMENT_ROWS = 1_000_000
+NULL_ID = -1
+NULL_INT = -(2**63)
+
+# Column name -> array typecode. "i" columns are dictionary-encoded strings.
+COLUMNS = (
+    ("timestamp", "i"),
+    ("stock_number", "i"),
+    ("material_code", "i"),
+    ("material_width", "d"),
+    ("useful_width", "d"),
+    ("big_roll_length", "d"),
+    ("roll_width", "d"),
+    ("roll_length", "d"),
+    ("main_count", "q"),
+    ("additional_width", "d"),
+    ("total_rolls", "q"),
+    ("used_length_m", "d"),
+    ("surplus_rolls", "q"),
+    ("surplus_main_rolls", "q"),
+    ("surplus_additional_rolls", "q"),
+    ("total_area", "d"),
+    ("useful_area", "d"),
+    ("waste_area", "d"),
+    ("waste_percent", "d"),
+    ("order_rolls", "q"),
+    ("machine", "i"),
+    ("created_at_ms", "q"),
+)
+COLUMN_TYPES = dict(COLUMNS)
+TEXT_COLUMNS = tuple(name for name, typecode in COLUMNS if typecode == "i")
+# NULL as stored per typecode, so NULLs group apart from zeros as in SQLite.
+NULLS = {"i": NULL_ID, "q": NULL_INT, "d": math.nan}
+
+# One encoder per store: its dictionaries are read once, not on every append.
+_encoders = {}
+
+
+def get_column_store_dir():
+    return os.path.join(get_data_dir(), STORE_DIRNAME)
+
+
+def _segments_dir(store_dir):
+    return os.path.join(store_dir, "segments")
+
+
+def _dictionary_path(store_dir, column):
+    return os.path.join(store_dir, f"{column}.dict")
+
+
+def _column_path(segment_dir, column):
+    return os.path.join(segment_dir, f"{column}.col")
+
+
+def _list_segments(store_dir):
+    root = _segments_dir(store_dir)
+    if not os.path.isdir(root):
+        return []
+    return [os.path.join(root, name) for name in sorted(os.listdir(root))]
+
+
+def _segment_rows(segment_dir):
+    # A crash between column appends leaves ragged files; only complete rows
+    # count. A column added after the segment was written has no file yet.
+    rows = None
+    for column, typecode in COLUMNS:
+        path = _column_path(segment_dir, column)
+        if not os.path.exists(path):
+            continue
+        count = os.path.getsize(path) // array(typecode).itemsize
+        rows = count if rows is None else min(rows, count)
+    return rows or 0
+
+
+def _is_null(value):
+    return value != value or value == NULL_INT
+
+
+def _load_dictionary(store_dir, column):
+    path = _dictionary_path(store_dir, column)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _Encoder:
+    def __init__(self, store_dir):
+        self._store_dir = store_dir
+        self._values = {column: _load_dictionary(store_dir, column) for column in TEXT_COLUMNS}
+        self._ids = {
+            column: {value: index for index, value in enumerate(values)}
+            for column, values in self._values.items()
+        }
+        self._pending = {column: [] for column in TEXT_COLUMNS}
+
+    def encode(self, column, value):
+        if value is None:
+            return NULL_ID
+        value = str(value)
+        ids = self._ids[column]
+        code = ids.get(value)
+        if code is None:
+            code = len(self._values[column])
+            self._values[column].append(value)
+            ids[value] = code
+            self._pending[column].append(value)
+        return code
+
+    def flush(self):
+        # Dictionaries are written before column data, so every stored id resolves.
+        for column, values in self._pending.items():
+            if not values:
+                continue
+            with open(_dictionary_path(self._store_dir, column), "a", encoding="utf-8") as f:
+                for value in values:
+                    f.write(json.dumps(value, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            values.clear()
+
+
+def init_store(store_dir=None):
+    if store_dir is None:
+        store_dir = get_column_store_dir()
+    os.makedirs(_segments_dir(store_dir), exist_ok=True)
+
+
+def _active_segment(store_dir, incoming_rows):
+    segments = _list_segments(store_dir)
+    if segments:
+        last = segments[-1]
+        rows = _segment_rows(last)
+        if rows + incoming_rows <= SEGMENT_ROWS or rows == 0:
+            return last, rows
+        index = int(os.path.basename(last)) + 1
+    else:
+        index = 1
+    segment_dir = os.path.join(_segments_dir(store_dir), f"{index:06d}")
+    os.makedirs(segment_dir, exist_ok=True)
+    return segment_dir, 0
+
+
+def _append_columns(segment_dir, rows, columns):
+    for column, typecode in COLUMNS:
+        path = _column_path(segment_dir, column)
+        if not os.path.exists(path):
+            # Rows written before the column existed read as NULL.
+            with open(path, "wb") as f:
+                f.write(array(typecode, [NULLS[typecode]]).tobytes() * rows)
+        with open(path, "ab") as f:
+            # Drop a torn tail left by an interrupted append before writing.
+            f.truncate(rows * array(typecode).itemsize)
+            f.write(columns[column].tobytes())
+
+
+def append_records(records, store_dir=None):
+    if store_dir is None:
+        store_dir = get_column_store_dir()
+    init_store(store_dir)
+    encoder = _encoders.get(store_dir)
+    if encoder is None:
+        encoder = _encoders[store_dir] = _Encoder(store_dir)
+    records = list(records)
+    start = 0
+    try:
+        while start < len(records):
+            segment_dir, rows = _active_segment(store_dir, 1)
+            chunk = records[start:start + SEGMENT_ROWS - rows]
+            columns = {column: array(typecode) for column, typecode in COLUMNS}
+            for record in chunk:
+                for column, typecode in COLUMNS:
+                    value = record.get(column)
+                    if typecode == "i":
+                        columns[column].append(encoder.encode(column, value))
+                    elif value is None:
+                        columns[column].append(NULLS[typecode])
+                    elif typecode == "q":
+                        columns[column].append(int(value))
+                    else:
+                        columns[column].append(float(value))
+            encoder.flush()
+            _append_columns(segment_dir, rows, columns)
+            start += len(chunk)
+    except OSError:
+        # The dictionaries on disk may now lag the cached ones: reread them.
+        _encoders.pop(store_dir, None)
+        raise
+    return len(records)
+
+
+@contextmanager
+def _mapped_column(segment_dir, column, rows):
+    typecode = COLUMN_TYPES[column]
+    path = _column_path(segment_dir, column)
+    if rows == 0 or not os.path.exists(path):
+        yield array(typecode, [NULLS[typecode]]) * rows
+        return
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)[: rows * array(typecode).itemsize].cast(typecode)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+def count_rows(store_dir=None):
+    if store_dir is None:
+        store_dir = get_column_store_dir()
+    return sum(_segment_rows(segment) for segment in _list_segments(store_dir))
+
+
+def scan_column(column, store_dir=None):
+    if store_dir is None:
+        store_dir = get_column_store_dir()
+    _check_column(column)
+    dictionary = _load_dictionary(store_dir, column) if column in TEXT_COLUMNS else None
+    for segment in _list_segments(store_dir):
+        with _mapped_column(segment, column, _segment_rows(segment)) as values:
+            if dictionary is None:
+                for value in values:
+                    yield None if _is_null(value) else value
+            else:
+                for code in values:
+                    yield None if code == NULL_ID else dictionary[code]
+
+
+def _check_column(name):
+    if name not in COLUMN_TYPES:
+        raise ValueError(f"Unknown history column: {name}")
+
+
+def aggregate(column, group_by=None, store_dir=None):
+    if store_dir is None:
+        store_dir = get_column_store_dir()
+    for name in (column, group_by):
+        if name is not None:
+            _check_column(name)
+    if COLUMN_TYPES[column] == "i":
+        raise ValueError(f"Column {column} is not numeric.")
+    text_group = group_by in TEXT_COLUMNS
+    dictionary = _load_dictionary(store_dir, group_by) if text_group else None
+    totals = {}
+    for segment in _list_segments(store_dir):
+        rows = _segment_rows(segment)
+        if group_by is None:
+            with _mapped_column(segment, column, rows) as values:
+                bucket = totals.setdefault(None, [0, 0.0])
+                bucket[0] += len(values)
+                total = sum(values)
+                if _is_null(total) or COLUMN_TYPES[column] == "q":
+                    # NULLs add nothing, as with TOTAL() in SQLite.
+                    total = sum(value for value in values if not _is_null(value))
+                bucket[1] += total
+            continue
+        with _mapped_column(segment, column, rows) as values, _mapped_column(
+            segment, group_by, rows
+        ) as keys:
+            for key, value in zip(keys, values):
+                if not text_group and _is_null(key):
+                    key = None
+                bucket = totals.get(key)
+                if bucket is None:
+                    bucket = totals[key] = [0, 0.0]
+                bucket[0] += 1
+                if not _is_null(value):
+                    bucket[1] += value
+
+    result = {}
+    for key, (count, total) in totals.items():
+        if dictionary is not None:
+            key = None if key == NULL_ID else dictionary[key]
+        result[key] = {"count": count, "sum": total, "mean": total / count if count else 0}
+    return result
+
+
+def fetch_recent(limit=50, store_dir=None):
+    if store_dir is None:
+        store_dir = get_column_store_dir()
+    dictionaries = {column: _load_dictionary(store_dir, column) for column in TEXT_COLUMNS}
+    rows = []
+    for segment in reversed(_list_segments(store_dir)):
+        if len(rows) >= limit:
+            break
+        segment_rows = _segment_rows(segment)
+        take = min(limit - len(rows), segment_rows)
+        columns = []
+        for column in HISTORY_VIEW_KEYS:
+            with _mapped_column(segment, column, segment_rows) as values:
+                tail = list(values[segment_rows - take:])
+            if column in dictionaries:
+                names = dictionaries[column]
+                tail = [None if code == NULL_ID else names[code] for code in tail]
+            else:
+                tail = [None if _is_null(value) else value for value in tail]
+            columns.append(tail)
+        rows.extend(reversed(list(zip(*columns))))
+    return rows
+
+
+def clear_store(store_dir=None):
+    if store_dir is None:
+        store_dir = get_column_store_dir()
+    _encoders.pop(store_dir, None)
+    shutil.rmtree(store_dir, ignore_errors=True)
+    init_store(store_dir)
+
+
+def _benchmark(rows):
+    import sqlite3
+    import tempfile
+    import time
+
+    from app import db
+
+    work_dir = tempfile.mkdtemp()
+    store_dir = os.path.join(work_dir, "columns")
+    db_path = os.path.join(work_dir, "history.db")
+    db.init_history_db(db_path)
+
+    def records(count):
+        for index in range(count):
+            yield {
+                "timestamp": f"{index // 60 % 24:02d}:{index % 60:02d}",
+                "stock_number": f"{index % 1000:03d}/2026",
+                "material_code": f"M{index % 40}",
+                "material_width": 910.0,
+                "useful_width": 900.0,
+                "big_roll_length": 6000.0,
+                "roll_width": 150.0,
+                "roll_length": 500.0,
+                "main_count": 6,
+                "additional_width": 0.0,
+                "total_rolls": 60,
+                "used_length_m": 5010.0,
+                "surplus_rolls": 0,
+                "surplus_main_rolls": 0,
+                "surplus_additional_rolls": 0,
+                "total_area": 4559.1,
+                "useful_area": 4500.0 + index % 7,
+                "waste_area": 59.1,
+                "waste_percent": 1.3 + index % 5,
+            }
+
+    batch = 100_000
+    for start in range(0, rows, batch):
+        chunk = list(records(min(batch, rows - start)))
+        append_records(chunk, store_dir)
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            "INSERT INTO history(timestamp, stock_number, material_code, useful_area, "
+            "waste_percent) VALUES(?,?,?,?,?)",
+            [
+                (
+                    r["timestamp"],
+                    r["stock_number"],
+                    r["material_code"],
+                    r["useful_area"],
+                    r["waste_percent"],
+                )
+                for r in chunk
+            ],
+        )
+        conn.commit()
+        conn.close()
+
+    report = {"rows": rows}
+    started = time.perf_counter()
+    aggregate("waste_percent", store_dir=store_dir)
+    report["columns_scan_s"] = round(time.perf_counter() - started, 3)
+    started = time.perf_counter()
+    aggregate("useful_area", group_by="material_code", store_dir=store_dir)
+    report["columns_group_s"] = round(time.perf_counter() - started, 3)
+
+    conn = sqlite3.connect(db_path)
+    started = time.perf_counter()
+    conn.execute("SELECT COUNT(*), SUM(waste_percent) FROM history").fetchone()
+    report["sqlite_scan_s"] = round(time.perf_counter() - started, 3)
+    started = time.perf_counter()
+    conn.execute(
+        "SELECT material_code, COUNT(*), SUM(useful_area) FROM history GROUP BY material_code"
+    ).fetchall()
+    report["sqlite_group_s"] = round(time.perf_counter() - started, 3)
+    conn.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    for key, value in _benchmark(rows).items():
+        print(f"{key}: {value}")
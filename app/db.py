@@ -1,8 +1,65 @@
+import gzip
+import json
+import logging
 import os
+import random
+import shutil
 import sqlite3
 import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except Exception:
+    ZoneInfo = None
 
 APP_NAME = "IndustrialCalculator"
+HISTORY_DB_ENV = "CALCULATOR_HISTORY_DB"
+SPOOL_FILENAME = "history_spool.jsonl"
+BUSY_TIMEOUT_S = 5.0
+WRITE_RETRIES = 6
+# Total time a write may wait for the lock, retries included: the GUI thread
+# writes through _run_write, and a spooled record beats a frozen window.
+WRITE_BUDGET_S = 2.0
+RETRY_DELAY_S = 0.05
+HISTORY_PARTITIONS_ENV = "CALCULATOR_HISTORY_PARTITIONS"
+HISTORY_COLUMNS_ENV = "CALCULATOR_HISTORY_COLUMNS"
+PARTITIONS_DIRNAME = "history_partitions"
+BACKUP_DIRNAME = "backups"
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP_S = 0.05
+BACKUP_KEEP = 14
+BACKUP_MAX_RESTARTS = 5
+BACKUP_MAX_PAGES_PER_STEP = 4096
+BACKUP_BUDGET_S = 600.0
+# SQLite attaches at most 10 databases per connection by default.
+ATTACH_BATCH = 8
+INVENTORY_SCHEMA = "inventory"
+MINSK_TZ_NAME = "Europe/Minsk"
+SHIFT_START_HOURS = (8, 20)
+MIGRATION_BATCH = 5000
+HISTORY_VIEW_KEYS = (
+    "timestamp",
+    "stock_number",
+    "material_code",
+    "roll_width",
+    "useful_area",
+    "waste_percent",
+    "surplus_main_rolls",
+    "surplus_additional_rolls",
+    "used_length_m",
+)
+HISTORY_VIEW_COLUMNS = ", ".join(HISTORY_VIEW_KEYS)
+# The view shows 20 rows; the rest covers this station's executions, which
+# the window lists separately from the stored rows.
+HISTORY_CACHE_SIZE = 40
+SEARCH_RECENT_WINDOW = 20_000
+
+_initialized_partitions = set()
+
+logger = logging.getLogger(__name__)
 
 
 def _user_data_dir():
@@ -21,14 +78,60 @@ def get_data_dir():
 
 
 def get_history_db_path():
+    shared_path = os.getenv(HISTORY_DB_ENV)
+    if shared_path:
+        return shared_path
     return os.path.join(get_data_dir(), "history.db")
 
 
-def init_history_db(db_path=None):
-    if db_path is None:
-        db_path = get_history_db_path()
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+def get_spool_path():
+    return os.path.join(get_data_dir(), SPOOL_FILENAME)
+
+
+def _connect(db_path, timeout=BUSY_TIMEOUT_S):
+    # Autocommit mode: write transactions are opened explicitly with BEGIN IMMEDIATE.
+    return sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+
+
+def _is_busy_error(exc):
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+def _run_write(db_path, work, attach=None, budget_s=None):
+    if budget_s is None:
+        budget_s = WRITE_BUDGET_S
+    deadline = time.monotonic() + budget_s
+    delay = RETRY_DELAY_S
+    for attempt in range(WRITE_RETRIES):
+        conn = _connect(db_path, timeout=max(0.0, deadline - time.monotonic()))
+        try:
+            if attach is not None:
+                # Attached before BEGIN so one commit covers both files.
+                conn.execute(f"ATTACH DATABASE ? AS {INVENTORY_SCHEMA}", (attach,))
+            conn.execute("BEGIN IMMEDIATE")
+            result = work(conn.cursor())
+            conn.execute("COMMIT")
+            return result
+        except sqlite3.OperationalError as exc:
+            if conn.in_transaction:
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+            if (
+                not _is_busy_error(exc)
+                or attempt == WRITE_RETRIES - 1
+                or time.monotonic() >= deadline
+            ):
+                raise
+        finally:
+            conn.close()
+        time.sleep(min(delay + random.uniform(0, delay), max(0.0, deadline - time.monotonic())))
+        delay *= 2
+
+
+def _create_history_schema(cur):
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS history(
@@ -51,7 +154,10 @@ def init_history_db(db_path=None):
             total_area REAL,
             useful_area REAL,
             waste_area REAL,
-            waste_percent REAL
+            waste_percent REAL,
+            order_rolls INTEGER,
+            machine TEXT,
+            created_at_ms INTEGER
         )
         """
     )
@@ -71,15 +177,90 @@ def init_history_db(db_path=None):
         cur.execute("ALTER TABLE history ADD COLUMN surplus_additional_rolls INTEGER")
     if "used_length_m" not in existing:
         cur.execute("ALTER TABLE history ADD COLUMN used_length_m REAL")
-    conn.commit()
-    conn.close()
+    if "order_rolls" not in existing:
+        cur.execute("ALTER TABLE history ADD COLUMN order_rolls INTEGER")
+    if "machine" not in existing:
+        cur.execute("ALTER TABLE history ADD COLUMN machine TEXT")
+    if "created_at_ms" not in existing:
+        cur.execute("ALTER TABLE history ADD COLUMN created_at_ms INTEGER")
+    # Short searches are case-insensitive prefix ranges, which BINARY indexes can't serve.
+    cur.execute("DROP INDEX IF EXISTS idx_history_stock")
+    cur.execute("DROP INDEX IF EXISTS idx_history_material")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_history_stock_nocase ON history(stock_number COLLATE NOCASE)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_history_material_nocase"
+        " ON history(material_code COLLATE NOCASE)"
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_history_created ON history(created_at_ms)")
+    _create_search_index(cur)
 
 
-def insert_history(record, db_path=None):
+def _create_search_index(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='history_search'")
+    created = cur.fetchone() is None
+    if created:
+        try:
+            cur.execute(
+                """
+                CREATE VIRTUAL TABLE history_search USING fts5(
+                    stock_number, material_code,
+                    content='history', content_rowid='id', tokenize='trigram'
+                )
+                """
+            )
+        except sqlite3.OperationalError:
+            # SQLite without FTS5 or the trigram tokenizer: search falls back to LIKE.
+            return
+    cur.execute("SELECT sql FROM sqlite_master WHERE name='history_search_au'")
+    row = cur.fetchone()
+    if row is not None and "UPDATE OF" not in row[0]:
+        # Older databases reindexed on every update, including created_at_ms backfills.
+        cur.execute("DROP TRIGGER history_search_au")
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS history_search_ai AFTER INSERT ON history BEGIN
+            INSERT INTO history_search(rowid, stock_number, material_code)
+            VALUES (new.id, new.stock_number, new.material_code);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS history_search_ad AFTER DELETE ON history BEGIN
+            INSERT INTO history_search(history_search, rowid, stock_number, material_code)
+            VALUES ('delete', old.id, old.stock_number, old.material_code);
+        END
+        """
+    )
+    cur.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS history_search_au
+        AFTER UPDATE OF stock_number, material_code ON history BEGIN
+            INSERT INTO history_search(history_search, rowid, stock_number, material_code)
+            VALUES ('delete', old.id, old.stock_number, old.material_code);
+            INSERT INTO history_search(rowid, stock_number, material_code)
+            VALUES (new.id, new.stock_number, new.material_code);
+        END
+        """
+    )
+    if created:
+        cur.execute("INSERT INTO history_search(history_search) VALUES('rebuild')")
+
+
+def init_history_db(db_path=None):
     if db_path is None:
+        if history_partitioned():
+            get_current_partition_path()
+            init_jumbo_db()
+            return
         db_path = get_history_db_path()
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    _run_write(db_path, _create_history_schema)
+    init_jumbo_db(db_path)
+
+
+def _insert_record(cur, record):
     cur.execute(
         """
         INSERT INTO history(
@@ -87,9 +268,9 @@ def insert_history(record, db_path=None):
             material_width, useful_width, big_roll_length, roll_width, roll_length,
             main_count, additional_width, total_rolls, used_length_m, surplus_rolls,
             surplus_main_rolls, surplus_additional_rolls, total_area,
-            useful_area, waste_area, waste_percent
+            useful_area, waste_area, waste_percent, order_rolls, machine, created_at_ms
         )
-        VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+        VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
         """,
         (
             record["timestamp"],
@@ -111,49 +292,1022 @@ def insert_history(record, db_path=None):
             record["useful_area"],
             record["waste_area"],
             record["waste_percent"],
+            record.get("order_rolls"),
+            record.get("machine"),
+            record.get("created_at_ms"),
         ),
     )
-    conn.commit()
-    conn.close()
 
 
-def fetch_history(limit=50, db_path=None):
+def _read_spool():
+    path = get_spool_path()
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def _append_spool(record):
+    with open(get_spool_path(), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _clear_spool():
+    try:
+        os.remove(get_spool_path())
+    except FileNotFoundError:
+        pass
+
+
+def _uses_spool(db_path):
+    # The local spool only makes sense when history lives on a shared database.
+    return db_path is None and bool(os.getenv(HISTORY_DB_ENV))
+
+
+def get_minsk_tz():
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(MINSK_TZ_NAME)
+        except Exception:
+            pass
+    return timezone(timedelta(hours=3))
+
+
+def to_minsk(when):
+    # Naive datetimes are Minsk wall-clock time, never the host's local zone.
+    tz = get_minsk_tz()
+    if when.tzinfo is None:
+        return when.replace(tzinfo=tz)
+    return when.astimezone(tz)
+
+
+def to_epoch_ms(when):
+    return int(to_minsk(when).timestamp() * 1000)
+
+
+def shift_bounds(when=None):
+    tz = get_minsk_tz()
+    when = datetime.now(tz) if when is None else to_minsk(when)
+    midnight = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    starts = [midnight - timedelta(days=1) + timedelta(hours=SHIFT_START_HOURS[-1])]
+    starts += [midnight + timedelta(hours=hour) for hour in SHIFT_START_HOURS]
+    starts.append(midnight + timedelta(days=1, hours=SHIFT_START_HOURS[0]))
+    # The first start is always in the past, so the shift is the first one not yet over.
+    return next((start, end) for start, end in zip(starts, starts[1:]) if when < end)
+
+
+def last_days_bounds(days=7, when=None):
+    end = datetime.now(get_minsk_tz()) if when is None else to_minsk(when)
+    return end - timedelta(days=days), end
+
+
+def _range_clause(start=None, end=None):
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append("created_at_ms >= ?")
+        params.append(to_epoch_ms(start))
+    if end is not None:
+        conditions.append("created_at_ms < ?")
+        params.append(to_epoch_ms(end))
+    if not conditions:
+        return "", params
+    return "WHERE " + " AND ".join(conditions), params
+
+
+def history_columns_enabled():
+    return os.getenv(HISTORY_COLUMNS_ENV) == "1"
+
+
+def _append_to_columns(records):
+    # After the SQLite commit and best effort: a full disk on the analytics
+    # copy must not fail an execution.
+    from app import column_store
+
+    try:
+        column_store.append_records(records)
+    except OSError as exc:
+        logger.warning("Column store append failed: %s", exc)
+
+
+def history_partitioned():
+    return os.getenv(HISTORY_PARTITIONS_ENV, "") not in ("", "0")
+
+
+def get_partitions_dir():
+    base_dir = os.path.dirname(os.path.abspath(get_history_db_path()))
+    path = os.path.join(base_dir, PARTITIONS_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def partition_name(when=None):
+    # Months follow Minsk time, like created_at.
+    when = datetime.now(get_minsk_tz()) if when is None else to_minsk(when)
+    return when.strftime("%Y_%m")
+
+
+def get_partition_path(name):
+    return os.path.join(get_partitions_dir(), f"history_{name}.db")
+
+
+def list_partitions():
+    names = []
+    for filename in os.listdir(get_partitions_dir()):
+        if filename.startswith("history_") and filename.endswith(".db"):
+            names.append(filename[len("history_"):-len(".db")])
+    return sorted(names)
+
+
+def partitions_for_range(start=None, end=None):
+    low = partition_name(start) if start is not None else None
+    high = partition_name(end) if end is not None else None
+    return [
+        name
+        for name in list_partitions()
+        if (low is None or name >= low) and (high is None or name <= high)
+    ]
+
+
+def get_current_partition_path(when=None):
+    path = get_partition_path(partition_name(when))
+    if path not in _initialized_partitions:
+        _run_write(path, _create_history_schema)
+        _initialized_partitions.add(path)
+    return path
+
+
+def _default_write_path():
+    if history_partitioned():
+        return get_current_partition_path()
+    return get_history_db_path()
+
+
+def _attach_partitions(names):
+    conn = sqlite3.connect(":memory:", timeout=BUSY_TIMEOUT_S)
+    for index, name in enumerate(names):
+        conn.execute(f"ATTACH DATABASE ? AS p{index}", (get_partition_path(name),))
+    return conn
+
+
+def fetch_history_partitioned(limit=50, start=None, end=None, with_keys=False):
+    rows = []
+    where, params = _range_clause(start, end)
+    names = sorted(partitions_for_range(start, end), reverse=True)
+    for offset in range(0, len(names), ATTACH_BATCH):
+        if len(rows) >= limit:
+            break
+        batch = names[offset:offset + ATTACH_BATCH]
+        conn = _attach_partitions(batch)
+        union = " UNION ALL ".join(
+            f"SELECT {index} AS part, id, {HISTORY_VIEW_COLUMNS} FROM p{index}.history {where}"
+            for index in range(len(batch))
+        )
+        cur = conn.execute(
+            f"SELECT * FROM ({union}) ORDER BY part ASC, id DESC LIMIT ?",
+            params * len(batch) + [limit - len(rows)],
+        )
+        if with_keys:
+            rows.extend(
+                ((get_partition_path(batch[row[0]]), row[1]), row[2:]) for row in cur.fetchall()
+            )
+        else:
+            rows.extend(row[2:] for row in cur.fetchall())
+        conn.close()
+    return rows
+
+
+def count_history_partitioned(start=None, end=None):
+    total = 0
+    where, params = _range_clause(start, end)
+    names = partitions_for_range(start, end)
+    for offset in range(0, len(names), ATTACH_BATCH):
+        batch = names[offset:offset + ATTACH_BATCH]
+        conn = _attach_partitions(batch)
+        total += conn.execute(
+            "SELECT "
+            + " + ".join(
+                f"(SELECT COUNT(*) FROM p{index}.history {where})" for index in range(len(batch))
+            ),
+            params * len(batch),
+        ).fetchone()[0]
+        conn.close()
+    return total
+
+
+def drop_partition(name):
+    path = get_partition_path(name)
+    _initialized_partitions.discard(path)
+    for suffix in ("", "-journal", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _record_consumption(cur, record, history_id, schema="main", partition=None):
+    stock_number = record.get("stock_number")
+    big_roll_length = record.get("big_roll_length")
+    used_length_m = record.get("used_length_m")
+    if not stock_number or big_roll_length is None or used_length_m is None:
+        return
+    remaining_m = max(0.0, big_roll_length - used_length_m)
+    cur.execute(
+        f"""
+        INSERT INTO {schema}.jumbo_ledger(
+            stock_number, partition, history_id, big_roll_length, used_length_m, remaining_m
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (stock_number, partition, history_id, big_roll_length, used_length_m, remaining_m),
+    )
+    # Only registered jumbos are tracked; a typed stock number must not turn
+    # into stock that the picker would offer.
+    cur.execute(
+        f"UPDATE {schema}.jumbos SET length_m = ? WHERE stock_number = ?",
+        (remaining_m, stock_number),
+    )
+    if cur.rowcount == 0:
+        # Typed stock numbers are routine on sites without a registered inventory.
+        logger.debug("Stock number %s is not in the jumbo inventory", stock_number)
+
+
+def _write_records(db_path, records, partitioned):
+    # Partitions keep history only; the ledger stays in the main database.
+    attach = get_history_db_path() if partitioned else None
+    schema = INVENTORY_SCHEMA if partitioned else "main"
+    partition = partition_name() if partitioned else None
+
+    def work(cur):
+        ids = []
+        for item in records:
+            _insert_record(cur, item)
+            ids.append(cur.lastrowid)
+            _record_consumption(cur, item, cur.lastrowid, schema, partition)
+        return ids
+
+    return _run_write(db_path, work, attach)
+
+
+def insert_history(record, db_path=None):
+    use_spool = _uses_spool(db_path)
+    use_columns = db_path is None and history_columns_enabled()
+    partitioned = db_path is None and history_partitioned()
+    pending = _read_spool() if use_spool else []
+
+    try:
+        if db_path is None:
+            # Opening this month's partition already needs the shared drive.
+            db_path = _default_write_path()
+        ids = _write_records(db_path, pending + [record], partitioned)
+    except sqlite3.OperationalError:
+        if not use_spool:
+            raise
+        _append_spool(record)
+        return None
+    if pending:
+        _clear_spool()
+    if use_columns:
+        _append_to_columns(pending + [record])
+    # Rows are keyed by file and id: partitions each number from 1.
+    return (db_path, ids[-1])
+
+
+def flush_history_spool(db_path=None):
+    partitioned = db_path is None and history_partitioned()
+    use_columns = db_path is None and history_columns_enabled()
     if db_path is None:
+        db_path = _default_write_path()
+    pending = _read_spool()
+    if not pending:
+        return 0
+
+    _write_records(db_path, pending, partitioned)
+    _clear_spool()
+    if use_columns:
+        _append_to_columns(pending)
+    return len(pending)
+
+
+def fetch_history(limit=50, db_path=None, start=None, end=None, with_keys=False):
+    if db_path is None:
+        if history_partitioned():
+            return fetch_history_partitioned(limit, start, end, with_keys)
         db_path = get_history_db_path()
-    conn = sqlite3.connect(db_path)
+    where, params = _range_clause(start, end)
+    # A time range is served straight from idx_history_created, newest first.
+    order = "created_at_ms DESC" if where else "id DESC"
+    conn = _connect(db_path)
     cur = conn.cursor()
     cur.execute(
-        """
-        SELECT timestamp, stock_number, material_code,
-               roll_width, useful_area, waste_percent,
-               surplus_main_rolls, surplus_additional_rolls, used_length_m
+        f"""
+        SELECT id, {HISTORY_VIEW_COLUMNS}
         FROM history
+        {where}
+        ORDER BY {order}
+        LIMIT ?
+        """,
+        params + [limit],
+    )
+    if with_keys:
+        rows = [((db_path, row[0]), row[1:]) for row in cur.fetchall()]
+    else:
+        rows = [row[1:] for row in cur.fetchall()]
+    conn.close()
+    return rows
+
+
+class HistoryWatcher:
+    # PRAGMA data_version only changes when another connection commits, so an
+    # idle poll is one pragma on an open connection and no table reads.
+    def __init__(self, db_path=None):
+        self._db_path = db_path
+        self._path = None
+        self._conn = None
+        self._version = None
+        self.last_id = 0
+        self._last_row = None
+        # Set by poll when ids started over, so cached rows may be stale.
+        self.rewound = False
+
+    def _open(self, path):
+        self.close()
+        self._conn = _connect(path)
+        self._version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if path != self._path:
+            # A new month partition numbers its rows from scratch.
+            self.rewound = self._path is not None
+            self._skip_to_end()
+            self._path = path
+
+    @property
+    def path(self):
+        return self._path
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+
+    def _row(self, row_id):
+        return self._conn.execute(
+            f"SELECT id, {HISTORY_VIEW_COLUMNS} FROM history WHERE id = ?", (row_id,)
+        ).fetchone()
+
+    def _skip_to_end(self):
+        self.last_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM history").fetchone()[0]
+        self._last_row = self._row(self.last_id)
+
+    def poll(self, limit=200):
+        self.rewound = False
+        try:
+            path = self._db_path or _default_write_path()
+            if self._conn is None or path != self._path:
+                self._open(path)
+            else:
+                version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                if version == self._version:
+                    return []
+                self._version = version
+            if not self.rewound and self.last_id and self._row(self.last_id) != self._last_row:
+                # Cleared history: ids start over, possibly reusing the last one seen.
+                self.rewound = True
+                self._skip_to_end()
+            if self.rewound:
+                # Nothing in the cache lines up with the new ids: the caller
+                # reloads it, and polling goes on from the newest row.
+                return []
+            rows = self._conn.execute(
+                f"""
+                SELECT id, {HISTORY_VIEW_COLUMNS}
+                FROM history
+                WHERE id > ?
+                ORDER BY id ASC
+                LIMIT ?
+                """,
+                (self.last_id, limit),
+            ).fetchall()
+        except sqlite3.Error:
+            # Shared drive gone: reconnect on the next poll.
+            self.close()
+            return []
+        if rows:
+            self.last_id = rows[-1][0]
+            self._last_row = rows[-1]
+        if len(rows) == limit:
+            # More are waiting: fetch the rest on the next poll.
+            self._version = None
+        return rows
+
+
+class HistoryCache:
+    # The newest rows, newest first, keyed by (database file, id). Writes go
+    # through to SQLite; reads are served from memory. Keys sort by age:
+    # partition files are named by month and ids grow within a file.
+    def __init__(self, size=HISTORY_CACHE_SIZE, db_path=None):
+        self._db_path = db_path
+        self._rows = deque()
+        self._keys = set()
+        # Inserted here and not yet seen by a poll, so not counted twice.
+        self._unpolled = set()
+        self.size = size
+        # Rows in history, kept from the deltas instead of a COUNT(*) per change.
+        self.count = 0
+
+    def reload(self):
+        self._rows.clear()
+        self._keys.clear()
+        self._unpolled.clear()
+        for key, row in fetch_history(self.size, self._db_path, with_keys=True):
+            self._rows.append((key, tuple(row)))
+            self._keys.add(key)
+        self.count = count_history(self._db_path)
+
+    def add(self, key, row):
+        if key in self._keys:
+            return False
+        if len(self._rows) >= self.size and key < self._rows[-1][0]:
+            # Older than everything kept: it would only be evicted again.
+            return False
+        index = next((i for i, (cached, _) in enumerate(self._rows) if cached < key), len(self._rows))
+        self._rows.insert(index, (key, tuple(row)))
+        self._keys.add(key)
+        if len(self._rows) > self.size:
+            self._keys.discard(self._rows.pop()[0])
+        return True
+
+    def merge(self, path, rows):
+        # Rows a poll found in path, ascending by id, including other
+        # stations' writes that interleave with ours. Returns how many were
+        # new to this cache, counted or not.
+        new = 0
+        for row in rows:
+            key = (path, row[0])
+            if key in self._unpolled:
+                self._unpolled.discard(key)
+                continue
+            new += 1
+            self.count += 1
+            self.add(key, row[1:])
+        return new
+
+    def insert(self, record):
+        # None when the record went to the spool: it has no id until flushed,
+        # and the poll that sees it after the flush counts it.
+        key = insert_history(record, self._db_path)
+        if key is not None:
+            self._unpolled.add(key)
+            self.count += 1
+            self.add(key, tuple(record[name] for name in HISTORY_VIEW_KEYS))
+        return key
+
+    def clear(self):
+        clear_history(self._db_path)
+        self._rows.clear()
+        self._keys.clear()
+        self._unpolled.clear()
+        self.count = 0
+
+    def rows(self, limit=None, exclude=()):
+        rows = []
+        for key, row in self._rows:
+            if limit is not None and len(rows) >= limit:
+                break
+            if key not in exclude:
+                rows.append(row)
+        return rows
+
+
+def _has_search_index(cur):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE name='history_search'")
+    return cur.fetchone() is not None
+
+
+def _prefix_range(prefix):
+    # Bounds for "starts with prefix" under NOCASE, which folds ASCII only.
+    folded = "".join(ch.lower() if "A" <= ch <= "Z" else ch for ch in prefix)
+    return folded, folded[:-1] + chr(ord(folded[-1]) + 1)
+
+
+def _search_prefix(cur, columns, prefix, limit, before_id):
+    # Case-insensitive like the trigram index. The newest rows are tried
+    # first: a common prefix fills the page there, while a rare one is found
+    # through the NOCASE indexes without a table scan.
+    low, high = _prefix_range(prefix)
+    cur.execute("SELECT MAX(id) FROM history WHERE id < ?", (before_id,))
+    newest = cur.fetchone()[0]
+    if newest is None:
+        return []
+    cur.execute(
+        columns
+        + """
+        WHERE id <= ? AND id > ?
+          AND ((stock_number >= ? COLLATE NOCASE AND stock_number < ? COLLATE NOCASE)
+               OR (material_code >= ? COLLATE NOCASE AND material_code < ? COLLATE NOCASE))
         ORDER BY id DESC
         LIMIT ?
         """,
-        (limit,),
+        (newest, newest - SEARCH_RECENT_WINDOW, low, high, low, high, limit),
     )
     rows = cur.fetchall()
+    if len(rows) == limit:
+        return rows
+    cur.execute(
+        columns
+        + """
+        WHERE id IN (
+            SELECT id FROM history
+            WHERE stock_number >= ? COLLATE NOCASE AND stock_number < ? COLLATE NOCASE
+              AND id < ?
+            UNION
+            SELECT id FROM history
+            WHERE material_code >= ? COLLATE NOCASE AND material_code < ? COLLATE NOCASE
+              AND id < ?
+        )
+        ORDER BY id DESC
+        LIMIT ?
+        """,
+        (low, high, before_id, low, high, before_id, limit),
+    )
+    return cur.fetchall()
+
+
+def _search_rows(db_path, query, limit, before_id):
+    conn = _connect(db_path)
+    cur = conn.cursor()
+    columns = """
+        SELECT id, timestamp, stock_number, material_code,
+               roll_width, useful_area, waste_percent,
+               surplus_main_rolls, surplus_additional_rolls, used_length_m
+        FROM history
+    """
+    if len(query) >= 3 and _has_search_index(cur):
+        phrase = '"' + query.replace('"', '""') + '"'
+        cur.execute(
+            columns
+            + """
+            JOIN (
+                SELECT rowid AS match_id FROM history_search
+                WHERE history_search MATCH ? AND rowid < ?
+                ORDER BY rowid DESC
+                LIMIT ?
+            ) AS matches ON history.id = matches.match_id
+            ORDER BY id DESC
+            """,
+            (phrase, before_id, limit),
+        )
+        rows = cur.fetchall()
+    else:
+        # Trigrams need three characters, so shorter input (or any input on
+        # SQLite without FTS5) matches the start of either field instead.
+        rows = _search_prefix(cur, columns, query, limit, before_id)
     conn.close()
     return rows
 
 
-def count_history(db_path=None):
+def _search_partitions(query, limit, before):
+    # Ids repeat across partitions, so the paging cursor is (partition, id).
+    # Partitions are searched newest first until the page is full.
+    rows = []
+    for name in sorted(list_partitions(), reverse=True):
+        if len(rows) >= limit:
+            break
+        if before is not None and name > before[0]:
+            continue
+        before_id = before[1] if before is not None and name == before[0] else sys.maxsize
+        found = _search_rows(get_partition_path(name), query, limit - len(rows), before_id)
+        rows.extend(((name, row[0]),) + tuple(row[1:]) for row in found)
+    return rows
+
+
+def search_history(query, limit=50, before_id=None, db_path=None):
+    # Row[0] is the cursor for the next page: the id, or with partitions a
+    # (partition, id) pair.
+    query = query.strip()
+    if not query:
+        return []
+    if db_path is None:
+        if history_partitioned():
+            return _search_partitions(query, limit, before_id)
+        db_path = get_history_db_path()
+    if before_id is None:
+        before_id = sys.maxsize
+    return _search_rows(db_path, query, limit, before_id)
+
+
+def count_history(db_path=None, start=None, end=None):
     if db_path is None:
+        if history_partitioned():
+            return count_history_partitioned(start, end)
         db_path = get_history_db_path()
-    conn = sqlite3.connect(db_path)
+    where, params = _range_clause(start, end)
+    conn = _connect(db_path)
     cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM history")
+    cur.execute(f"SELECT COUNT(*) FROM history {where}", params)
     count = cur.fetchone()[0]
     conn.close()
     return count
 
 
+def aggregate_history(column, group_by=None, db_path=None):
+    # {group: {"count", "sum", "mean"}}; NULLs count as zero, as in the column store.
+    if db_path is None:
+        if history_columns_enabled():
+            from app import column_store
+
+            return column_store.aggregate(column, group_by)
+        if history_partitioned():
+            paths = [get_partition_path(name) for name in list_partitions()]
+        else:
+            paths = [get_history_db_path()]
+    else:
+        paths = [db_path]
+
+    totals = {}
+    for path in paths:
+        conn = _connect(path)
+        known = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(history)")}
+        for name in (column, group_by):
+            if name is not None and name not in known:
+                conn.close()
+                raise ValueError(f"Unknown history column: {name}")
+        if known[column].upper() == "TEXT":
+            conn.close()
+            raise ValueError(f"Column {column} is not numeric.")
+        key = group_by or "NULL"
+        rows = conn.execute(
+            f"SELECT {key}, COUNT(*), TOTAL({column}) FROM history GROUP BY {key}"
+        ).fetchall()
+        conn.close()
+        for group, count, total in rows:
+            bucket = totals.setdefault(group, [0, 0.0])
+            bucket[0] += count
+            bucket[1] += total
+    return {
+        group: {"count": count, "sum": total, "mean": total / count if count else 0}
+        for group, (count, total) in totals.items()
+    }
+
+
+def _estimate_created_at(anchor, timestamp):
+    # Older rows kept only "HH:MM"; walking back from a known time, a clock
+    # reading later than the anchor means midnight was crossed.
+    try:
+        hour, minute = (int(part) for part in timestamp.split(":"))
+        guess = anchor.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    except (AttributeError, ValueError):
+        return anchor
+    if guess > anchor:
+        guess -= timedelta(days=1)
+    return guess
+
+
+def _migrate_created_at(db_path, anchor, batch_size):
+    conn = _connect(db_path)
+    try:
+        pending = conn.execute(
+            "SELECT 1 FROM history WHERE created_at_ms IS NULL LIMIT 1"
+        ).fetchone()
+        if pending is None:
+            oldest = conn.execute(
+                "SELECT created_at_ms FROM history ORDER BY id LIMIT 1"
+            ).fetchone()
+            if oldest is not None:
+                anchor = datetime.fromtimestamp(oldest[0] / 1000, anchor.tzinfo)
+            return anchor, 0
+
+        tz = anchor.tzinfo
+        migrated = 0
+        last_id = None
+        while True:
+            # Each batch is read in full so no read lock is held while writing.
+            if last_id is None:
+                rows = conn.execute(
+                    "SELECT id, timestamp, created_at_ms FROM history ORDER BY id DESC LIMIT ?",
+                    (batch_size,),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    """
+                    SELECT id, timestamp, created_at_ms FROM history
+                    WHERE id < ? ORDER BY id DESC LIMIT ?
+                    """,
+                    (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return anchor, migrated
+            updates = []
+            for row_id, timestamp, created_at_ms in rows:
+                if created_at_ms is not None:
+                    anchor = datetime.fromtimestamp(created_at_ms / 1000, tz)
+                    continue
+                anchor = _estimate_created_at(anchor, timestamp)
+                updates.append((to_epoch_ms(anchor), row_id))
+            last_id = rows[-1][0]
+            if updates:
+                _run_write(
+                    db_path,
+                    lambda cur: cur.executemany(
+                        "UPDATE history SET created_at_ms = ? WHERE id = ? AND created_at_ms IS NULL",
+                        updates,
+                    ),
+                )
+                migrated += len(updates)
+    finally:
+        conn.close()
+
+
+def migrate_created_at(db_path=None, batch_size=MIGRATION_BATCH):
+    anchor = datetime.now(get_minsk_tz())
+    if db_path is not None:
+        return _migrate_created_at(db_path, anchor, batch_size)[1]
+    if not history_partitioned():
+        return _migrate_created_at(get_history_db_path(), anchor, batch_size)[1]
+    migrated = 0
+    for name in sorted(list_partitions(), reverse=True):
+        anchor, count = _migrate_created_at(get_partition_path(name), anchor, batch_size)
+        migrated += count
+    return migrated
+
+
 def clear_history(db_path=None):
+    if db_path is None:
+        if history_partitioned():
+            for name in list_partitions():
+                clear_history(get_partition_path(name))
+            return
+        db_path = get_history_db_path()
+    _run_write(db_path, lambda cur: cur.execute("DELETE FROM history"))
+
+
+def _create_jumbo_schema(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jumbos(
+            stock_number TEXT PRIMARY KEY,
+            material_code TEXT,
+            material_width REAL,
+            useful_width REAL,
+            length_m REAL
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jumbos_material "
+        "ON jumbos(material_code, useful_width, length_m)"
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jumbo_ledger(
+            id INTEGER PRIMARY KEY,
+            stock_number TEXT,
+            partition TEXT,
+            history_id INTEGER,
+            big_roll_length REAL,
+            used_length_m REAL,
+            remaining_m REAL
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jumbo_ledger_stock ON jumbo_ledger(stock_number)"
+    )
+
+
+def init_jumbo_db(db_path=None):
+    # Jumbo inventory stays in the main database even when history is partitioned.
     if db_path is None:
         db_path = get_history_db_path()
-    conn = sqlite3.connect(db_path)
+    _run_write(db_path, _create_jumbo_schema)
+
+
+def upsert_jumbos(jumbos, db_path=None):
+    if db_path is None:
+        db_path = get_history_db_path()
+    rows = [
+        (
+            jumbo["stock_number"],
+            jumbo["material_code"],
+            jumbo["material_width"],
+            jumbo["useful_width"],
+            jumbo["length_m"],
+        )
+        for jumbo in jumbos
+    ]
+    _run_write(
+        db_path,
+        lambda cur: cur.executemany(
+            """
+            INSERT INTO jumbos(stock_number, material_code, material_width, useful_width, length_m)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(stock_number) DO UPDATE SET
+                material_code=excluded.material_code,
+                material_width=excluded.material_width,
+                useful_width=excluded.useful_width,
+                length_m=excluded.length_m
+            """,
+            rows,
+        ),
+    )
+
+
+def fetch_jumbos(material_code=None, db_path=None):
+    if db_path is None:
+        db_path = get_history_db_path()
+    conn = _connect(db_path)
     cur = conn.cursor()
-    cur.execute("DELETE FROM history")
-    conn.commit()
+    query = "SELECT stock_number, material_code, material_width, useful_width, length_m FROM jumbos"
+    params = ()
+    if material_code is not None:
+        query += " WHERE material_code = ?"
+        params = (material_code,)
+    cur.execute(query, params)
+    rows = [
+        {
+            "stock_number": stock_number,
+            "material_code": code,
+            "material_width": material_width,
+            "useful_width": useful_width,
+            "length_m": length_m,
+        }
+        for stock_number, code, material_width, useful_width, length_m in cur.fetchall()
+    ]
+    conn.close()
+    return rows
+
+
+def get_jumbo(stock_number, db_path=None):
+    if db_path is None:
+        db_path = get_history_db_path()
+    conn = _connect(db_path)
+    row = conn.execute(
+        """
+        SELECT material_code, material_width, useful_width, length_m
+        FROM jumbos
+        WHERE stock_number = ?
+        """,
+        (stock_number,),
+    ).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return {
+        "stock_number": stock_number,
+        "material_code": row[0],
+        "material_width": row[1],
+        "useful_width": row[2],
+        "length_m": row[3],
+    }
+
+
+def fetch_jumbo_ledger(stock_number, db_path=None):
+    if db_path is None:
+        db_path = get_history_db_path()
+    conn = _connect(db_path)
+    rows = conn.execute(
+        """
+        SELECT partition, history_id, big_roll_length, used_length_m, remaining_m
+        FROM jumbo_ledger
+        WHERE stock_number = ?
+        ORDER BY id
+        """,
+        (stock_number,),
+    ).fetchall()
     conn.close()
+    return rows
+
+
+def get_ledger_remaining(stock_number, db_path=None):
+    if db_path is None:
+        db_path = get_history_db_path()
+    conn = _connect(db_path)
+    row = conn.execute(
+        """
+        SELECT remaining_m FROM jumbo_ledger
+        WHERE stock_number = ?
+        ORDER BY id DESC
+        LIMIT 1
+        """,
+        (stock_number,),
+    ).fetchone()
+    conn.close()
+    return None if row is None else row[0]
+
+
+def delete_jumbo(stock_number, db_path=None):
+    if db_path is None:
+        db_path = get_history_db_path()
+    _run_write(
+        db_path,
+        lambda cur: cur.execute("DELETE FROM jumbos WHERE stock_number = ?", (stock_number,)),
+    )
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+def get_backup_dir():
+    path = os.path.join(get_data_dir(), BACKUP_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def backup_history(dest_path, db_path=None, progress=None, compress=False):
+    if db_path is None:
+        db_path = _default_write_path()
+    if compress and not dest_path.endswith(".gz"):
+        dest_path = f"{dest_path}.gz"
+    tmp_path = f"{dest_path}.tmp"
+    raw_path = f"{tmp_path}.db" if compress else tmp_path
+
+    restarts = [0, None]
+
+    def step(status, remaining, total):
+        # A write from another connection restarts the copy; remaining pages jump back up.
+        if restarts[1] is not None and remaining > restarts[1]:
+            restarts[0] += 1
+            if restarts[0] > BACKUP_MAX_RESTARTS:
+                raise _BackupRestarted()
+        restarts[1] = remaining
+        if progress is not None:
+            progress(status, remaining, total)
+        if remaining:
+            # backup() sleeps only after a busy step; pause here so writers get the lock.
+            time.sleep(BACKUP_STEP_SLEEP_S)
+
+    # Each step holds the read lock only while it copies; writers wait at most
+    # one step on the busy timeout. The journal is not WAL (the database may
+    # sit on a share), so a one-pass copy or VACUUM INTO would lock them out
+    # for the whole copy instead.
+    deadline = time.monotonic() + BACKUP_BUDGET_S
+    pages = BACKUP_PAGES_PER_STEP
+    source = _connect(db_path)
+    target = sqlite3.connect(raw_path)
+    try:
+        try:
+            while True:
+                try:
+                    source.backup(target, pages=pages, progress=step, sleep=BACKUP_STEP_SLEEP_S)
+                    break
+                except _BackupRestarted:
+                    if time.monotonic() >= deadline:
+                        raise sqlite3.OperationalError(
+                            f"Backup of {db_path} kept restarting under concurrent writes"
+                        )
+                    # Larger steps shorten the copy so it can fit between two writes.
+                    pages = min(pages * 2, BACKUP_MAX_PAGES_PER_STEP)
+                    restarts[:] = [0, None]
+        finally:
+            target.close()
+            source.close()
+    except sqlite3.Error:
+        os.remove(raw_path)
+        raise
+
+    if compress:
+        with open(raw_path, "rb") as src, gzip.open(tmp_path, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(raw_path)
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+def _prune_backups(backup_dir, keep):
+    backups = sorted(
+        (name for name in os.listdir(backup_dir) if name.startswith("history_")),
+        reverse=True,
+    )
+    stamps = []
+    for name in backups:
+        stamp = name.split("__", 1)[0]
+        if stamp not in stamps:
+            stamps.append(stamp)
+    for name in backups:
+        if name.split("__", 1)[0] not in stamps[:keep]:
+            os.remove(os.path.join(backup_dir, name))
+
+
+def backup_all_history(backup_dir=None, compress=True, progress=None, keep=BACKUP_KEEP):
+    if backup_dir is None:
+        backup_dir = get_backup_dir()
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime("history_%Y%m%d_%H%M%S")
+    if history_partitioned():
+        sources = [(name, get_partition_path(name)) for name in list_partitions()]
+    else:
+        sources = [("main", get_history_db_path())]
+
+    written = []
+    for name, path in sources:
+        dest_path = os.path.join(backup_dir, f"{stamp}__{name}.db")
+        written.append(backup_history(dest_path, path, progress, compress))
+    _prune_backups(backup_dir, keep)
+    return written
@@ -0,0 +1,104 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app.db import count_history, fetch_history, init_history_db, insert_history
+
+
+def _sample_record(writer_id, index):
+    return {
+        "timestamp": time.strftime("%H:%M"),
+        "stock_number": f"{writer_id:03d}/{index % 10000:04d}",
+        "material_code": f"W{writer_id}",
+        "material_width": 910,
+        "useful_width": 900,
+        "big_roll_length": 6000,
+        "roll_width": 150,
+        "roll_length": 500,
+        "main_count": 6,
+        "additional_width": 0,
+        "total_rolls": 60,
+        "used_length_m": 5010,
+        "surplus_rolls": 0,
+        "surplus_main_rolls": 0,
+        "surplus_additional_rolls": 0,
+        "total_area": 4559.1,
+        "useful_area": 4500.0,
+        "waste_area": 59.1,
+        "waste_percent": 1.3,
+    }
+
+
+def _writer(db_path, writer_id, count, errors):
+    for index in range(count):
+        try:
+            insert_history(_sample_record(writer_id, index), db_path)
+        except Exception as exc:
+            errors.put(f"writer {writer_id}: {exc}")
+
+
+def _reader(db_path, reader_id, stop, errors, reads):
+    done = 0
+    while not stop.is_set():
+        try:
+            fetch_history(limit=20, db_path=db_path)
+            count_history(db_path)
+            done += 1
+        except Exception as exc:
+            errors.put(f"reader {reader_id}: {exc}")
+    reads.put(done)
+
+
+def run_stress(db_path, writers=4, readers=2, records_per_writer=250):
+    init_history_db(db_path)
+    start_count = count_history(db_path)
+    errors = multiprocessing.Queue()
+    reads = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+
+    reader_procs = [
+        multiprocessing.Process(target=_reader, args=(db_path, i, stop, errors, reads))
+        for i in range(readers)
+    ]
+    writer_procs = [
+        multiprocessing.Process(target=_writer, args=(db_path, i, records_per_writer, errors))
+        for i in range(writers)
+    ]
+    started = time.perf_counter()
+    for proc in reader_procs + writer_procs:
+        proc.start()
+    for proc in writer_procs:
+        proc.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for proc in reader_procs:
+        proc.join()
+
+    failures = []
+    while not errors.empty():
+        failures.append(errors.get())
+    total_reads = sum(reads.get() for _ in reader_procs)
+    inserted = count_history(db_path) - start_count
+    expected = writers * records_per_writer
+    return {
+        "inserted": inserted,
+        "expected": expected,
+        "writes_per_s": round(inserted / elapsed, 1) if elapsed else None,
+        "reads": total_reads,
+        "errors": failures,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--records", type=int, default=250)
+    args = parser.parse_args()
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "history_stress.db")
+    report = run_stress(db_path, args.writers, args.readers, args.records)
+    for key, value in report.items():
+        print(f"{key}: {value}")
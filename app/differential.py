@@ -0,0 +1,232 @@
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from app import calculator_logic, fixed_point
+from app.calculator_logic import (
+    MAX_BIG_ROLL_LENGTH_M,
+    RANGE_MATERIAL_WIDTH,
+    RANGE_ROLL_LENGTH,
+    RANGE_ROLL_WIDTH,
+    SETUP_LENGTH_M,
+)
+
+ABS_TOLERANCE = 1e-6
+REL_TOLERANCE = 1e-9
+CHUNK_SIZE = 20_000
+MAX_REPORTED = 20
+INPUT_NAMES = (
+    "material_width_mm",
+    "useful_width_mm",
+    "roll_width_mm",
+    "roll_length_m",
+    "big_roll_length_m",
+    "order_rolls",
+    "additional_width_mm",
+)
+
+
+@contextmanager
+def _without_layout_table():
+    original = calculator_logic.get_layout_table
+    calculator_logic.get_layout_table = lambda: None
+    try:
+        yield
+    finally:
+        calculator_logic.get_layout_table = original
+
+
+def reference_calculate(*args):
+    with _without_layout_table():
+        return calculator_logic.calculate(*args)
+
+
+def _layout_table_calculate(*args):
+    return calculator_logic.calculate(*args)
+
+
+CANDIDATES = {
+    "layout_table": _layout_table_calculate,
+    "fixed_point": fixed_point.calculate_fixed,
+}
+# The fixed-point engine rounds exact decimal values, so a displayed area or
+# percent may differ by one unit where the float value only looks like a tie.
+DISPLAY_ROUNDING = {
+    key: 0.1 + ABS_TOLERANCE
+    for key in ("total_area_m2", "useful_area_m2", "waste_area_m2", "waste_percent")
+}
+TOLERANCES = {
+    "fixed_point": DISPLAY_ROUNDING,
+}
+
+
+def _width(rng, low, high):
+    # Half the draws sit on the integer grid, the rest on the 0.1 mm grid.
+    if rng.random() < 0.5:
+        return float(rng.randint(math.ceil(low), math.floor(high)))
+    return round(rng.uniform(low, high), 1)
+
+
+def generate_case(rng, invalid_ratio=0.1):
+    material = _width(rng, *RANGE_MATERIAL_WIDTH)
+    useful = _width(rng, RANGE_ROLL_WIDTH[0], material)
+    roll_width = _width(rng, *RANGE_ROLL_WIDTH)
+    roll_length = float(rng.randint(*RANGE_ROLL_LENGTH))
+    big_length = float(rng.randint(int(roll_length) + SETUP_LENGTH_M, MAX_BIG_ROLL_LENGTH_M))
+    order_rolls = rng.randint(1, 5000)
+    additional = None
+    if rng.random() < 0.1:
+        additional = _width(rng, *RANGE_ROLL_WIDTH)
+    case = [material, useful, roll_width, roll_length, big_length, order_rolls, additional]
+
+    if rng.random() < invalid_ratio:
+        index = rng.randrange(6)
+        case[index] = rng.choice([0, -1.0, case[index] * 10, case[index] / 100])
+    return tuple(case)
+
+
+def _outcome(func, case):
+    try:
+        return "ok", func(*case)
+    except ValueError as exc:
+        return "error", str(exc)
+
+
+def _values_match(left, right, abs_tol=ABS_TOLERANCE):
+    if isinstance(left, bool) or isinstance(right, bool) or left is None or right is None:
+        return left == right
+    if isinstance(left, (int, float)) and isinstance(right, (int, float)):
+        return math.isclose(left, right, rel_tol=REL_TOLERANCE, abs_tol=abs_tol)
+    return left == right
+
+
+def diff_outcomes(expected, actual, tolerances=None):
+    tolerances = tolerances or {}
+    if expected[0] != actual[0]:
+        return [("outcome", expected, actual)]
+    if expected[0] == "error":
+        return [] if expected[1] == actual[1] else [("error", expected[1], actual[1])]
+    differences = []
+    for key in sorted(set(expected[1]) | set(actual[1])):
+        left = expected[1].get(key)
+        right = actual[1].get(key)
+        if not _values_match(left, right, tolerances.get(key, ABS_TOLERANCE)):
+            differences.append((key, left, right))
+    return differences
+
+
+def _mismatches(candidate, case, tolerances=None):
+    return diff_outcomes(
+        _outcome(reference_calculate, case), _outcome(candidate, case), tolerances
+    )
+
+
+def minimize_case(candidate, case, tolerances=None):
+    # Greedily simplify each input while the mismatch persists.
+    case = list(case)
+    changed = True
+    while changed:
+        changed = False
+        for index, value in enumerate(case):
+            if value is None:
+                continue
+            for simpler in (None if index == 6 else value, round(value), round(value, -1)):
+                if simpler == value:
+                    continue
+                trial = case[:index] + [simpler] + case[index + 1:]
+                if _mismatches(candidate, tuple(trial), tolerances):
+                    case = trial
+                    value = simpler
+                    changed = True
+                    break
+    return tuple(case)
+
+
+def _run_chunk(candidate_name, seed, chunk_index, count, invalid_ratio):
+    candidate = CANDIDATES[candidate_name]
+    tolerances = TOLERANCES.get(candidate_name)
+    rng = random.Random(f"{seed}:{chunk_index}")
+    found = []
+    mismatch_count = 0
+    for _ in range(count):
+        case = generate_case(rng, invalid_ratio)
+        differences = _mismatches(candidate, case, tolerances)
+        if differences:
+            mismatch_count += 1
+            if len(found) < MAX_REPORTED:
+                found.append((case, differences))
+    return mismatch_count, found
+
+
+def run_differential(
+    candidate_name,
+    count=1_000_000,
+    seed=0,
+    workers=None,
+    invalid_ratio=0.1,
+    chunk_size=CHUNK_SIZE,
+):
+    if candidate_name not in CANDIDATES:
+        raise ValueError(f"Unknown candidate: {candidate_name}")
+    chunks = [
+        (index, min(chunk_size, count - start))
+        for index, start in enumerate(range(0, count, chunk_size))
+    ]
+    started = time.perf_counter()
+    mismatch_count = 0
+    samples = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(_run_chunk, candidate_name, seed, index, size, invalid_ratio)
+            for index, size in chunks
+        ]
+        for future in futures:
+            chunk_mismatches, found = future.result()
+            mismatch_count += chunk_mismatches
+            samples.extend(found[: MAX_REPORTED - len(samples)])
+    elapsed = time.perf_counter() - started
+
+    candidate = CANDIDATES[candidate_name]
+    tolerances = TOLERANCES.get(candidate_name)
+    reproducers = []
+    for case, differences in samples:
+        minimized = minimize_case(candidate, case, tolerances)
+        reproducers.append(
+            {
+                "inputs": dict(zip(INPUT_NAMES, minimized)),
+                "differences": _mismatches(candidate, minimized, tolerances) or differences,
+            }
+        )
+    return {
+        "candidate": candidate_name,
+        "cases": count,
+        "cases_per_s": round(count / elapsed) if elapsed else None,
+        "mismatches": mismatch_count,
+        "reproducers": reproducers,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("candidate", choices=sorted(CANDIDATES))
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--invalid-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+
+    report = run_differential(
+        args.candidate, args.count, args.seed, args.workers, args.invalid_ratio
+    )
+    print(
+        f"{report['candidate']}: {report['cases']} cases, "
+        f"{report['cases_per_s']} cases/s, {report['mismatches']} mismatches"
+    )
+    for reproducer in report["reproducers"]:
+        print(reproducer["inputs"])
+        for key, expected, actual in reproducer["differences"]:
+            print(f"    {key}: expected {expected!r}, got {actual!r}")
@@ -0,0 +1,260 @@
+from fractions import Fraction
+
+from app import calculator_logic
+from app.rate_tables import get_rate_table
+
+# Widths in tenths of a millimetre, lengths in centimetres, so a width times
+# a length is a whole square millimetre. Inputs are decimal values, and here
+# they stay exact: where calculate's floats miss an exact multiple or round
+# a tie up past the useful width, this engine deliberately disagrees.
+WIDTH_SCALE = 10
+LENGTH_SCALE = 100
+AREA_PER_M2 = 1_000_000
+RAW_KEYS = (
+    "material_width",
+    "useful_width",
+    "roll_width_input",
+    "roll_width",
+    "roll_length",
+    "big_roll_length",
+    "order_rolls",
+    "main_count",
+    "remaining_width",
+    "additional_width",
+    "was_adjusted",
+    "cycles_needed",
+    "cycles_used",
+    "used_length",
+    "length_count",
+    "length_waste",
+    "total_main_rolls",
+    "total_additional_rolls",
+    "surplus_main_rolls",
+    "surplus_additional_rolls",
+    "shortage_rolls",
+    "total_area",
+    "useful_area",
+    "waste_area",
+    "waste_tenths_percent",
+)
+
+
+def to_width(value_mm):
+    return round(float(value_mm) * WIDTH_SCALE)
+
+
+def to_length(value_m):
+    return round(float(value_m) * LENGTH_SCALE)
+
+
+def _div_round(numerator, denominator, half_down=False):
+    # Exact ties go to the even neighbour like round(), or down when asked;
+    # unlike floats, the result never depends on binary representation.
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if 2 * remainder > denominator or (
+        2 * remainder == denominator and not half_down and quotient % 2
+    ):
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def layout_fixed(useful_width, roll_width):
+    low = calculator_logic.RANGE_ROLL_WIDTH[0] * WIDTH_SCALE
+    high = calculator_logic.RANGE_ROLL_WIDTH[1] * WIDTH_SCALE
+    main_count = useful_width // roll_width
+    remaining_width = useful_width - main_count * roll_width
+
+    if not (low <= remaining_width <= high) or main_count < 1:
+        return roll_width, main_count, remaining_width, False
+
+    # width >= roll * (1 - reduction) compared exactly as reduction = num / den.
+    reduction = Fraction(str(calculator_logic.MAX_ROLL_WIDTH_REDUCTION))
+    keep = reduction.denominator - reduction.numerator
+    adjusted_count = main_count + 1
+    if (
+        useful_width * reduction.denominator < roll_width * keep * adjusted_count
+        or not (low * adjusted_count <= useful_width <= high * adjusted_count)
+    ):
+        return roll_width, main_count, remaining_width, False
+
+    # A tie rounds down so the slits never add up past the useful width.
+    adjusted_width = _div_round(useful_width, adjusted_count, half_down=True)
+    if adjusted_width * reduction.denominator < roll_width * keep:
+        return roll_width, main_count, remaining_width, False
+    return adjusted_width, adjusted_count, useful_width - adjusted_count * adjusted_width, True
+
+
+def calculate_raw(
+    material_width_mm,
+    useful_width_mm,
+    roll_width_mm,
+    roll_length_m,
+    big_roll_length_m,
+    order_rolls,
+    additional_width_mm=None,
+    machine=None,
+):
+    calculator_logic._validate_inputs(
+        material_width_mm,
+        useful_width_mm,
+        roll_width_mm,
+        roll_length_m,
+        big_roll_length_m,
+    )
+    if order_rolls is None or int(order_rolls) <= 0:
+        raise ValueError("Количество рулонов в заказе должно быть больше нуля.")
+    order_rolls = int(order_rolls)
+
+    material_width = to_width(material_width_mm)
+    useful_width = to_width(useful_width_mm)
+    roll_width_input = to_width(roll_width_mm)
+    roll_length = to_length(roll_length_m)
+    big_roll_length = to_length(big_roll_length_m)
+    setup_length = to_length(calculator_logic.SETUP_LENGTH_M)
+
+    additional_override = None
+    if additional_width_mm is not None:
+        try:
+            additional_override = to_width(additional_width_mm)
+        except (TypeError, ValueError):
+            raise ValueError("Некорректный доп. размер.")
+        if additional_override <= 0:
+            additional_override = None
+        elif not (
+            calculator_logic.RANGE_ROLL_WIDTH[0] * WIDTH_SCALE
+            <= additional_override
+            <= calculator_logic.RANGE_ROLL_WIDTH[1] * WIDTH_SCALE
+        ):
+            raise ValueError("Доп. размер должен быть от 20 до 310 мм.")
+
+    if additional_override is None:
+        roll_width, main_count, remaining_width, was_adjusted = layout_fixed(
+            useful_width, roll_width_input
+        )
+    else:
+        roll_width = roll_width_input
+        main_count = useful_width // roll_width
+        remaining_width = useful_width - main_count * roll_width
+        was_adjusted = False
+
+    additional_width = 0
+    if additional_override is not None:
+        if additional_override > remaining_width:
+            raise ValueError(
+                f"Доп. размер {additional_override / WIDTH_SCALE:.1f} мм "
+                f"больше остатка {remaining_width / WIDTH_SCALE:.1f} мм."
+            )
+        additional_width = additional_override
+    elif (not was_adjusted) and (
+        calculator_logic.RANGE_ROLL_WIDTH[0] * WIDTH_SCALE
+        <= remaining_width
+        <= calculator_logic.RANGE_ROLL_WIDTH[1] * WIDTH_SCALE
+    ):
+        additional_width = remaining_width
+
+    available_length = big_roll_length - setup_length
+    if available_length < roll_length:
+        raise ValueError("Недостаточная длина большого рулона с учетом 10 м расхода.")
+    length_count, length_waste = divmod(available_length, roll_length)
+
+    if main_count <= 0:
+        raise ValueError("Недостаточно ширины для нарезки рулонов.")
+
+    cycles_needed = -(-order_rolls // main_count)
+    cycles_used = min(cycles_needed, length_count)
+
+    total_main_rolls = main_count * cycles_used
+    total_additional_rolls = cycles_used if additional_width else 0
+    shortage_rolls = max(0, order_rolls - total_main_rolls)
+
+    used_length = cycles_used * roll_length + setup_length
+    if shortage_rolls > 0:
+        used_length = big_roll_length
+
+    total_area = material_width * used_length
+    useful_area = (main_count * roll_width + additional_width) * cycles_used * roll_length
+    waste_area = total_area - useful_area
+    waste_tenths_percent = _div_round(waste_area * 1000, total_area) if total_area > 0 else 0
+
+    return {
+        "material_width": material_width,
+        "useful_width": useful_width,
+        "roll_width_input": roll_width_input,
+        "roll_width": roll_width,
+        "roll_length": roll_length,
+        "big_roll_length": big_roll_length,
+        "order_rolls": order_rolls,
+        "main_count": main_count,
+        "remaining_width": remaining_width,
+        "additional_width": additional_width,
+        "was_adjusted": was_adjusted,
+        "cycles_needed": cycles_needed,
+        "cycles_used": cycles_used,
+        "used_length": used_length,
+        "length_count": length_count,
+        "length_waste": length_waste,
+        "total_main_rolls": total_main_rolls,
+        "total_additional_rolls": total_additional_rolls,
+        "surplus_main_rolls": max(0, total_main_rolls - order_rolls),
+        "surplus_additional_rolls": total_additional_rolls,
+        "shortage_rolls": shortage_rolls,
+        "total_area": total_area,
+        "useful_area": useful_area,
+        "waste_area": waste_area,
+        "waste_tenths_percent": waste_tenths_percent,
+        "machine": machine,
+    }
+
+
+def raw_key(raw):
+    # Plain integers and the machine name: stable for hashing and cache keys.
+    return tuple(raw[key] for key in RAW_KEYS) + (raw["machine"],)
+
+
+def to_result(raw):
+    roll_width_mm = raw["roll_width"] / WIDTH_SCALE
+    roll_length_m = raw["roll_length"] / LENGTH_SCALE
+    cycles_per_hour = get_rate_table(raw["machine"]).cycles_per_hour(roll_width_mm, roll_length_m)
+    estimated_hours = raw["cycles_needed"] / cycles_per_hour if cycles_per_hour else None
+    edge_waste = raw["material_width"] - raw["useful_width"]
+    additional_width_mm = raw["additional_width"] / WIDTH_SCALE if raw["additional_width"] else None
+    area_tenths = AREA_PER_M2 // 10
+    surplus_rolls = raw["surplus_main_rolls"] + raw["surplus_additional_rolls"]
+    return {
+        "material_width_mm": raw["material_width"] / WIDTH_SCALE,
+        "useful_width_mm": raw["useful_width"] / WIDTH_SCALE,
+        "roll_width_input_mm": raw["roll_width_input"] / WIDTH_SCALE,
+        "roll_width_mm": roll_width_mm,
+        "roll_length_m": roll_length_m,
+        "big_roll_length_m": raw["big_roll_length"] / LENGTH_SCALE,
+        "order_rolls": raw["order_rolls"],
+        "main_count": raw["main_count"],
+        "remaining_width_mm": raw["remaining_width"] / WIDTH_SCALE,
+        "additional_width_mm": additional_width_mm,
+        "was_adjusted": raw["was_adjusted"],
+        "rolls_per_cycle": raw["main_count"],
+        "cycles_needed": raw["cycles_needed"],
+        "cycles_used": raw["cycles_used"],
+        "cycles_per_hour": cycles_per_hour,
+        "estimated_hours": estimated_hours,
+        "used_length_m": raw["used_length"] / LENGTH_SCALE,
+        "length_count": raw["length_count"],
+        "length_waste_m": raw["length_waste"] / LENGTH_SCALE,
+        "total_main_rolls": raw["total_main_rolls"],
+        "total_additional_rolls": raw["total_additional_rolls"],
+        "total_rolls": raw["total_main_rolls"] + raw["total_additional_rolls"],
+        "surplus_rolls": surplus_rolls,
+        "surplus_main_rolls": raw["surplus_main_rolls"],
+        "surplus_additional_rolls": raw["surplus_additional_rolls"],
+        "shortage_rolls": raw["shortage_rolls"],
+        "total_area_m2": _div_round(raw["total_area"], area_tenths) / 10,
+        "useful_area_m2": _div_round(raw["useful_area"], area_tenths) / 10,
+        "waste_area_m2": _div_round(raw["waste_area"], area_tenths) / 10,
+        "waste_percent": raw["waste_tenths_percent"] / 10,
+        "waste_per_side_mm": edge_waste / (2 * WIDTH_SCALE) if edge_waste > 0 else 0,
+        "machine": raw["machine"],
+    }
+
+
+def calculate_fixed(*args, **kwargs):
+    return to_result(calculate_raw(*args, **kwargs))
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import random
+import time
+from bisect import bisect_left
+
+from app.calculator_logic import (
+    MAX_BIG_ROLL_LENGTH_M,
+    RANGE_MATERIAL_WIDTH,
+    RANGE_ROLL_WIDTH,
+    SETUP_LENGTH_M,
+    calculate,
+)
+from app.db import fetch_jumbos, init_jumbo_db, upsert_jumbos
+
+
+class JumboIndex:
+    def __init__(self, jumbos=()):
+        # material code -> (material width, useful width) -> jumbos sorted by length.
+        # Jumbos of one width pair share a layout, so each group needs only a
+        # couple of calculate calls whatever its size.
+        groups = {}
+        for jumbo in jumbos:
+            # Used-up jumbos stay in the ledger at zero length. Drop them and any
+            # length calculate() rejects before grouping; otherwise one bad
+            # longest jumbo would take its whole group out of the ranking.
+            length_m = jumbo["length_m"]
+            if length_m is None or not 0 < length_m <= MAX_BIG_ROLL_LENGTH_M:
+                continue
+            widths = (float(jumbo["material_width"]), float(jumbo["useful_width"]))
+            groups.setdefault(jumbo["material_code"], {}).setdefault(widths, []).append(jumbo)
+        self._groups = {}
+        for material_code, by_widths in groups.items():
+            self._groups[material_code] = {}
+            for widths, members in by_widths.items():
+                members.sort(key=lambda jumbo: (jumbo["length_m"], jumbo["stock_number"]))
+                lengths = [float(jumbo["length_m"]) for jumbo in members]
+                self._groups[material_code][widths] = (lengths, members)
+
+    def __len__(self):
+        return sum(
+            len(members)
+            for by_widths in self._groups.values()
+            for _, members in by_widths.values()
+        )
+
+    def _group_best(self, widths, lengths, members, roll_width, roll_length, order_rolls, machine):
+        material_width, useful_width = widths
+
+        def evaluate(index):
+            return calculate(
+                material_width,
+                useful_width,
+                roll_width,
+                roll_length,
+                lengths[index],
+                order_rolls,
+                None,
+                machine,
+            )
+
+        # The longest jumbo gives the most cycles any jumbo of the group can run.
+        # Jumbos that reach the same cycle count share the shortage, and waste
+        # only grows with unused length, so the shortest of them is the best.
+        longest = evaluate(len(lengths) - 1)
+        needed_m = longest["cycles_used"] * roll_length + SETUP_LENGTH_M
+        index = bisect_left(lengths, needed_m)
+        while index < len(lengths) - 1:
+            result = evaluate(index)
+            if result["shortage_rolls"] == longest["shortage_rolls"]:
+                return result, members[index]
+            index += 1
+        return longest, members[-1]
+
+    def best_jumbos(self, material_code, roll_width, roll_length, order_rolls, machine=None, limit=1):
+        ranked = []
+        for widths, (lengths, members) in self._groups.get(material_code, {}).items():
+            if widths[1] < roll_width:
+                continue
+            try:
+                result, jumbo = self._group_best(
+                    widths, lengths, members, roll_width, roll_length, order_rolls, machine
+                )
+            except ValueError:
+                continue
+            ranked.append(
+                (
+                    (result["shortage_rolls"], result["waste_percent"], jumbo["length_m"]),
+                    jumbo,
+                    result,
+                )
+            )
+        ranked.sort(key=lambda item: item[0])
+        return [(jumbo, result) for _, jumbo, result in ranked[:limit]]
+
+    def best_jumbo(self, material_code, roll_width, roll_length, order_rolls, machine=None):
+        best = self.best_jumbos(material_code, roll_width, roll_length, order_rolls, machine)
+        return best[0] if best else (None, None)
+
+
+def load_jumbo_index(material_code=None, db_path=None):
+    return JumboIndex(fetch_jumbos(material_code, db_path))
+
+
+def import_jumbos(csv_path, db_path=None):
+    jumbos = []
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            jumbos.append(
+                {
+                    "stock_number": row["stock_number"],
+                    "material_code": row["material_code"],
+                    "material_width": float(row["material_width"]),
+                    "useful_width": float(row["useful_width"]),
+                    "length_m": float(row["length_m"]),
+                }
+            )
+    init_jumbo_db(db_path)
+    upsert_jumbos(jumbos, db_path)
+    return len(jumbos)
+
+
+def _brute_force(jumbos, roll_width, roll_length, order_rolls):
+    best = None
+    for jumbo in jumbos:
+        try:
+            result = calculate(
+                jumbo["material_width"],
+                jumbo["useful_width"],
+                roll_width,
+                roll_length,
+                jumbo["length_m"],
+                order_rolls,
+            )
+        except ValueError:
+            continue
+        key = (result["shortage_rolls"], result["waste_percent"], jumbo["length_m"])
+        if best is None or key < best[0]:
+            best = (key, jumbo)
+    return best
+
+
+def _benchmark(count=30_000, seed=0):
+    rng = random.Random(seed)
+    widths = [(float(w), float(w - rng.choice((10, 20, 30)))) for w in range(*RANGE_MATERIAL_WIDTH, 10)]
+    jumbos = []
+    for number in range(count):
+        material_width, useful_width = rng.choice(widths)
+        jumbos.append(
+            {
+                "stock_number": f"{number % 1000:03d}/{2020 + number // 1000}",
+                "material_code": "A",
+                "material_width": material_width,
+                "useful_width": useful_width,
+                "length_m": float(rng.randint(500, MAX_BIG_ROLL_LENGTH_M)),
+            }
+        )
+    started = time.perf_counter()
+    index = JumboIndex(jumbos)
+    build_s = time.perf_counter() - started
+
+    order = (rng.uniform(RANGE_ROLL_WIDTH[0], 200), float(rng.randint(100, 500)), 600)
+    started = time.perf_counter()
+    jumbo, result = index.best_jumbo("A", *order)
+    search_s = time.perf_counter() - started
+    started = time.perf_counter()
+    brute = _brute_force(jumbos, *order)
+    brute_s = time.perf_counter() - started
+
+    print(f"{count} jumbos: build {build_s * 1000:.0f} ms")
+    print(f"index search: {search_s * 1000:.1f} ms -> {jumbo['stock_number']}, {result['waste_percent']}%")
+    print(f"full scan: {brute_s * 1000:.0f} ms -> {brute[1]['stock_number']}, {brute[0][1]}%")
+    print(f"same choice: {brute[0] == (result['shortage_rolls'], result['waste_percent'], jumbo['length_m'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("csv")
+    import_parser.add_argument("--db", default=None)
+    bench_parser = subparsers.add_parser("bench")
+    bench_parser.add_argument("--count", type=int, default=30_000)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        print(f"{import_jumbos(args.csv, args.db)} jumbos imported")
+    else:
+        _benchmark(args.count)
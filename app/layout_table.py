@@ -0,0 +1,200 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+TABLE_FILENAME = "layout_table.bin"
+MAGIC = b"LAYT"
+VERSION = 2
+
+# Header: magic, version, max useful width, roll width range, width reduction,
+# digest of the adjustment rules the entries were computed with.
+HEADER = struct.Struct("<4sHHHHd20s")
+# Entry: main count, adjusted flag, adjusted width in tenths of a millimetre.
+ENTRY = struct.Struct("<BBH")
+
+_table = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def get_layout_table_path():
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), TABLE_FILENAME)
+
+
+class LayoutTable:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, useful_max, roll_min, roll_max, reduction, rules = HEADER.unpack_from(
+            self._mm, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError("Unsupported layout table format.")
+        self.useful_max = useful_max
+        self.roll_min = roll_min
+        self.roll_max = roll_max
+        self.reduction = reduction
+        self.rules = rules
+        self._roll_span = roll_max - roll_min + 1
+        expected_size = HEADER.size + ENTRY.size * (useful_max + 1) * self._roll_span
+        if len(self._mm) != expected_size:
+            self._mm.close()
+            raise ValueError("Layout table is truncated.")
+
+    def covers(self, useful_max, roll_range, reduction):
+        return (
+            self.useful_max == useful_max
+            and (self.roll_min, self.roll_max) == tuple(roll_range)
+            and self.reduction == reduction
+        )
+
+    def matches(self, useful_max, roll_range, reduction, rules):
+        return self.covers(useful_max, roll_range, reduction) and self.rules == rules
+
+    def lookup(self, useful_width_mm, roll_width_mm):
+        if not (0 <= useful_width_mm <= self.useful_max):
+            return None
+        if not (self.roll_min <= roll_width_mm <= self.roll_max):
+            return None
+        useful = int(useful_width_mm)
+        roll = int(roll_width_mm)
+        if useful != useful_width_mm or roll != roll_width_mm:
+            return None
+        index = useful * self._roll_span + roll - self.roll_min
+        return ENTRY.unpack_from(self._mm, HEADER.size + ENTRY.size * index)
+
+    def close(self):
+        self._mm.close()
+
+
+def _is_current(table):
+    from app.calculator_logic import (
+        MAX_ROLL_WIDTH_REDUCTION,
+        RANGE_MATERIAL_WIDTH,
+        RANGE_ROLL_WIDTH,
+        layout_rules_digest,
+    )
+
+    return table.matches(
+        RANGE_MATERIAL_WIDTH[1], RANGE_ROLL_WIDTH, MAX_ROLL_WIDTH_REDUCTION, layout_rules_digest()
+    )
+
+
+def _load_current_table(path):
+    try:
+        table = LayoutTable(path)
+    except (OSError, ValueError):
+        table = None
+    if table is not None and _is_current(table):
+        return table
+    if table is not None:
+        table.close()
+    if getattr(sys, "frozen", False):
+        # The bundled table is built with the release; never serve a stale one.
+        return None
+    # Missing, or built from other rules: rebuild rather than return old layouts.
+    try:
+        build_layout_table(path)
+        return LayoutTable(path)
+    except (OSError, ValueError):
+        return None
+
+
+def get_layout_table():
+    global _table, _table_loaded
+    if not _table_loaded:
+        # Batch threads may race here; only one of them maps the file.
+        with _table_lock:
+            if not _table_loaded:
+                _table = _load_current_table(get_layout_table_path())
+                _table_loaded = True
+    return _table
+
+
+def build_layout_table(path=None):
+    from app.calculator_logic import (
+        MAX_ROLL_WIDTH_REDUCTION,
+        RANGE_MATERIAL_WIDTH,
+        RANGE_ROLL_WIDTH,
+        _apply_roll_width_adjustment,
+        layout_rules_digest,
+    )
+
+    if path is None:
+        path = get_layout_table_path()
+    useful_max = RANGE_MATERIAL_WIDTH[1]
+    roll_min, roll_max = RANGE_ROLL_WIDTH
+    data = bytearray(
+        HEADER.pack(
+            MAGIC,
+            VERSION,
+            useful_max,
+            roll_min,
+            roll_max,
+            MAX_ROLL_WIDTH_REDUCTION,
+            layout_rules_digest(),
+        )
+    )
+    for useful in range(useful_max + 1):
+        for roll in range(roll_min, roll_max + 1):
+            width, count, _, was_adjusted = _apply_roll_width_adjustment(
+                float(useful), float(roll)
+            )
+            tenths = int(round(width * 10)) if was_adjusted else 0
+            data += ENTRY.pack(count, 1 if was_adjusted else 0, tenths)
+
+    # Per-process temp name: batch workers may rebuild a stale table at once.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _current_rss_kb():
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def measure_layout_table(path=None):
+    if path is None:
+        path = get_layout_table_path()
+    rss_before = _current_rss_kb()
+    started = time.perf_counter()
+    table = LayoutTable(path)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    lookups = 0
+    for useful in range(0, table.useful_max + 1, 7):
+        for roll in range(table.roll_min, table.roll_max + 1):
+            table.lookup(useful, roll)
+            lookups += 1
+    lookup_ns = (time.perf_counter() - started) * 1e9 / lookups
+    rss_after = _current_rss_kb()
+    table.close()
+
+    return {
+        "file_size_kb": os.path.getsize(path) // 1024,
+        "load_ms": round(load_ms, 3),
+        "lookup_ns": round(lookup_ns, 1),
+        "rss_delta_kb": (
+            rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        ),
+    }
+
+
+if __name__ == "__main__":
+    if "--measure" in sys.argv[1:]:
+        for key, value in measure_layout_table().items():
+            print(f"{key}: {value}")
+    else:
+        print(build_layout_table())
@@ -0,0 +1,166 @@
+import ctypes
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+from app.db import get_data_dir
+
+REPORT_FILENAME = "memory_report.jsonl"
+REPORT_KEEP = 500
+SAMPLE_INTERVAL_MS = 10 * 60 * 1000
+TOP_ALLOCATORS = 10
+RSS_ALERT_BYTES = 200 * 1024 * 1024
+TRACE_FRAMES = 1
+TRACEMALLOC_ENV = "CALCULATOR_TRACEMALLOC"
+
+logger = logging.getLogger(__name__)
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [
+        ("cb", ctypes.c_ulong),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+    ]
+
+
+def get_report_path():
+    return os.path.join(get_data_dir(), REPORT_FILENAME)
+
+
+def tracemalloc_requested():
+    return os.getenv(TRACEMALLOC_ENV) == "1"
+
+
+def current_rss_bytes():
+    if sys.platform == "win32":
+        counters = _ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+        ok = kernel32.K32GetProcessMemoryInfo(
+            ctypes.c_void_p(kernel32.GetCurrentProcess()),
+            ctypes.byref(counters),
+            counters.cb,
+        )
+        return counters.WorkingSetSize if ok else None
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _snapshot():
+    # The monitor's own bookkeeping and imports would otherwise top the diff.
+    return tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        )
+    )
+
+
+class MemoryMonitor:
+    # RSS and object counts are cheap and always sampled. tracemalloc slows
+    # every allocation, so it runs from the start only when asked for and
+    # otherwise switches on at the first alert, to name what keeps growing.
+    def __init__(
+        self,
+        counters=None,
+        report_path=None,
+        rss_alert_bytes=RSS_ALERT_BYTES,
+        top=TOP_ALLOCATORS,
+        trace=None,
+    ):
+        if report_path is None:
+            report_path = get_report_path()
+        if trace is None:
+            trace = tracemalloc_requested()
+        self._counters = counters
+        self._report_path = report_path
+        self._rss_alert_bytes = rss_alert_bytes
+        self._top = top
+        self._trace = trace
+        self._baseline_rss = None
+        self._alerts = 0
+        self._previous = None
+
+    def start(self):
+        self._baseline_rss = current_rss_bytes()
+        if self._trace:
+            self._start_tracing()
+
+    def _start_tracing(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+        self._previous = _snapshot()
+
+    def _top_allocators(self):
+        snapshot = _snapshot()
+        stats = snapshot.compare_to(self._previous, "lineno")[: self._top]
+        self._previous = snapshot
+        return [
+            {
+                "where": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size": stat.size,
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats
+        ]
+
+    def sample(self):
+        rss = current_rss_bytes()
+        growth = None
+        if rss is not None and self._baseline_rss is not None:
+            growth = rss - self._baseline_rss
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "rss": rss,
+            "rss_growth": growth,
+            "counts": self._counters() if self._counters is not None else {},
+            "alert": False,
+        }
+        if self._previous is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            entry["traced"] = current
+            entry["traced_peak"] = peak
+            entry["top"] = self._top_allocators()
+
+        # One alert per further threshold crossed, not one per sample.
+        if growth is not None and growth >= self._rss_alert_bytes * (self._alerts + 1):
+            self._alerts = growth // self._rss_alert_bytes
+            entry["alert"] = True
+            logger.warning("RSS grew by %.0f MB since start", growth / 1024 / 1024)
+            if self._previous is None:
+                self._start_tracing()
+
+        self._append_report(entry)
+        return entry
+
+    def _append_report(self, entry):
+        try:
+            with open(self._report_path, "r", encoding="utf-8") as f:
+                lines = [line for line in f if line.strip()]
+        except OSError:
+            lines = []
+        lines.append(json.dumps(entry, separators=(",", ":")) + "\n")
+        tmp_path = f"{self._report_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.writelines(lines[-REPORT_KEEP:])
+            os.replace(tmp_path, self._report_path)
+        except OSError as exc:
+            logger.warning("Memory report not saved: %s", exc)
@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+from bisect import bisect_right
+
+from app.db import get_data_dir
+
+RATE_TABLES_FILENAME = "machines.json"
+DEFAULT_MACHINE = "default"
+
+# A break is [value, side]: "ge" starts the next band at the value itself,
+# "gt" keeps the value in the lower band. Rates have one entry per band;
+# null means the parameter does not limit the cycle rate.
+DEFAULT_RATE_TABLES = {
+    DEFAULT_MACHINE: {
+        "width": {
+            "breaks": [[25, "ge"], [45, "ge"], [150, "gt"]],
+            "rates": [None, 11, 12, None],
+        },
+        "length": {
+            "breaks": [[300, "gt"], [450, "gt"], [600, "gt"]],
+            "rates": [12, 11, 10, 8],
+        },
+    }
+}
+_SIDES = {"ge": 0, "gt": 1}
+
+_tables = None
+_tables_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+class RateBands:
+    def __init__(self, breaks, rates):
+        if len(rates) != len(breaks) + 1:
+            raise ValueError("Rate table needs one rate per band.")
+        keys = []
+        for value, side in breaks:
+            if side not in _SIDES:
+                raise ValueError(f"Unknown band side: {side}")
+            keys.append((float(value), _SIDES[side]))
+        if keys != sorted(keys):
+            raise ValueError("Rate table breaks must be sorted.")
+        self.keys = keys
+        self.rates = list(rates)
+
+    def lookup(self, value):
+        # (v, 0) <= (x, 0.5) means x >= v; (v, 1) <= (x, 0.5) means x > v.
+        return self.rates[bisect_right(self.keys, (value, 0.5))]
+
+    def lookup_many(self, values):
+        keys = self.keys
+        rates = self.rates
+        return [rates[bisect_right(keys, (value, 0.5))] for value in values]
+
+    def edges(self):
+        return [value for value, _ in self.keys]
+
+
+class RateTable:
+    def __init__(self, name, spec):
+        self.name = name
+        self.width = RateBands(spec["width"]["breaks"], spec["width"]["rates"])
+        self.length = RateBands(spec["length"]["breaks"], spec["length"]["rates"])
+
+    def cycles_per_hour(self, roll_width_mm, roll_length_m):
+        width_rate = self.width.lookup(roll_width_mm)
+        length_rate = self.length.lookup(roll_length_m)
+        if width_rate is None:
+            return length_rate
+        if length_rate is None:
+            return width_rate
+        return min(width_rate, length_rate)
+
+
+def get_rate_tables_path():
+    return os.path.join(get_data_dir(), RATE_TABLES_FILENAME)
+
+
+def _build_tables(specs):
+    return {name: RateTable(name, spec) for name, spec in specs.items()}
+
+
+def load_rate_tables(path=None, strict=False):
+    # The app falls back to the built-in tables rather than failing to start
+    # over a bad machines.json; replan passes strict=True, since a report
+    # computed against the wrong tables is worse than no report.
+    if path is None:
+        path = get_rate_tables_path()
+    specs = dict(DEFAULT_RATE_TABLES)
+    if not os.path.exists(path):
+        return _build_tables(specs)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        if not isinstance(loaded, dict):
+            raise ValueError("Rate table file must map machine names to tables.")
+        specs.update(loaded)
+        return _build_tables(specs)
+    except (OSError, ValueError, KeyError, TypeError) as exc:
+        if strict:
+            raise
+        logger.error("Rate tables in %s are unusable, using built-in tables: %s", path, exc)
+        return _build_tables(DEFAULT_RATE_TABLES)
+
+
+def set_rate_tables(tables):
+    global _tables
+    _tables = tables
+
+
+def get_rate_tables():
+    global _tables
+    if _tables is None:
+        with _tables_lock:
+            if _tables is None:
+                _tables = load_rate_tables()
+    return _tables
+
+
+def get_rate_table(machine=None):
+    tables = get_rate_tables()
+    if machine is None:
+        machine = DEFAULT_MACHINE
+    table = tables.get(machine)
+    if table is None:
+        raise ValueError(f"Неизвестная машина: {machine}")
+    return table
+
+
+def list_machines():
+    return sorted(get_rate_tables())
@@ -0,0 +1,290 @@
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from app import calculator_logic, rate_tables
+from app.db import _connect, get_history_db_path
+
+CHUNK_SIZE = 2000
+RULE_NAMES = ("MAX_ROLL_WIDTH_REDUCTION", "SETUP_LENGTH_M", "RATE_TABLES")
+REPORT_HEADER = [
+    "id",
+    "stock_number",
+    "material_code",
+    "waste_percent_old",
+    "waste_percent_new",
+    "waste_percent_delta",
+    "total_rolls_old",
+    "total_rolls_new",
+    "total_rolls_delta",
+    "estimated_hours_old",
+    "estimated_hours_new",
+    "estimated_hours_delta",
+    "error",
+]
+
+_worker_rules = {}
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _rules_applied(rules):
+    constants = {name: value for name, value in rules.items() if name != "RATE_TABLES"}
+    saved = {name: getattr(calculator_logic, name) for name in constants}
+    saved_tables = rate_tables.get_rate_tables()
+    for name, value in constants.items():
+        setattr(calculator_logic, name, value)
+    if "RATE_TABLES" in rules:
+        rate_tables.set_rate_tables(rules["RATE_TABLES"])
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(calculator_logic, name, value)
+        rate_tables.set_rate_tables(saved_tables)
+
+
+def _init_worker(rules):
+    _worker_rules.clear()
+    _worker_rules.update(rules)
+    if "RATE_TABLES" in rules:
+        # Rules carry the rate table file path; parse it once per worker.
+        _worker_rules["RATE_TABLES"] = rate_tables.load_rate_tables(rules["RATE_TABLES"], strict=True)
+
+
+def _order_rolls_from_row(row):
+    if row["order_rolls"]:
+        return row["order_rolls"]
+    # Older rows did not store the order size; rebuild it from the stored outcome.
+    # A job that ran short consumed the whole jumbo and hides its order size.
+    if row["used_length_m"] is not None and row["used_length_m"] >= row["big_roll_length"]:
+        return None
+    main_count = row["main_count"] or 0
+    per_cycle = main_count + (1 if row["additional_width"] else 0)
+    if per_cycle <= 0:
+        return None
+    cycles_used = (row["total_rolls"] or 0) // per_cycle
+    order_rolls = main_count * cycles_used - (row["surplus_main_rolls"] or 0)
+    return order_rolls if order_rolls > 0 else None
+
+
+def _delta(new_value, old_value):
+    if new_value is None or old_value is None:
+        return None
+    return round(new_value - old_value, 3)
+
+
+def _replan_row(row):
+    line = [row["id"], row["stock_number"], row["material_code"]]
+    if not row["big_roll_length"]:
+        return line + [None] * 9 + ["missing inputs"]
+    order_rolls = _order_rolls_from_row(row)
+    if order_rolls is None:
+        return line + [None] * 9 + ["order size unknown"]
+    args = [
+        row["material_width"],
+        row["useful_width"],
+        row["roll_width"],
+        row["roll_length"],
+        row["big_roll_length"],
+        order_rolls,
+        None,
+        row["machine"],
+    ]
+    try:
+        baseline = calculator_logic.calculate(*args)
+        stored_additional = row["additional_width"] or None
+        if stored_additional is not None and (
+            baseline["additional_width_mm"] is None
+            or abs(baseline["additional_width_mm"] - stored_additional) > 1e-6
+        ):
+            # The operator entered the additional width; keep it under the new rules too.
+            args[6] = stored_additional
+            baseline = calculator_logic.calculate(*args)
+        with _rules_applied(_worker_rules):
+            replanned = calculator_logic.calculate(*args)
+    except ValueError as exc:
+        return line + [None] * 9 + [str(exc)]
+
+    waste_old = row["waste_percent"]
+    rolls_old = row["total_rolls"]
+    hours_old = baseline["estimated_hours"]
+    return line + [
+        waste_old,
+        replanned["waste_percent"],
+        _delta(replanned["waste_percent"], waste_old),
+        rolls_old,
+        replanned["total_rolls"],
+        _delta(replanned["total_rolls"], rolls_old),
+        hours_old,
+        replanned["estimated_hours"],
+        _delta(replanned["estimated_hours"], hours_old),
+        "",
+    ]
+
+
+def _replan_chunk(rows):
+    return [_replan_row(row) for row in rows]
+
+
+def rules_signature(rules):
+    # The rate table file is hashed by content: editing it changes the rules.
+    digest = hashlib.sha1()
+    for name in sorted(rules):
+        value = rules[name]
+        digest.update(name.encode("utf-8"))
+        if name == "RATE_TABLES":
+            with open(value, "rb") as f:
+                digest.update(f.read())
+        else:
+            digest.update(repr(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _new_checkpoint(rules_hash, db_path):
+    return {"last_id": 0, "report_size": 0, "rules": rules_hash, "db": db_path}
+
+
+def _read_checkpoint(checkpoint_path, rules_hash, db_path, restart):
+    try:
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return _new_checkpoint(rules_hash, db_path)
+    if restart:
+        return _new_checkpoint(rules_hash, db_path)
+    if checkpoint.get("rules") != rules_hash or checkpoint.get("db") != db_path:
+        raise ValueError(
+            f"Checkpoint {checkpoint_path} belongs to a run with other rules or another"
+            " database; use --restart to start over"
+        )
+    return checkpoint
+
+
+def _write_checkpoint(checkpoint_path, checkpoint, last_id, report_size):
+    checkpoint["last_id"] = last_id
+    checkpoint["report_size"] = report_size
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _iter_chunks(db_path, last_id, chunk_size):
+    conn = _connect(db_path)
+    conn.row_factory = lambda cur, values: {
+        column[0]: value for column, value in zip(cur.description, values)
+    }
+    try:
+        while True:
+            rows = conn.execute(
+                """
+                SELECT id, stock_number, material_code, material_width, useful_width,
+                       big_roll_length, roll_width, roll_length, main_count,
+                       additional_width, total_rolls, surplus_main_rolls,
+                       used_length_m, waste_percent, order_rolls, machine
+                FROM history
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+                """,
+                (last_id, chunk_size),
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield last_id, rows
+    finally:
+        conn.close()
+
+
+def replan_history(
+    rules,
+    report_path,
+    checkpoint_path=None,
+    db_path=None,
+    chunk_size=CHUNK_SIZE,
+    workers=None,
+    restart=False,
+):
+    unknown = set(rules) - set(RULE_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown rules: {', '.join(sorted(unknown))}")
+    if "RATE_TABLES" in rules:
+        # Fail here rather than in every worker's initializer.
+        rate_tables.load_rate_tables(rules["RATE_TABLES"], strict=True)
+    if db_path is None:
+        db_path = get_history_db_path()
+    db_path = os.path.abspath(db_path)
+    if checkpoint_path is None:
+        checkpoint_path = f"{report_path}.checkpoint"
+
+    checkpoint = _read_checkpoint(checkpoint_path, rules_signature(rules), db_path, restart)
+    processed = 0
+    with open(report_path, "a+", newline="", encoding="utf-8") as report:
+        # Drop rows written after the last checkpoint so a resumed run has no duplicates.
+        report.truncate(checkpoint["report_size"])
+        report.seek(0, os.SEEK_END)
+        writer = csv.writer(report)
+        if report.tell() == 0:
+            writer.writerow(REPORT_HEADER)
+
+        def drain(pending_chunk):
+            chunk_last_id, future = pending_chunk
+            lines = future.result()
+            writer.writerows(lines)
+            report.flush()
+            _write_checkpoint(checkpoint_path, checkpoint, chunk_last_id, report.tell())
+            return len(lines)
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(rules,)) as pool:
+            in_flight = deque()
+            max_in_flight = (workers or os.cpu_count() or 1) * 2
+            for chunk_last_id, rows in _iter_chunks(db_path, checkpoint["last_id"], chunk_size):
+                in_flight.append((chunk_last_id, pool.submit(_replan_chunk, rows)))
+                if len(in_flight) >= max_in_flight:
+                    processed += drain(in_flight.popleft())
+            while in_flight:
+                processed += drain(in_flight.popleft())
+    if processed == 0 and checkpoint["last_id"]:
+        logger.warning(
+            "No rows after id %s: %s already covers this history; use --restart to redo it",
+            checkpoint["last_id"],
+            report_path,
+        )
+    return processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("report")
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--max-width-reduction", type=float, default=None)
+    parser.add_argument("--setup-length", type=float, default=None)
+    parser.add_argument("--rate-tables", default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--restart", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(format="%(levelname)s: %(message)s")
+
+    rules = {}
+    if args.max_width_reduction is not None:
+        rules["MAX_ROLL_WIDTH_REDUCTION"] = args.max_width_reduction
+    if args.setup_length is not None:
+        rules["SETUP_LENGTH_M"] = args.setup_length
+    if args.rate_tables is not None:
+        rules["RATE_TABLES"] = args.rate_tables
+    count = replan_history(
+        rules, args.report, args.checkpoint, args.db, workers=args.workers, restart=args.restart
+    )
+    print(f"{count} rows replanned")
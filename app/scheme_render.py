@@ -0,0 +1,133 @@
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from app.db import get_data_dir
+
+IMAGE_WIDTH = 900
+IMAGE_HEIGHT = 260
+FONT_FAMILY = "Segoe UI"
+FONT_PIXEL_SIZE = 14
+CACHE_DIRNAME = "scheme_cache"
+FORMATS = ("png", "pdf")
+
+_app = None
+
+
+def get_scheme_cache_dir():
+    path = os.path.join(get_data_dir(), CACHE_DIRNAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def layout_key(result, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, fmt="png"):
+    # Everything the drawing depends on; waste per side follows from the two widths.
+    # The font is read at render time, so a changed font must not reuse cached files.
+    parts = (
+        result["material_width_mm"],
+        result["useful_width_mm"],
+        result["roll_width_mm"],
+        result["main_count"],
+        result["additional_width_mm"] or 0,
+        width,
+        height,
+        fmt,
+        FONT_FAMILY,
+        FONT_PIXEL_SIZE,
+    )
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def _ensure_app():
+    global _app
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtGui import QGuiApplication
+
+    _app = QGuiApplication.instance()
+    if _app is None:
+        _app = QGuiApplication([])
+    return _app
+
+
+def render_scheme(result, path, width=IMAGE_WIDTH, height=IMAGE_HEIGHT):
+    _ensure_app()
+    from PySide6.QtCore import QMarginsF, QSizeF
+    from PySide6.QtGui import QFont, QImage, QPageSize, QPainter, QPdfWriter
+
+    from app.widgets.cutting_scheme import paint_cutting_scheme
+
+    font = QFont(FONT_FAMILY)
+    font.setPixelSize(FONT_PIXEL_SIZE)
+    if path.lower().endswith(".pdf"):
+        writer = QPdfWriter(path)
+        # At 72 dpi one point is one device pixel, so the scheme keeps its on-screen layout.
+        writer.setResolution(72)
+        writer.setPageSize(QPageSize(QSizeF(width, height), QPageSize.Point))
+        writer.setPageMargins(QMarginsF(0, 0, 0, 0))
+        painter = QPainter(writer)
+        paint_cutting_scheme(painter, width, height, result, font)
+        painter.end()
+        return path
+
+    image = QImage(width, height, QImage.Format_ARGB32)
+    painter = QPainter(image)
+    paint_cutting_scheme(painter, width, height, result, font)
+    painter.end()
+    if not image.save(path):
+        raise OSError(f"Cannot write {path}")
+    return path
+
+
+def _render_to_cache(jobs):
+    paths = []
+    for path, result, width, height in jobs:
+        if not os.path.exists(path):
+            root, ext = os.path.splitext(path)
+            # The extension stays last so the writer still picks the right format.
+            tmp_path = f"{root}.{os.getpid()}.tmp{ext}"
+            render_scheme(result, tmp_path, width, height)
+            os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
+
+
+def render_batch(
+    jobs,
+    out_dir,
+    fmt="png",
+    width=IMAGE_WIDTH,
+    height=IMAGE_HEIGHT,
+    workers=None,
+    cache_dir=None,
+    chunk_size=64,
+):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if cache_dir is None:
+        cache_dir = get_scheme_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Identical layouts are drawn once and copied to every job that uses them.
+    cached = {}
+    targets = []
+    for name, result in jobs:
+        key = layout_key(result, width, height, fmt)
+        cache_path = os.path.join(cache_dir, f"{key}.{fmt}")
+        if not os.path.exists(cache_path):
+            cached.setdefault(cache_path, result)
+        targets.append((os.path.join(out_dir, f"{name}.{fmt}"), cache_path))
+
+    pending = [(path, result, width, height) for path, result in cached.items()]
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    if len(chunks) <= 1 or workers == 1:
+        for chunk in chunks:
+            _render_to_cache(chunk)
+    else:
+        with ProcessPoolExecutor(workers, initializer=_ensure_app) as pool:
+            list(pool.map(_render_to_cache, chunks))
+
+    for target, cache_path in targets:
+        shutil.copyfile(cache_path, target)
+    return [target for target, _ in targets]
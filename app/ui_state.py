@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+
+from app.db import get_data_dir
+
+STATE_FILENAME = "ui_state.json"
+FLUSH_DELAY_MS = 1000
+# Preset scheme images live beside the state file, so a flush rewrites
+# only the small JSON and never the PNGs.
+IMAGES_DIRNAME = "preset_images"
+
+logger = logging.getLogger(__name__)
+
+
+def get_ui_state_path():
+    return os.path.join(get_data_dir(), STATE_FILENAME)
+
+
+class UiState:
+    # Keys are "group/name" like QSettings. Changes stay in memory until
+    # flush, so a burst of keystrokes costs one file write.
+    def __init__(self, path=None, on_change=None):
+        if path is None:
+            path = get_ui_state_path()
+        self._path = path
+        self._images_dir = os.path.join(os.path.dirname(path), IMAGES_DIRNAME)
+        self._on_change = on_change
+        self._values = self._load()
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                values = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return values if isinstance(values, dict) else {}
+
+    def exists(self):
+        return os.path.exists(self._path)
+
+    def value(self, key, default=None):
+        return self._values.get(key, default)
+
+    def set_value(self, key, value):
+        if key in self._values and self._values[key] == value:
+            return
+        self._values[key] = value
+        self._changed()
+
+    def child_keys(self, group):
+        prefix = f"{group}/"
+        return [key[len(prefix):] for key in self._values if key.startswith(prefix)]
+
+    def store_image(self, data):
+        # Named by content: a preset saved again gets a new file, and the
+        # state flushed later never points at an image it was not saved with.
+        name = f"{hashlib.sha1(data).hexdigest()}.png"
+        path = os.path.join(self._images_dir, name)
+        if os.path.exists(path):
+            return name
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(self._images_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Preset image not saved: %s", exc)
+            return None
+        return name
+
+    def read_image(self, name):
+        if not name:
+            return None
+        try:
+            with open(os.path.join(self._images_dir, os.path.basename(name)), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def prune_images(self, keep):
+        # Images of presets saved over or recomputed since.
+        try:
+            names = os.listdir(self._images_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith(".png") and name not in keep:
+                try:
+                    os.remove(os.path.join(self._images_dir, name))
+                except OSError:
+                    pass
+
+    def _changed(self):
+        self._dirty = True
+        if self._on_change is not None:
+            self._on_change()
+
+    def flush(self):
+        if not self._dirty:
+            return True
+        # Written aside and swapped in: a crash leaves the old file or the new one.
+        tmp_path = f"{self._path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._values, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path)
+        except OSError as exc:
+            logger.warning("UI state not saved: %s", exc)
+            return False
+        self._dirty = False
+        return True
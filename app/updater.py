@@ -1,10 +1,116 @@
+import json
+import logging
+import os
+import threading
+import time
+
 import requests
+from PySide6.QtCore import QObject, Signal
+
+from app.db import get_data_dir
+
+VERSION = "1.0"
+UPDATE_URL = "https://server/version.txt"
+CONNECT_TIMEOUT_S = 3
+READ_TIMEOUT_S = 5
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 30.0
+CACHE_FILENAME = "update_cache.json"
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_cache_path():
+    return os.path.join(get_data_dir(), CACHE_FILENAME)
 
-VERSION="1.0"
 
-def check_update():
+def _load_cache(cache_path):
     try:
-        latest = requests.get("https://server/version.txt").text.strip()
-        return latest != VERSION
-    except:
-        return False
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _save_cache(cache_path, cache):
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as exc:
+        logger.warning("Update cache not saved: %s", exc)
+
+
+def fetch_latest_version(url=UPDATE_URL, cache_path=None):
+    if cache_path is None:
+        cache_path = get_update_cache_path()
+    cache = _load_cache(cache_path)
+    if cache.get("url") != url:
+        cache = {}
+
+    headers = {}
+    # Conditional only when a cached version can answer a 304.
+    if cache.get("version"):
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+
+    response = requests.get(
+        url, headers=headers, timeout=(CONNECT_TIMEOUT_S, READ_TIMEOUT_S)
+    )
+    if response.status_code == 304:
+        # Unasked-for 304 with nothing cached: no version known, not an update.
+        return cache.get("version")
+    response.raise_for_status()
+
+    latest = response.text.strip()
+    if not latest:
+        return None
+    _save_cache(
+        cache_path,
+        {
+            "url": url,
+            "version": latest,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        },
+    )
+    return latest
+
+
+def check_update(url=UPDATE_URL, cache_path=None, attempts=MAX_ATTEMPTS, sleep=time.sleep):
+    delay = BACKOFF_BASE_S
+    for attempt in range(attempts):
+        try:
+            latest = fetch_latest_version(url, cache_path)
+            return latest is not None and latest != VERSION
+        except requests.RequestException as exc:
+            logger.warning("Update check failed (attempt %d): %s", attempt + 1, exc)
+            if attempt == attempts - 1:
+                return False
+            sleep(min(delay, BACKOFF_MAX_S))
+            delay *= 2
+    return False
+
+
+class UpdateChecker(QObject):
+    finished = Signal(bool)
+
+    def __init__(self, url=UPDATE_URL, cache_path=None, parent=None):
+        super().__init__(parent)
+        self._url = url
+        self._cache_path = cache_path
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self.finished.emit(check_update(self._url, self._cache_path))
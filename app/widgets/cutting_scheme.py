@@ -0,0 +1,172 @@
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QLinearGradient, QPainter, QPen
+
+
+def _font_size(font):
+    # A font sized in pixels reports pointSize() == -1, and the reverse.
+    pixel_size = font.pixelSize()
+    return pixel_size if pixel_size > 0 else font.pointSize()
+
+
+def _sized_font(font, size):
+    sized = QFont(font)
+    if font.pixelSize() > 0:
+        sized.setPixelSize(size)
+    else:
+        sized.setPointSize(size)
+    return sized
+
+
+def paint_cutting_scheme(painter, width, height, result, base_font):
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.fillRect(QRectF(0, 0, width, height), QColor("#1b2028"))
+
+    if not result:
+        return
+
+    base_size = _font_size(base_font)
+    label_font = _sized_font(base_font, max(base_size - 2, 10))
+    label_font.setBold(True)
+    legend_font = _sized_font(base_font, max(base_size - 1, 11))
+
+    margin = 24
+    bar_height = 70
+    y = height // 2 - bar_height // 2
+    usable_width_px = width - margin * 2
+    row_padding = 6
+    row_gap = 8
+    roll_height = (bar_height - row_gap - row_padding * 2) / 2
+    if roll_height < 16:
+        roll_height = 16
+    row_y_top = y + row_padding
+    row_y_bottom = y + bar_height - row_padding - roll_height
+
+    material_width = result["material_width_mm"]
+    useful_width = result["useful_width_mm"]
+    main_count = result["main_count"]
+    roll_width = result["roll_width_mm"]
+    additional_width = result["additional_width_mm"]
+    waste_per_side = result["waste_per_side_mm"]
+
+    if material_width <= 0:
+        return
+
+    scale = usable_width_px / material_width
+
+    total_rect = QRectF(margin, y, usable_width_px, bar_height)
+    painter.setPen(QPen(QColor("#485569"), 2))
+    painter.drawRoundedRect(total_rect, 6, 6)
+
+    x = margin
+    row_ranges = {}
+
+    def draw_block(width_mm, color_start, color_end, label=None, row=None):
+        nonlocal x
+        w = max(width_mm * scale, 0)
+        if row is None:
+            rect = QRectF(x, y, w, bar_height)
+        else:
+            rect_y = row_y_top if row == 0 else row_y_bottom
+            rect = QRectF(x, rect_y, w, roll_height)
+            if w > 0:
+                if row not in row_ranges:
+                    row_ranges[row] = [rect.left(), rect.right()]
+                else:
+                    row_ranges[row][0] = min(row_ranges[row][0], rect.left())
+                    row_ranges[row][1] = max(row_ranges[row][1], rect.right())
+        gradient = QLinearGradient(rect.topLeft(), rect.bottomLeft())
+        gradient.setColorAt(0, QColor(color_start))
+        gradient.setColorAt(1, QColor(color_end))
+        painter.fillRect(rect, gradient)
+        painter.setPen(QPen(QColor("#0f1420"), 1))
+        painter.drawRect(rect)
+        if label and w > 6:
+            fit_font = QFont(label_font)
+            metrics = QFontMetrics(fit_font)
+            text_width = metrics.horizontalAdvance(label)
+            while text_width > w - 6 and _font_size(fit_font) > 8:
+                fit_font = _sized_font(fit_font, _font_size(fit_font) - 1)
+                metrics = QFontMetrics(fit_font)
+                text_width = metrics.horizontalAdvance(label)
+            if text_width <= w - 4:
+                painter.setFont(fit_font)
+                painter.setPen(QPen(Qt.white, 1))
+                painter.drawText(rect, Qt.AlignCenter, label)
+        x += w
+
+    if waste_per_side > 0:
+        draw_block(waste_per_side, "#c53b3b", "#7a1e1e", "ОТХОД")
+
+    roll_index = 0
+    for _ in range(main_count):
+        draw_block(
+            roll_width,
+            "#2f63ff",
+            "#0b2f9e",
+            f"{int(roll_width)}",
+            row=roll_index % 2,
+        )
+        roll_index += 1
+
+    remaining_width = useful_width - main_count * roll_width
+    if additional_width:
+        draw_block(
+            additional_width,
+            "#3aa35c",
+            "#22613a",
+            f"{int(additional_width)}",
+            row=roll_index % 2,
+        )
+        roll_index += 1
+        remaining_width = useful_width - main_count * roll_width - additional_width
+
+    if remaining_width > 0:
+        draw_block(remaining_width, "#c53b3b", "#7a1e1e", "ОТХ")
+
+    if waste_per_side > 0:
+        draw_block(waste_per_side, "#c53b3b", "#7a1e1e", "ОТХОД")
+
+    if row_ranges:
+        painter.save()
+        shaft_color = QColor("#6c7a92")
+        painter.setPen(QPen(shaft_color, 2))
+        painter.setBrush(shaft_color)
+        shaft_offset = 5
+        for row, (min_x, max_x) in row_ranges.items():
+            line_y = (
+                row_y_top + roll_height - shaft_offset
+                if row == 0
+                else row_y_bottom + roll_height - shaft_offset
+            )
+            painter.drawLine(QPointF(min_x, line_y), QPointF(max_x, line_y))
+            radius = 3.5
+            painter.drawEllipse(QPointF(min_x, line_y), radius, radius)
+            painter.drawEllipse(QPointF(max_x, line_y), radius, radius)
+        painter.restore()
+
+    painter.setFont(legend_font)
+    painter.setPen(QPen(QColor("#d3b26c"), 1))
+    painter.drawText(margin, y - 12, f"{int(useful_width)} мм")
+
+    legend_y = y + bar_height + 18
+    painter.setPen(QPen(QColor("#c9d1dc"), 1))
+    painter.drawRect(margin, legend_y, 12, 12)
+    painter.fillRect(margin, legend_y, 12, 12, QColor("#c53b3b"))
+    painter.drawText(margin + 16, legend_y + 10, "Отход")
+    painter.fillRect(margin + 90, legend_y, 12, 12, QColor("#2f63ff"))
+    painter.drawText(margin + 106, legend_y + 10, "Рулоны")
+    painter.fillRect(margin + 190, legend_y, 12, 12, QColor("#3aa35c"))
+    painter.drawText(margin + 206, legend_y + 10, "Доп.")
+
+    count_y = legend_y + 22
+    painter.setPen(QPen(QColor("#c9d1dc"), 1))
+    painter.drawText(
+        margin,
+        count_y + 12,
+        f"Основных: {main_count}",
+    )
+    painter.drawText(
+        margin + 170,
+        count_y + 12,
+        f"Доп.: {1 if additional_width else 0}",
+    )
@@ -1,10 +1,20 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+import sys
+
+sys.path.insert(0, SPECPATH)
+from app.layout_table import build_layout_table
+
+# Built fresh from the current rules for every release; the app never ships
+# without it and never ships a stale one.
+layout_table = build_layout_table()
+datas = [(layout_table, "app")]
+
 a = Analysis(
     ["main.py"],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=datas,
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
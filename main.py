@@ -1,30 +1,37 @@
 import csv
+import json
 import os
+import sqlite3
 import sys
-from datetime import datetime, timedelta, timezone
-
-try:
-    from zoneinfo import ZoneInfo
-except Exception:
-    ZoneInfo = None
-
-from PySide6.QtCore import Qt, QRectF, QPointF, QSettings, QTimer, QRegularExpression
+import threading
+from datetime import datetime, timedelta
+
+from PySide6.QtCore import (
+    Qt,
+    QBuffer,
+    QByteArray,
+    QIODevice,
+    QObject,
+    QSettings,
+    QTimer,
+    QRegularExpression,
+    Signal,
+)
 from PySide6.QtGui import (
     QColor,
-    QFont,
-    QFontMetrics,
-    QLinearGradient,
     QPainter,
-    QPen,
+    QPixmap,
     QRegularExpressionValidator,
 )
 from PySide6.QtWidgets import (
     QApplication,
     QCheckBox,
+    QComboBox,
     QFrame,
     QGridLayout,
     QHBoxLayout,
     QHeaderView,
+    QInputDialog,
     QLabel,
     QLayout,
     QLineEdit,
@@ -39,182 +46,62 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from app.calculator_logic import calculate
+from app.auth import check_session, login, logout
+from app.backlog import load_backlog, match_strip, save_backlog
+from app.calculator_logic import calculate, rules_signature, sensitivity
 from app.db import (
-    clear_history,
-    count_history,
+    HistoryCache,
+    HistoryWatcher,
+    backup_all_history,
     fetch_history,
+    flush_history_spool,
     get_data_dir,
+    get_jumbo,
+    get_ledger_remaining,
+    get_minsk_tz,
     init_history_db,
-    insert_history,
+    migrate_created_at,
+    search_history,
+    to_epoch_ms,
 )
+from app.jumbos import load_jumbo_index
+from app.memory_monitor import SAMPLE_INTERVAL_MS, MemoryMonitor
+from app.rate_tables import DEFAULT_MACHINE, list_machines
+from app.ui_state import FLUSH_DELAY_MS, UiState
+from app.updater import UpdateChecker
+from app.widgets.cutting_scheme import paint_cutting_scheme
 
 
 class CuttingView(QWidget):
     def __init__(self):
         super().__init__()
         self._result = None
+        self._pixmap = None
 
-    def set_data(self, result):
+    def set_data(self, result, pixmap=None):
         self._result = result
+        self._pixmap = pixmap
         self.update()
 
+    def render_pixmap(self):
+        return self.grab()
+
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
-        painter.fillRect(self.rect(), QColor("#1b2028"))
-
-        if not self._result:
+        # A pre-rendered scheme is reused only while the widget keeps the size it was drawn at.
+        if self._pixmap is not None and self._pixmap.deviceIndependentSize().toSize() == self.size():
+            painter.drawPixmap(0, 0, self._pixmap)
             return
+        self._pixmap = None
+        paint_cutting_scheme(painter, self.width(), self.height(), self._result, self.font())
 
-        base_font = self.font()
-        label_font = QFont(base_font)
-        label_font.setPointSize(max(base_font.pointSize() - 2, 10))
-        label_font.setBold(True)
-        legend_font = QFont(base_font)
-        legend_font.setPointSize(max(base_font.pointSize() - 1, 11))
-
-        margin = 24
-        bar_height = 70
-        y = self.height() // 2 - bar_height // 2
-        usable_width_px = self.width() - margin * 2
-        row_padding = 6
-        row_gap = 8
-        roll_height = (bar_height - row_gap - row_padding * 2) / 2
-        if roll_height < 16:
-            roll_height = 16
-        row_y_top = y + row_padding
-        row_y_bottom = y + bar_height - row_padding - roll_height
-
-        material_width = self._result["material_width_mm"]
-        useful_width = self._result["useful_width_mm"]
-        main_count = self._result["main_count"]
-        roll_width = self._result["roll_width_mm"]
-        additional_width = self._result["additional_width_mm"]
-        waste_per_side = self._result["waste_per_side_mm"]
-
-        if material_width <= 0:
-            return
-
-        scale = usable_width_px / material_width
-
-        total_rect = QRectF(margin, y, usable_width_px, bar_height)
-        painter.setPen(QPen(QColor("#485569"), 2))
-        painter.drawRoundedRect(total_rect, 6, 6)
 
-        x = margin
-        row_ranges = {}
+class BackupSignals(QObject):
+    finished = Signal(str)
 
-        def draw_block(width_mm, color_start, color_end, label=None, row=None):
-            nonlocal x
-            w = max(width_mm * scale, 0)
-            if row is None:
-                rect = QRectF(x, y, w, bar_height)
-            else:
-                rect_y = row_y_top if row == 0 else row_y_bottom
-                rect = QRectF(x, rect_y, w, roll_height)
-                if w > 0:
-                    if row not in row_ranges:
-                        row_ranges[row] = [rect.left(), rect.right()]
-                    else:
-                        row_ranges[row][0] = min(row_ranges[row][0], rect.left())
-                        row_ranges[row][1] = max(row_ranges[row][1], rect.right())
-            gradient = QLinearGradient(rect.topLeft(), rect.bottomLeft())
-            gradient.setColorAt(0, QColor(color_start))
-            gradient.setColorAt(1, QColor(color_end))
-            painter.fillRect(rect, gradient)
-            painter.setPen(QPen(QColor("#0f1420"), 1))
-            painter.drawRect(rect)
-            if label and w > 6:
-                fit_font = QFont(label_font)
-                metrics = QFontMetrics(fit_font)
-                text_width = metrics.horizontalAdvance(label)
-                while text_width > w - 6 and fit_font.pointSize() > 8:
-                    fit_font.setPointSize(fit_font.pointSize() - 1)
-                    metrics = QFontMetrics(fit_font)
-                    text_width = metrics.horizontalAdvance(label)
-                if text_width <= w - 4:
-                    painter.setFont(fit_font)
-                    painter.setPen(QPen(Qt.white, 1))
-                    painter.drawText(rect, Qt.AlignCenter, label)
-            x += w
-
-        if waste_per_side > 0:
-            draw_block(waste_per_side, "#c53b3b", "#7a1e1e", "ОТХОД")
-
-        roll_index = 0
-        for _ in range(main_count):
-            draw_block(
-                roll_width,
-                "#2f63ff",
-                "#0b2f9e",
-                f"{int(roll_width)}",
-                row=roll_index % 2,
-            )
-            roll_index += 1
 
-        remaining_width = useful_width - main_count * roll_width
-        if additional_width:
-            draw_block(
-                additional_width,
-                "#3aa35c",
-                "#22613a",
-                f"{int(additional_width)}",
-                row=roll_index % 2,
-            )
-            roll_index += 1
-            remaining_width = useful_width - main_count * roll_width - additional_width
-
-        if remaining_width > 0:
-            draw_block(remaining_width, "#c53b3b", "#7a1e1e", "ОТХ")
-
-        if waste_per_side > 0:
-            draw_block(waste_per_side, "#c53b3b", "#7a1e1e", "ОТХОД")
-
-        if row_ranges:
-            painter.save()
-            shaft_color = QColor("#6c7a92")
-            painter.setPen(QPen(shaft_color, 2))
-            painter.setBrush(shaft_color)
-            shaft_offset = 5
-            for row, (min_x, max_x) in row_ranges.items():
-                line_y = (
-                    row_y_top + roll_height - shaft_offset
-                    if row == 0
-                    else row_y_bottom + roll_height - shaft_offset
-                )
-                painter.drawLine(QPointF(min_x, line_y), QPointF(max_x, line_y))
-                radius = 3.5
-                painter.drawEllipse(QPointF(min_x, line_y), radius, radius)
-                painter.drawEllipse(QPointF(max_x, line_y), radius, radius)
-            painter.restore()
-
-        painter.setFont(legend_font)
-        painter.setPen(QPen(QColor("#d3b26c"), 1))
-        painter.drawText(margin, y - 12, f"{int(useful_width)} мм")
-
-        legend_y = y + bar_height + 18
-        painter.setPen(QPen(QColor("#c9d1dc"), 1))
-        painter.drawRect(margin, legend_y, 12, 12)
-        painter.fillRect(margin, legend_y, 12, 12, QColor("#c53b3b"))
-        painter.drawText(margin + 16, legend_y + 10, "Отход")
-        painter.fillRect(margin + 90, legend_y, 12, 12, QColor("#2f63ff"))
-        painter.drawText(margin + 106, legend_y + 10, "Рулоны")
-        painter.fillRect(margin + 190, legend_y, 12, 12, QColor("#3aa35c"))
-        painter.drawText(margin + 206, legend_y + 10, "Доп.")
-
-        count_y = legend_y + 22
-        painter.setPen(QPen(QColor("#c9d1dc"), 1))
-        painter.drawText(
-            margin,
-            count_y + 12,
-            f"Основных: {main_count}",
-        )
-        painter.drawText(
-            margin + 170,
-            count_y + 12,
-            f"Доп.: {1 if additional_width else 0}",
-        )
+class SensitivitySignals(QObject):
+    finished = Signal(int, object)
 
 
 class MainWindow(QMainWindow):
@@ -223,7 +110,7 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Калькулятор производства")
         self.setMinimumSize(1100, 700)
 
-        init_history_db()
+        self._backlog = load_backlog()
 
         central = QWidget()
         self.setCentralWidget(central)
@@ -261,16 +148,136 @@ class MainWindow(QMainWindow):
         body.addWidget(self.right_panel, 0, 3, 2, 1)
         body.addWidget(self.history_panel, 1, 0, 1, 3)
 
-        self._settings = QSettings("Calculator", "ProductionCalculator")
+        # Debounced: a burst of edits is written once, FLUSH_DELAY_MS after the last.
+        self._state_timer = QTimer(self)
+        self._state_timer.setSingleShot(True)
+        self._state_timer.setInterval(FLUSH_DELAY_MS)
+        self._state_timer.timeout.connect(self._flush_ui_state)
+        self._ui_state = UiState(on_change=self._state_timer.start)
+        if not self._ui_state.exists():
+            self._import_qsettings()
+        self._restore_window_geometry()
         self._restore_jamba_inputs()
         self._bind_jamba_persistence()
+        self._restore_machine()
+        self._reload_preset_names()
+        self._prune_preset_images()
 
         self.apply_style()
         QTimer.singleShot(0, self._finalize_layout)
         self._action_rows = []
-        self._load_history()
-        self._update_process_count()
+        self._last_inputs = None
+        self._last_calculated = None
+        # Login session for privileged actions; see _authorize.
+        self._session = None
+        self._sensitivity_generation = 0
+        self._sensitivity_signals = SensitivitySignals(self)
+        self._sensitivity_signals.finished.connect(self._sensitivity_finished)
+        self._history_watcher = HistoryWatcher()
+        self._history_watcher.poll()
+        self._history = HistoryCache()
+        self._history_retry_timer = QTimer(self)
+        self._history_retry_timer.setInterval(30_000)
+        self._history_retry_timer.timeout.connect(self._connect_history)
+        self._connect_history()
+        self._history_poll_timer = QTimer(self)
+        self._history_poll_timer.timeout.connect(self._poll_history)
+        self._history_poll_timer.start(1000)
         self._schedule_history_clear()
+        self._backup_signals = BackupSignals(self)
+        self._backup_signals.finished.connect(self.status_label.setText)
+        self._schedule_history_backup()
+        threading.Thread(target=self._migrate_history_worker, daemon=True).start()
+
+        self._update_checker = UpdateChecker(parent=self)
+        self._update_checker.finished.connect(self._on_update_checked)
+        self._update_checker.start()
+
+        self._memory_monitor = MemoryMonitor(counters=self._memory_counters)
+        self._memory_monitor.start()
+        self._memory_timer = QTimer(self)
+        self._memory_timer.timeout.connect(self._sample_memory)
+        self._memory_timer.start(SAMPLE_INTERVAL_MS)
+
+    def _memory_counters(self):
+        tables = self.findChildren(QTableWidget)
+        return {
+            "qt_objects": len(self.findChildren(QObject)),
+            "widgets": len(QApplication.allWidgets()),
+            "table_items": sum(
+                1
+                for table in tables
+                for row in range(table.rowCount())
+                for col in range(table.columnCount())
+                if table.item(row, col) is not None
+            ),
+            "action_rows": len(self._action_rows),
+        }
+
+    def _sample_memory(self):
+        entry = self._memory_monitor.sample()
+        if entry["alert"]:
+            self.status_label.setText(
+                f"Рост памяти: +{entry['rss_growth'] / 1024 / 1024:.0f} МБ, "
+                "рекомендуется перезапуск"
+            )
+
+    def _import_qsettings(self):
+        # One-time move of what earlier versions kept in QSettings.
+        settings = QSettings("Calculator", "ProductionCalculator")
+        for key in settings.allKeys():
+            value = settings.value(key)
+            if key.startswith("presets/"):
+                try:
+                    value = json.loads(value)
+                except (TypeError, ValueError):
+                    continue
+                pixmap = value.pop("pixmap", None)
+                if pixmap:
+                    value["image"] = self._ui_state.store_image(
+                        bytes(QByteArray.fromBase64(pixmap.encode("ascii")))
+                    )
+            self._ui_state.set_value(key, value)
+        self._flush_ui_state()
+
+    def _restore_window_geometry(self):
+        geometry = self._ui_state.value("window/geometry")
+        if geometry:
+            self.restoreGeometry(QByteArray.fromBase64(geometry.encode("ascii")))
+
+    def _flush_ui_state(self):
+        self._state_timer.stop()
+        self._ui_state.flush()
+
+    def closeEvent(self, event):
+        self._ui_state.set_value(
+            "window/geometry", bytes(self.saveGeometry().toBase64()).decode("ascii")
+        )
+        self._flush_ui_state()
+        logout(self._session)
+        super().closeEvent(event)
+
+    def _connect_history(self):
+        # A shared database out of reach must not stop the station: executions
+        # are spooled locally and flushed once the database answers again.
+        try:
+            init_history_db()
+            flush_history_spool()
+            self._history.reload()
+            self._update_process_count()
+        except sqlite3.OperationalError:
+            self.status_label.setText("База истории недоступна, записи сохраняются локально")
+            self._history_retry_timer.start()
+            self._load_history()
+            return
+        if self._history_retry_timer.isActive():
+            self._history_retry_timer.stop()
+            self.status_label.setText("")
+        self._load_history()
+
+    def _on_update_checked(self, available):
+        if available and not self.status_label.text():
+            self.status_label.setText("Доступна новая версия программы")
 
     def _build_header(self):
         header = QFrame()
@@ -309,12 +316,7 @@ class MainWindow(QMainWindow):
         timer.start(1000)
 
     def _get_minsk_tz(self):
-        if ZoneInfo is not None:
-            try:
-                return ZoneInfo("Europe/Minsk")
-            except Exception:
-                pass
-        return timezone(timedelta(hours=3))
+        return get_minsk_tz()
 
     def _schedule_history_clear(self):
         now = datetime.now(tz=self._get_minsk_tz())
@@ -328,14 +330,65 @@ class MainWindow(QMainWindow):
         QTimer.singleShot(delay_ms, self._run_scheduled_history_clear)
 
     def _run_scheduled_history_clear(self):
-        clear_history()
+        self._history.clear()
         self._action_rows.clear()
         self._load_history()
         self._update_process_count()
         self._schedule_history_clear()
 
+    def _schedule_history_backup(self):
+        # Daily, ahead of the Friday 19:00 wipe so the week's history is kept.
+        now = datetime.now(tz=self._get_minsk_tz())
+        next_run = now.replace(hour=18, minute=45, second=0, microsecond=0)
+        if now >= next_run:
+            next_run = next_run + timedelta(days=1)
+        delay_ms = int((next_run - now).total_seconds() * 1000)
+        QTimer.singleShot(delay_ms, self._run_scheduled_history_backup)
+
+    def _run_scheduled_history_backup(self):
+        threading.Thread(target=self._backup_history_worker, daemon=True).start()
+        self._schedule_history_backup()
+
+    def _backup_history_worker(self):
+        try:
+            backup_all_history()
+            message = "Резервная копия истории сохранена"
+        except Exception:
+            message = "Ошибка резервного копирования истории"
+        self._backup_signals.finished.emit(message)
+
+    def _migrate_history_worker(self):
+        # Best effort: rows from before created_at_ms get an estimated date.
+        try:
+            migrate_created_at()
+        except Exception:
+            pass
+
+    def _authorize(self):
+        # One login covers privileged actions until the session expires, so
+        # the password hash is not recomputed on every click.
+        if check_session(self._session) is not None:
+            return True
+        name, ok = QInputDialog.getText(self, "Вход", "Логин")
+        if not ok or not name.strip():
+            return False
+        password, ok = QInputDialog.getText(self, "Вход", "Пароль", QLineEdit.Password)
+        if not ok:
+            return False
+        try:
+            self._session = login(name.strip(), password)
+        except sqlite3.Error:
+            self.status_label.setText("База пользователей недоступна")
+            return False
+        if self._session is None:
+            self.status_label.setText("Неверный логин или пароль")
+            return False
+        return True
+
     def _clear_history_clicked(self):
-        clear_history()
+        if not self._authorize():
+            return
+        self._history.clear()
         self._action_rows.clear()
         self._load_history()
         self._update_process_count()
@@ -387,6 +440,18 @@ class MainWindow(QMainWindow):
         self.input_roll_length = self._labeled_input("Намотка рулонов, м")
         self.input_order = self._labeled_input("Количество рулонов в заказе, шт")
 
+        self.input_machine = QComboBox()
+        self.input_machine.setObjectName("MachineSelect")
+        self.input_machine.addItems(list_machines())
+        machine_label = QLabel("Машина")
+        machine_label.setObjectName("FieldLabel")
+        machine_label.setBuddy(self.input_machine)
+        machine_row = QHBoxLayout()
+        machine_row.setSpacing(8)
+        machine_row.addWidget(machine_label)
+        machine_row.addWidget(self.input_machine, 1)
+        order_layout.addLayout(machine_row)
+
         order_layout.addWidget(self.input_roll_width)
         order_layout.addWidget(self.input_roll_length)
         order_layout.addWidget(self.input_order)
@@ -400,6 +465,10 @@ class MainWindow(QMainWindow):
         self.additional_width_input.setEnabled(False)
         order_layout.addWidget(self.additional_width_input)
 
+        self.btn_pick_jumbo = QPushButton("ПОДОБРАТЬ ДЖАМБО")
+        self.btn_pick_jumbo.clicked.connect(self._pick_jumbo)
+        order_layout.addWidget(self.btn_pick_jumbo)
+
         order_layout.addStretch(1)
 
         tabs.addTab(tab_roll, "Параметры Джамба")
@@ -407,6 +476,18 @@ class MainWindow(QMainWindow):
 
         layout.addWidget(tabs)
 
+        presets_row = QHBoxLayout()
+        presets_row.setSpacing(8)
+        self.preset_select = QComboBox()
+        self.preset_select.setObjectName("PresetSelect")
+        self.preset_select.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.preset_select.activated.connect(self._recall_preset)
+        self.btn_save_preset = QPushButton("В ИЗБРАННОЕ")
+        self.btn_save_preset.clicked.connect(self._save_preset)
+        presets_row.addWidget(self.preset_select)
+        presets_row.addWidget(self.btn_save_preset)
+        layout.addLayout(presets_row)
+
         self.btn_clear = QPushButton("ОЧИСТИТЬ")
         self.btn_calc = QPushButton("РАССЧИТАТЬ")
         self.btn_execute = QPushButton("\u0412\u042b\u041f\u041e\u041b\u041d\u0418\u0422\u042c")
@@ -456,11 +537,11 @@ class MainWindow(QMainWindow):
         if formatted is None:
             return
         self.input_stock_number.setText(formatted)
-        self._settings.setValue("jamba/stock_number", formatted)
+        self._ui_state.set_value("jamba/stock_number", formatted)
 
     def _restore_jamba_inputs(self):
         for key, widget in self._jamba_fields().items():
-            value = self._settings.value(f"jamba/{key}", "")
+            value = self._ui_state.value(f"jamba/{key}", "")
             if value is None:
                 value = ""
             widget.setText(str(value))
@@ -469,9 +550,199 @@ class MainWindow(QMainWindow):
     def _bind_jamba_persistence(self):
         for key, widget in self._jamba_fields().items():
             widget.textEdited.connect(
-                lambda value, key=key: self._settings.setValue(f"jamba/{key}", value)
+                lambda value, key=key: self._ui_state.set_value(f"jamba/{key}", value)
             )
         self.input_stock_number.editingFinished.connect(self._apply_stock_number_format)
+        self.input_stock_number.editingFinished.connect(self._fill_from_ledger)
+
+    def _fill_from_ledger(self):
+        stock_number = self._format_stock_number(self.input_stock_number.text())
+        if not stock_number:
+            return
+        try:
+            jumbo = get_jumbo(stock_number)
+            remaining_m = None if jumbo else get_ledger_remaining(stock_number)
+        except sqlite3.OperationalError:
+            return
+        if jumbo is None:
+            # Unregistered jumbos are still tracked by the ledger, length only.
+            if remaining_m is not None:
+                value = f"{remaining_m:g}"
+                self.input_big_length.setText(value)
+                self._ui_state.set_value("jamba/big_roll_length", value)
+            return
+        # Remaining length always follows the ledger; the rest only fills empty fields.
+        values = {
+            "big_roll_length": f"{jumbo['length_m']:g}",
+            "material_code": jumbo["material_code"] or "",
+            "material_width": f"{jumbo['material_width']:g}",
+            "useful_width": f"{jumbo['useful_width']:g}",
+        }
+        fields = self._jamba_fields()
+        for key, value in values.items():
+            if key != "big_roll_length" and fields[key].text().strip():
+                continue
+            fields[key].setText(value)
+            self._ui_state.set_value(f"jamba/{key}", value)
+
+    def _pick_jumbo(self):
+        material_code = self.input_material_code.text().strip()
+        if not material_code:
+            self.status_label.setText("Введите код материала")
+            return
+        try:
+            roll_width = float(self.input_roll_width.text())
+            roll_length = float(self.input_roll_length.text())
+            order_rolls = int(self.input_order.text())
+        except ValueError:
+            self.status_label.setText("Ошибка ввода")
+            return
+        machine = self.input_machine.currentText() or DEFAULT_MACHINE
+        try:
+            index = load_jumbo_index(material_code)
+        except sqlite3.OperationalError:
+            self.status_label.setText("База истории недоступна")
+            return
+        jumbo, _ = index.best_jumbo(material_code, roll_width, roll_length, order_rolls, machine)
+        if jumbo is None:
+            self.status_label.setText("Нет подходящего джамба на складе")
+            return
+
+        values = {
+            "stock_number": jumbo["stock_number"],
+            "material_width": f"{jumbo['material_width']:g}",
+            "useful_width": f"{jumbo['useful_width']:g}",
+            "big_roll_length": f"{jumbo['length_m']:g}",
+        }
+        fields = self._jamba_fields()
+        for key, value in values.items():
+            fields[key].setText(value)
+            self._ui_state.set_value(f"jamba/{key}", value)
+        self._calculate()
+
+    def _restore_machine(self):
+        machine = str(self._ui_state.value("order/machine", DEFAULT_MACHINE) or DEFAULT_MACHINE)
+        index = self.input_machine.findText(machine)
+        if index >= 0:
+            self.input_machine.setCurrentIndex(index)
+        self.input_machine.currentTextChanged.connect(
+            lambda value: self._ui_state.set_value("order/machine", value)
+        )
+
+    def _preset_fields(self):
+        return {
+            "material_code": self.input_material_code,
+            "material_width": self.input_material,
+            "useful_width": self.input_useful,
+            "big_roll_length": self.input_big_length,
+            "roll_width": self.input_roll_width,
+            "roll_length": self.input_roll_length,
+            "order_rolls": self.input_order,
+            "additional_width": self.additional_width_input,
+        }
+
+    def _preset_names(self):
+        return sorted(self._ui_state.child_keys("presets"))
+
+    def _prune_preset_images(self):
+        presets = [self._ui_state.value(f"presets/{name}") or {} for name in self._preset_names()]
+        self._ui_state.prune_images({preset.get("image") for preset in presets})
+
+    def _reload_preset_names(self):
+        self.preset_select.clear()
+        self.preset_select.addItem("Избранное")
+        self.preset_select.addItems(self._preset_names())
+
+    def _save_preset(self):
+        try:
+            result, _, _ = self._compute_result()
+        except ValueError as exc:
+            self.status_label.setText(str(exc))
+            return
+        except Exception:
+            self.status_label.setText("Ошибка ввода")
+            return
+        if result is None:
+            return
+        self._apply_result(result)
+
+        default_name = (
+            f"{self.input_material_code.text().strip() or '-'} "
+            f"{self.input_roll_width.text()}x{self.input_roll_length.text()}"
+        )
+        name, ok = QInputDialog.getText(self, "Избранное", "Название", text=default_name)
+        name = name.strip().replace("/", "-")
+        if not ok or not name:
+            return
+        self._store_preset(name, self._last_calculated)
+        self._reload_preset_names()
+        self.preset_select.setCurrentText(name)
+        self.status_label.setText("Сохранено в избранное")
+
+    def _store_preset(self, name, calculated):
+        pixmap_bytes = QByteArray()
+        buffer = QBuffer(pixmap_bytes)
+        buffer.open(QIODevice.WriteOnly)
+        self.cutting_view.render_pixmap().save(buffer, "PNG")
+        buffer.close()
+
+        payload = {
+            "inputs": {key: widget.text() for key, widget in self._preset_fields().items()},
+            "additional": self.additional_width_checkbox.isChecked(),
+            "machine": self.input_machine.currentText(),
+            "rules": rules_signature(),
+            "result": calculated,
+            "image": self._ui_state.store_image(bytes(pixmap_bytes)),
+        }
+        self._ui_state.set_value(f"presets/{name}", payload)
+
+    def _recall_preset(self, index):
+        if index <= 0:
+            return
+        name = self.preset_select.itemText(index)
+        payload = self._ui_state.value(f"presets/{name}")
+        if not payload:
+            return
+
+        self.additional_width_checkbox.setChecked(payload.get("additional", False))
+        for key, widget in self._preset_fields().items():
+            widget.setText(payload["inputs"].get(key, ""))
+        machine_index = self.input_machine.findText(payload.get("machine") or DEFAULT_MACHINE)
+        if machine_index >= 0:
+            self.input_machine.setCurrentIndex(machine_index)
+        self._last_inputs = None
+        self._sensitivity_generation += 1
+        self.sensitivity_label.setText("")
+
+        # Calculation rules changed since the preset was saved, or it was saved
+        # with the backlog match already applied: its result is stale.
+        if payload.get("rules") != rules_signature() or "backlog_match" in payload["result"]:
+            try:
+                result, _, _ = self._compute_result()
+            except ValueError as exc:
+                self.status_label.setText(str(exc))
+                return
+            except Exception:
+                self.status_label.setText("Ошибка ввода")
+                return
+            if result is None:
+                return
+            self._apply_result(result)
+            self._store_preset(name, self._last_calculated)
+            self.status_label.setText("Правила расчета изменились, избранное пересчитано")
+            return
+
+        pixmap = None
+        image = self._ui_state.read_image(payload.get("image"))
+        if image is not None:
+            pixmap = QPixmap()
+            pixmap.loadFromData(image, "PNG")
+            pixmap.setDevicePixelRatio(self.cutting_view.devicePixelRatioF())
+        # The backlog moves on after the preset is saved, so the strip is matched again.
+        result = match_strip(payload["result"], self._backlog)
+        # Without its image the scheme is drawn again from the result.
+        self._apply_result(result, pixmap)
+        self._set_status_after_result(result, executed=False)
 
     def _build_center_panel(self):
         panel = QFrame()
@@ -494,6 +765,17 @@ class MainWindow(QMainWindow):
         h_layout.setSpacing(10)
 
         h_layout.addWidget(self._panel_title("ИСТОРИЯ РАСЧЕТОВ"))
+        self.history_search = self._labeled_input(
+            "Поиск по № склада или коду материала: 1–2 символа — начало, от 3 — фрагмент"
+        )
+        self.history_search.textChanged.connect(self._history_search_changed)
+        h_layout.addWidget(self.history_search)
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(150)
+        self._search_timer.timeout.connect(self._run_history_search)
+        self._search_last_id = None
+        self._search_exhausted = False
         self.history_table = QTableWidget(0, 9)
         self.history_table.setHorizontalHeaderLabels(
             ["Время", "№ склада", "Код материала", "Рулон, шт.", "Площадь, м.кв.", "Отход (%)", "Склад (осн.)", "Склад (доп.)", "Расход, п.м."]
@@ -506,6 +788,7 @@ class MainWindow(QMainWindow):
         self.history_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.history_table.setSelectionMode(QTableWidget.NoSelection)
         self.history_table.setObjectName("HistoryTable")
+        self.history_table.verticalScrollBar().valueChanged.connect(self._history_scrolled)
         h_layout.addWidget(self.history_table)
 
         self.btn_clear_history = QPushButton("ОЧИСТИТЬ ИСТОРИЮ РАСЧЕТОВ")
@@ -527,6 +810,7 @@ class MainWindow(QMainWindow):
         self.result_additional = self._result_row("Доп. рулон", "0")
         self.result_storage_main = self._result_row("Склад (осн.)", "0")
         self.result_storage_add = self._result_row("Склад (доп.)", "0")
+        self.result_backlog = self._result_row("Остаток в заказ", "нет")
         self.result_linear = self._result_row("Расход материала, п.м.", "0")
         self.result_cycles = self._result_row("Количество циклов", "0")
         self.result_time = self._result_row("\u0412\u0440\u0435\u043c\u044f (\u043e\u0446\u0435\u043d\u043a\u0430)", "\u043d/\u0434")
@@ -538,6 +822,7 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.result_additional)
         layout.addWidget(self.result_storage_main)
         layout.addWidget(self.result_storage_add)
+        layout.addWidget(self.result_backlog)
         layout.addWidget(self.result_linear)
         layout.addWidget(self.result_cycles)
         layout.addWidget(self.result_time)
@@ -549,6 +834,12 @@ class MainWindow(QMainWindow):
         self.status_label.setObjectName("StatusLabel")
         layout.addWidget(self.status_label)
 
+        layout.addWidget(self._panel_title("ЧУВСТВИТЕЛЬНОСТЬ"))
+        self.sensitivity_label = QLabel("")
+        self.sensitivity_label.setObjectName("SensitivityLabel")
+        self.sensitivity_label.setWordWrap(True)
+        layout.addWidget(self.sensitivity_label)
+
         self.btn_export = QPushButton("ЭКСПОРТ ОТЧЕТА")
         self.btn_export.clicked.connect(self._export_report)
         layout.addWidget(self.btn_export)
@@ -592,13 +883,21 @@ class MainWindow(QMainWindow):
             self.input_roll_length,
             self.input_order,
             self.additional_width_input,
+            self.history_search,
+            self.input_machine,
         ]
         for edit in line_edits:
             fm = edit.fontMetrics()
             min_h = max(edit.sizeHint().height(), int(fm.height() * 2.0))
             edit.setMinimumHeight(min_h)
 
-        buttons = [self.btn_clear, self.btn_calc, self.btn_execute, self.btn_export]
+        buttons = [
+            self.btn_clear,
+            self.btn_calc,
+            self.btn_execute,
+            self.btn_export,
+            self.btn_pick_jumbo,
+        ]
         for button in buttons:
             fm = button.fontMetrics()
             min_h = max(button.sizeHint().height(), int(fm.height() * 1.3))
@@ -692,6 +991,7 @@ class MainWindow(QMainWindow):
         self._set_result_row(self.result_additional, "0")
         self._set_result_row(self.result_storage_main, "0")
         self._set_result_row(self.result_storage_add, "0")
+        self._set_result_row(self.result_backlog, "нет")
         self._set_result_row(self.result_linear, "0")
         self._set_result_row(self.result_cycles, "0")
         self._set_result_row(self.result_time, "\u043d/\u0434")
@@ -699,6 +999,9 @@ class MainWindow(QMainWindow):
         self._set_result_row(self.result_useful_area, "0.0 м²")
         self._set_result_row(self.result_waste_area, "0.0 м²")
         self.status_label.setText("")
+        self._last_inputs = None
+        self._sensitivity_generation += 1
+        self.sensitivity_label.setText("")
 
     def _calculate(self):
         try:
@@ -708,6 +1011,7 @@ class MainWindow(QMainWindow):
             self._apply_result(result)
             self._add_action_row("calc", row)
             self._set_status_after_result(result, executed=False)
+            self._schedule_sensitivity()
         except ValueError as exc:
             self.status_label.setText(str(exc))
         except Exception:
@@ -719,10 +1023,12 @@ class MainWindow(QMainWindow):
             if result is None:
                 return
             self._apply_result(result)
-            insert_history(record)
-            self._add_action_row("exec", row)
+            key = self._history.insert(record)
+            self._add_action_row("exec", row, key)
             self._update_process_count()
             self._set_status_after_result(result, executed=True)
+            self._consume_backlog(result)
+            self._schedule_sensitivity()
         except ValueError as exc:
             self.status_label.setText(str(exc))
         except Exception:
@@ -747,8 +1053,22 @@ class MainWindow(QMainWindow):
                 self.status_label.setText("Введите доп. размер")
                 return None, None, None
             additional_width = float(self.additional_width_input.text())
+        machine = self.input_machine.currentText() or DEFAULT_MACHINE
 
-        result = calculate(
+        calculated = calculate(
+            material,
+            useful,
+            roll_width,
+            roll_length,
+            big_length,
+            order_rolls,
+            additional_width,
+            machine,
+        )
+        result = match_strip(calculated, self._backlog)
+        # Presets keep the unmatched result: match_strip is applied on recall.
+        self._last_calculated = calculated
+        self._last_inputs = (
             material,
             useful,
             roll_width,
@@ -756,10 +1076,13 @@ class MainWindow(QMainWindow):
             big_length,
             order_rolls,
             additional_width,
+            machine,
         )
 
+        now = datetime.now(self._get_minsk_tz())
         record = {
-            "timestamp": datetime.now().strftime("%H:%M"),
+            "timestamp": now.strftime("%H:%M"),
+            "created_at_ms": to_epoch_ms(now),
             "stock_number": stock_number,
             "material_code": self.input_material_code.text().strip(),
             "material_width": material,
@@ -778,6 +1101,8 @@ class MainWindow(QMainWindow):
             "useful_area": result["useful_area_m2"],
             "waste_area": result["waste_area_m2"],
             "waste_percent": result["waste_percent"],
+            "order_rolls": order_rolls,
+            "machine": machine,
         }
 
         row = (
@@ -794,7 +1119,7 @@ class MainWindow(QMainWindow):
 
         return result, record, row
 
-    def _apply_result(self, result):
+    def _apply_result(self, result, pixmap=None):
         total_rolls = result["total_rolls"]
         self._set_result_row(self.result_rolls, str(total_rolls))
         self._set_result_row(
@@ -814,6 +1139,13 @@ class MainWindow(QMainWindow):
         self._set_result_row(
             self.result_storage_add, f"{result['surplus_additional_rolls']} шт ({add_label})"
         )
+        match = result.get("backlog_match")
+        if match:
+            width_order_str = f"{match['roll_width_mm']:.1f}".rstrip("0").rstrip(".")
+            backlog_label = f"{match['order_id']}: {match['rolls']} шт ({width_order_str} мм)"
+        else:
+            backlog_label = "нет"
+        self._set_result_row(self.result_backlog, backlog_label)
         self._set_result_row(self.result_cycles, f"{result['cycles_used']}")
         estimated_hours = result.get("estimated_hours")
         if estimated_hours is None:
@@ -829,7 +1161,17 @@ class MainWindow(QMainWindow):
         self._set_result_row(self.result_useful_area, f"{result['useful_area_m2']:.1f} м²")
         self._set_result_row(self.result_waste_area, f"{result['waste_area_m2']:.1f} м²")
 
-        self.cutting_view.set_data(result)
+        self.cutting_view.set_data(result, pixmap)
+
+    def _consume_backlog(self, result):
+        match = result.get("backlog_match")
+        if not match:
+            return
+        self._backlog.consume(match["order_id"], match["rolls"])
+        try:
+            save_backlog(self._backlog)
+        except OSError:
+            self.status_label.setText("Не удалось сохранить список заказов")
 
     def _set_status_after_result(self, result, executed):
         if result["shortage_rolls"] > 0:
@@ -837,28 +1179,126 @@ class MainWindow(QMainWindow):
         else:
             self.status_label.setText("Выполнено" if executed else "Рассчитано")
 
-    def _add_action_row(self, status, row):
-        self._action_rows.insert(0, (status, row))
+    def _schedule_sensitivity(self):
+        # Evaluated on a worker thread; a newer calculation supersedes the result.
+        self._sensitivity_generation += 1
+        if self._last_inputs is None:
+            return
+        self.sensitivity_label.setText("...")
+        threading.Thread(
+            target=self._sensitivity_worker,
+            args=(self._sensitivity_generation, self._last_inputs),
+            daemon=True,
+        ).start()
+
+    def _sensitivity_worker(self, generation, inputs):
+        try:
+            report = sensitivity(*inputs)
+        except ValueError:
+            report = None
+        self._sensitivity_signals.finished.emit(generation, report)
+
+    def _sensitivity_finished(self, generation, report):
+        if generation != self._sensitivity_generation:
+            return
+        if report is None:
+            self.sensitivity_label.setText("")
+            return
+        self.sensitivity_label.setText(self._format_sensitivity(report))
+
+    def _format_sensitivity(self, report):
+        lines = []
+        shown = {
+            (-5, 0): "Полезн. −5 мм",
+            (5, 0): "Полезн. +5 мм",
+            (0, -2): "Рулон −2 мм",
+            (0, 2): "Рулон +2 мм",
+        }
+        for cell in report["grid"]:
+            label = shown.get((cell["useful_delta_mm"], cell["roll_delta_mm"]))
+            if label is None:
+                continue
+            if not cell["valid"]:
+                lines.append(f"{label}: недопустимо")
+                continue
+            hours_delta = cell["estimated_hours_delta"]
+            hours_text = "н/д" if hours_delta is None else f"{hours_delta:+.2f} ч"
+            lines.append(
+                f"{label}: отход {cell['waste_percent_delta']:+.1f}%, "
+                f"рулоны {cell['total_rolls_delta']:+d}, "
+                f"нехватка {cell['shortage_rolls_delta']:+d}, {hours_text}"
+            )
+
+        kinds = {
+            "count_jump": "Скачок кол-ва",
+            "adjustment": "Подгонка ширины",
+            "cycles_band": "Смена циклов/ч",
+        }
+        parameters = {
+            "useful_width_mm": "полезн.",
+            "roll_width_mm": "рулон",
+            "roll_length_m": "намотка",
+        }
+        for item in report["discontinuities"][:4]:
+            unit = "м" if item["parameter"] == "roll_length_m" else "мм"
+            lines.append(
+                f"{kinds[item['kind']]}: {parameters[item['parameter']]} "
+                f"{item['value']:.1f} {unit} ({item['delta']:+.1f})"
+            )
+        return "\n".join(lines)
+
+    def _add_action_row(self, status, row, key=None):
+        self._action_rows.insert(0, (status, row, key))
         if len(self._action_rows) > 20:
             self._action_rows = self._action_rows[:20]
         self._load_history()
 
+    def _history_search_changed(self, _text):
+        self._search_timer.start()
+
+    def _run_history_search(self):
+        if not self.history_search.text().strip():
+            self._load_history()
+            return
+        self.history_table.setRowCount(0)
+        self._search_last_id = None
+        self._search_exhausted = False
+        self._load_search_page()
+
+    def _history_scrolled(self, value):
+        if not self.history_search.text().strip() or self._search_exhausted:
+            return
+        if value >= self.history_table.verticalScrollBar().maximum():
+            self._load_search_page()
+
+    def _load_search_page(self):
+        page_size = 50
+        results = search_history(
+            self.history_search.text(), limit=page_size, before_id=self._search_last_id
+        )
+        if len(results) < page_size:
+            self._search_exhausted = True
+        for result in results:
+            self._search_last_id = result[0]
+            row_idx = self.history_table.rowCount()
+            self.history_table.insertRow(row_idx)
+            for col, value in enumerate(result[1:]):
+                item = QTableWidgetItem(str(value))
+                item.setTextAlignment(Qt.AlignCenter)
+                self.history_table.setItem(row_idx, col, item)
+            self._style_history_row(row_idx, QColor("#3aa35c"), QColor("#f0f4ff"))
+
     def _load_history(self):
+        if self.history_search.text().strip():
+            self._run_history_search()
+            return
         action_rows = list(self._action_rows)
         remaining = max(0, 20 - len(action_rows))
-        db_rows = fetch_history(limit=remaining + len(action_rows))
-
-        executed_rows = [row for status, row in action_rows if status == "exec"]
-        filtered_db = []
-        for row in db_rows:
-            if row in executed_rows:
-                executed_rows.remove(row)
-                continue
-            filtered_db.append(row)
-            if len(filtered_db) >= remaining:
-                break
+        # Executed rows are already listed above; the cache skips them by key.
+        executed_keys = {key for status, _, key in action_rows if status == "exec"}
+        stored_rows = self._history.rows(remaining, exclude=executed_keys)
 
-        rows = [row for _, row in action_rows] + filtered_db
+        rows = [row for _, row, _ in action_rows] + stored_rows
         self.history_table.setRowCount(0)
         for row_idx, row in enumerate(rows):
             self.history_table.insertRow(row_idx)
@@ -875,6 +1315,25 @@ class MainWindow(QMainWindow):
             else:
                 self._style_history_row(row_idx, QColor("#3aa35c"), QColor("#f0f4ff"))
 
+    def _poll_history(self):
+        # Other stations' executions arrive as rows past the last seen id.
+        rows = self._history_watcher.poll()
+        if self._history_watcher.rewound:
+            # Cleared elsewhere or a new month: reused ids would look like
+            # rows already cached, so start over from the newest rows.
+            try:
+                self._history.reload()
+            except sqlite3.OperationalError:
+                # The retry reconnects and reloads once the database answers.
+                self.status_label.setText("База истории недоступна, записи сохраняются локально")
+                self._history_retry_timer.start()
+                return
+        elif not self._history.merge(self._history_watcher.path, rows):
+            return
+        self._update_process_count()
+        if not self.history_search.text().strip():
+            self._load_history()
+
     def _style_history_row(self, row_idx, background, foreground):
         for col in range(self.history_table.columnCount()):
             item = self.history_table.item(row_idx, col)
@@ -883,8 +1342,7 @@ class MainWindow(QMainWindow):
                 item.setForeground(foreground)
 
     def _update_process_count(self):
-        count = count_history()
-        self.proc_label.setText(f"{count} процессов")
+        self.proc_label.setText(f"{self._history.count} процессов")
 
     def _export_report(self):
         export_dir = os.path.join(get_data_dir(), "exports")
@@ -946,6 +1404,12 @@ class MainWindow(QMainWindow):
                 padding: 2px 10px;
                 border-radius: 6px;
             }
+            QComboBox#MachineSelect, QComboBox#PresetSelect {
+                background: #1f2733;
+                border: 1px solid #3b4d69;
+                padding: 2px 10px;
+                border-radius: 6px;
+            }
             QCheckBox#AdditionalCheck {
                 color: #cfd7e6;
                 spacing: 8px;
@@ -1010,6 +1474,9 @@ class MainWindow(QMainWindow):
                 background: #2a3546;
                 border-radius: 6px;
             }
+            #FieldLabel {
+                color: #cfd7e6;
+            }
             #ResultLabel {
                 color: #9fb0c8;
                 font-size: 13px;
@@ -1022,6 +1489,11 @@ class MainWindow(QMainWindow):
                 color: #d3b26c;
                 padding: 4px 2px;
             }
+            #SensitivityLabel {
+                color: #9fb0c8;
+                font-size: 12px;
+                padding: 2px;
+            }
             #IdPanel {
                 background: #222a36;
                 border: 1px solid #3b4d69;
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+from app import auth
+
+FAST = 1000
+
+
+@pytest.fixture
+def users_db(tmp_path):
+    db_path = str(tmp_path / "users.db")
+    yield db_path
+    auth.close_connection()
+
+
+def _stored(db_path, login):
+    conn = sqlite3.connect(db_path)
+    row = conn.execute("SELECT password FROM users WHERE login=?", (login,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+def test_hash_is_salted_and_verifies():
+    first = auth.hash_password("secret", FAST)
+    second = auth.hash_password("secret", FAST)
+
+    assert first != second
+    assert first.startswith(f"{auth.HASH_SCHEME}${FAST}$")
+    assert auth.verify_password("secret", first)
+    assert not auth.verify_password("Secret", first)
+    assert "secret" not in first
+
+
+def test_legacy_plaintext_is_rehashed_on_login(users_db):
+    auth.set_password("seed", "x", users_db, FAST)
+    conn = sqlite3.connect(users_db)
+    conn.execute("INSERT INTO users(login, password) VALUES('old', 'plain')")
+    conn.commit()
+    conn.close()
+
+    assert not auth.check_user("old", "wrong", users_db, FAST)
+    assert _stored(users_db, "old") == "plain"
+    assert auth.check_user("old", "plain", users_db, FAST)
+    assert _stored(users_db, "old").startswith(f"{auth.HASH_SCHEME}${FAST}$")
+    assert auth.check_user("old", "plain", users_db, FAST)
+    assert not auth.check_user("nobody", "plain", users_db, FAST)
+
+
+def test_changed_iterations_rehash_on_login(users_db):
+    auth.set_password("operator", "secret", users_db, FAST)
+
+    assert auth.check_user("operator", "secret", users_db, 2 * FAST)
+    assert _stored(users_db, "operator").startswith(f"{auth.HASH_SCHEME}${2 * FAST}$")
+
+
+def test_session_expires_and_logs_out(users_db, monkeypatch):
+    monkeypatch.setattr(auth, "PBKDF2_ITERATIONS", FAST)
+    auth.set_password("operator", "secret", users_db, FAST)
+    assert auth.login("operator", "wrong", users_db) is None
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: now[0])
+
+    token = auth.login("operator", "secret", users_db)
+    assert auth.check_session(token) == "operator"
+    now[0] += auth.SESSION_TTL_S - 1
+    assert auth.check_session(token) == "operator"
+    now[0] += 1
+    assert auth.check_session(token) is None
+
+    token = auth.login("operator", "secret", users_db)
+    auth.logout(token)
+    assert auth.check_session(token) is None
+    assert auth.check_session(None) is None
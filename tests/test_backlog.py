@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from app import backlog, calculator_logic
+
+
+def _order(order_id, width, length=500.0, rolls=10):
+    return {"order_id": order_id, "roll_width": width, "roll_length": length, "order_rolls": rolls}
+
+
+def test_best_fit_is_the_widest_order_that_fits_at_the_same_length():
+    index = backlog.BacklogIndex(
+        [
+            _order("narrow", 40.0),
+            _order("wide", 58.0),
+            _order("too-wide", 61.0),
+            _order("other-length", 59.9, length=600.0),
+            _order("too-narrow", 15.0),
+        ]
+    )
+    assert index.best_fit(60.0, 500.0)["order_id"] == "wide"
+    assert index.best_fit(58.0, 500.04)["order_id"] == "wide"
+    assert index.best_fit(57.9, 500.0)["order_id"] == "narrow"
+    assert index.best_fit(39.0, 500.0) is None
+    assert index.best_fit(60.0, 700.0) is None
+
+
+def test_best_fit_agrees_with_a_linear_scan():
+    rng = random.Random(0)
+    orders = [
+        _order(f"B{number}", round(rng.uniform(10, 310), 1), float(rng.choice([300, 500, 700])))
+        for number in range(500)
+    ]
+    index = backlog.BacklogIndex(orders)
+    for _ in range(500):
+        width, length = rng.uniform(10, 320), float(rng.choice([300, 500, 700, 900]))
+        fitting = [
+            order for order in orders
+            if order["roll_length"] == length and order["roll_width"] <= width + backlog.WIDTH_TOLERANCE_MM
+        ]
+        found = index.best_fit(width, length)
+        if not fitting or max(order["roll_width"] for order in fitting) < calculator_logic.RANGE_ROLL_WIDTH[0]:
+            assert found is None
+        else:
+            assert found["roll_width"] == max(order["roll_width"] for order in fitting)
+
+
+def test_consume_and_remove_keep_the_index_consistent(tmp_path):
+    index = backlog.BacklogIndex([_order("A", 50.0, rolls=5), _order("B", 45.0)])
+    index.consume("A", 3)
+    assert index.best_fit(55.0, 500.0)["order_rolls"] == 2
+    index.consume("A", 2)
+    assert index.best_fit(55.0, 500.0)["order_id"] == "B"
+    index.add(_order("B", 52.0))
+    assert len(index) == 1
+    assert index.best_fit(51.0, 500.0) is None
+
+    path = str(tmp_path / "backlog.csv")
+    backlog.save_backlog(index, path)
+    assert backlog.load_backlog(path).orders() == index.orders()
+
+
+def test_trim_beside_matched_rolls_counts_as_waste():
+    # 900 mm useful width with 6 x 140 mm leaves a 60 mm strip.
+    result = calculator_logic.calculate(910, 900, 140, 500, 6000, 60)
+    assert result["additional_width_mm"] == pytest.approx(60.0)
+    index = backlog.BacklogIndex([_order("A", 50.0, rolls=4)])
+
+    matched = backlog.match_strip(result, index)
+
+    assert matched["backlog_match"]["rolls"] == 4
+    trim_area = 10 / 1000 * 500 * 4
+    assert matched["waste_area_m2"] == pytest.approx(result["waste_area_m2"] + trim_area, abs=0.05)
+    assert matched["useful_area_m2"] == pytest.approx(result["useful_area_m2"] - trim_area, abs=0.05)
+    assert matched["waste_percent"] > result["waste_percent"]
+
+    # An exact fit scraps nothing.
+    exact = backlog.match_strip(result, backlog.BacklogIndex([_order("B", 60.0)]))
+    assert exact["waste_percent"] == result["waste_percent"]
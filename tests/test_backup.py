@@ -0,0 +1,77 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app import db
+from app.db_stress import _sample_record
+
+
+@pytest.fixture
+def busy_db(tmp_path, monkeypatch):
+    # Many one-page steps so that writes land mid-copy and force restarts.
+    monkeypatch.setattr(db, "BACKUP_PAGES_PER_STEP", 1)
+    monkeypatch.setattr(db, "BACKUP_STEP_SLEEP_S", 0.005)
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+    conn = sqlite3.connect(db_path)
+    for index in range(500):
+        conn.execute(
+            "INSERT INTO history(timestamp, stock_number, material_code) VALUES ('00:00', ?, 'M')",
+            (f"{index:03d}/2026" + "x" * 200,),
+        )
+    conn.commit()
+    conn.close()
+
+    stop = threading.Event()
+    waits = []
+
+    def write():
+        index = 0
+        while not stop.is_set():
+            started = time.monotonic()
+            db.insert_history(_sample_record(9, index), db_path)
+            waits.append(time.monotonic() - started)
+            index += 1
+            time.sleep(0.01)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    while not waits:
+        time.sleep(0.001)
+    yield db_path, waits
+    stop.set()
+    writer.join()
+
+
+def test_backup_under_writes_never_holds_writers_for_the_whole_copy(busy_db, tmp_path, monkeypatch):
+    db_path, waits = busy_db
+    monkeypatch.setattr(db, "BACKUP_MAX_RESTARTS", 1)
+    remaining = []
+    dest = str(tmp_path / "backup.db")
+
+    db.backup_history(dest, db_path, progress=lambda status, left, total: remaining.append(left))
+
+    conn = sqlite3.connect(dest)
+    assert conn.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    assert conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] >= 500
+    conn.close()
+    # The copy was restarted by writes and still completed.
+    assert any(later > earlier for earlier, later in zip(remaining, remaining[1:]))
+    assert remaining[-1] == 0
+    assert max(waits) < 1.0
+
+
+def test_backup_that_cannot_finish_fails_cleanly(busy_db, tmp_path, monkeypatch):
+    db_path, waits = busy_db
+    monkeypatch.setattr(db, "BACKUP_BUDGET_S", 0.0)
+    monkeypatch.setattr(db, "BACKUP_MAX_RESTARTS", 0)
+    monkeypatch.setattr(db, "BACKUP_MAX_PAGES_PER_STEP", 1)
+    dest = str(tmp_path / "backup.db")
+
+    with pytest.raises(sqlite3.OperationalError):
+        db.backup_history(dest, db_path, compress=True)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("backup")]
+    assert max(waits) < 1.0
@@ -0,0 +1,34 @@
+import random
+from concurrent import futures
+
+import pytest
+
+from app import batch, differential
+
+
+def _jobs(count=300):
+    # Some invalid cases too: errors must come back in place, not abort the batch.
+    rng = random.Random(5)
+    return [differential.generate_case(rng) for _ in range(count)]
+
+
+@pytest.mark.parametrize("mode", ["threads", "processes", "interpreters"])
+def test_parallel_modes_match_serial(mode):
+    if mode == "interpreters" and not hasattr(futures, "InterpreterPoolExecutor"):
+        pytest.skip("no subinterpreter pool on this Python")
+    jobs = _jobs()
+    expected = batch.calculate_batch(jobs, mode="serial", chunk_size=40)
+
+    assert any("error" in result for result in expected)
+    assert batch.calculate_batch(jobs, workers=3, mode=mode, chunk_size=40) == expected
+    assert batch.calculate_batch(jobs[:1], workers=3, mode=mode) == expected[:1]
+    assert batch.calculate_batch([], workers=3, mode=mode) == []
+
+
+def test_calculate_leaves_module_state_alone():
+    assert batch.audit_shared_state(batch.sample_jobs(500), workers=4) == []
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        batch.calculate_batch(_jobs(1), mode="fibers")
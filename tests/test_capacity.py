@@ -0,0 +1,113 @@
+import itertools
+import json
+import math
+import random
+
+import pytest
+
+from app import capacity
+
+MACHINES = [
+    {"name": "A", "material_width": 910, "useful_width": 900, "big_roll_length": 22000},
+    {"name": "B", "material_width": 910, "useful_width": 900, "big_roll_length": 22000},
+]
+
+
+def _order(order_id, rolls, width=150.0, length=100.0):
+    return {"order_id": order_id, "roll_width": width, "roll_length": length, "order_rolls": rolls}
+
+
+def _finish(allocation, options, loads):
+    return max(loads[name] + cycles / options[name][0] for name, cycles in allocation.items())
+
+
+def _rolls_by_order(plan):
+    rolls = {}
+    for machine in plan["machines"].values():
+        for job in machine["timeline"]:
+            rolls[job["order_id"]] = rolls.get(job["order_id"], 0) + job["rolls"]
+    return rolls
+
+
+def test_large_orders_are_split_and_small_ones_are_not():
+    plan = capacity.plan_capacity(
+        [_order("big", 600), _order("small", 12), _order("too-wide", 12, width=2000.0)], MACHINES
+    )
+
+    assert plan["unassigned"] == ["too-wide"]
+    assert plan["shortages"] == {}
+    assert _rolls_by_order(plan) == {"big": 600, "small": 12}
+    assert all(
+        [job["order_id"] for job in machine["timeline"]].count("big") == 1
+        for machine in plan["machines"].values()
+    )
+    assert plan["makespan_hours"] == pytest.approx(4 + 1 / 3)
+    for machine in plan["machines"].values():
+        ends = [0.0] + [job["end_hours"] for job in machine["timeline"]]
+        starts = [job["start_hours"] for job in machine["timeline"]]
+        assert starts == pytest.approx(ends[:-1])
+        assert machine["finish_hours"] == pytest.approx(ends[-1])
+
+
+def test_cycles_stay_within_each_machines_jumbo():
+    # 1010 m of jumbo less 10 m setup is ten 100 m cycles.
+    short_jumbo = [dict(MACHINES[0], big_roll_length=1010), MACHINES[1]]
+    plan = capacity.plan_capacity([_order("big", 600)], short_jumbo)
+    cycles = {
+        name: sum(job["cycles"] for job in machine["timeline"])
+        for name, machine in plan["machines"].items()
+    }
+    assert cycles == {"A": 10, "B": 90}
+    assert plan["shortages"] == {}
+
+    # The 500 m order takes what is left; nothing remains for the next one.
+    small_jumbos = [
+        dict(MACHINES[0], big_roll_length=1010),
+        dict(MACHINES[1], big_roll_length=2010),
+    ]
+    orders = [_order("big", 600), _order("late", 6, length=500.0)]
+    plan = capacity.plan_capacity(orders, small_jumbos)
+    assert _rolls_by_order(plan) == {"big": 180}
+    assert plan["shortages"] == {"big": 420, "late": 6}
+
+
+def test_water_fill_matches_the_best_two_machine_split():
+    rng = random.Random(0)
+    for _ in range(200):
+        options = {name: (rng.randint(2, 12), rng.randint(1, 8)) for name in "AB"}
+        loads = {"A": rng.choice([0.0, 0.5, 2.0]), "B": rng.choice([0.0, 1.25])}
+        rolls = rng.randint(1, 120)
+
+        caps = {name: rng.choice([3, 40, 1000]) for name in "AB"}
+
+        allocation = capacity._water_fill(rolls, options, loads, caps)
+
+        assert all(allocation[name] <= caps[name] for name in allocation)
+        if sum(caps[name] * options[name][1] for name in "AB") < rolls:
+            assert allocation == caps
+            continue
+        assert sum(cycles * options[name][1] for name, cycles in allocation.items()) >= rolls
+        best = min(
+            _finish({name: cycles for name, cycles in zip("AB", split) if cycles}, options, loads)
+            for split in itertools.product(
+                *(range(min(caps[name], math.ceil(rolls / options[name][1])) + 1) for name in "AB")
+            )
+            if split != (0, 0) and split[0] * options["A"][1] + split[1] * options["B"][1] >= rolls
+        )
+        assert _finish(allocation, options, loads) <= best + 1e-5
+
+
+def test_order_book_and_machines_load_from_files(tmp_path):
+    orders_path = tmp_path / "orders.csv"
+    orders_path.write_text(
+        "order_id,roll_width,roll_length,order_rolls\nB1,150,100,40\n", encoding="utf-8"
+    )
+    machines_path = tmp_path / "machines.json"
+    machines_path.write_text(json.dumps(MACHINES), encoding="utf-8")
+
+    assert capacity.load_order_book(str(orders_path)) == [_order("B1", 40)]
+    assert capacity.load_machines(str(machines_path)) == MACHINES
+
+    machines_path.write_text(json.dumps(MACHINES[0]), encoding="utf-8")
+    with pytest.raises(ValueError):
+        capacity.load_machines(str(machines_path))
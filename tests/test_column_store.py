@@ -0,0 +1,182 @@
+import os
+
+import pytest
+
+from app import column_store, db
+
+
+def _record(index):
+    return {
+        "timestamp": f"{index // 60 % 24:02d}:{index % 60:02d}",
+        "stock_number": f"{index % 1000:03d}/2026",
+        "material_code": f"M{index % 3}" if index % 4 else None,
+        "material_width": 910.0,
+        "useful_width": 900.0,
+        "big_roll_length": 6000.0,
+        "roll_width": 150.0 + index,
+        "roll_length": 500.0,
+        "main_count": 6,
+        "additional_width": 0.0,
+        "total_rolls": 60,
+        "used_length_m": 5010.0,
+        "surplus_rolls": 0,
+        "surplus_main_rolls": index % 2,
+        "surplus_additional_rolls": 0,
+        "total_area": 4559.1,
+        "useful_area": 4500.0 + index,
+        "waste_area": 59.1,
+        "waste_percent": 1.0 + index % 5,
+    }
+
+
+def test_recent_rows_come_back_newest_first(tmp_path):
+    store = str(tmp_path)
+    column_store.append_records([_record(i) for i in range(5)], store)
+    column_store.append_records([_record(5)], store)
+
+    assert column_store.count_rows(store) == 6
+    rows = column_store.fetch_recent(3, store)
+    assert rows == [tuple(_record(i)[key] for key in db.HISTORY_VIEW_KEYS) for i in (5, 4, 3)]
+
+
+def test_segments_roll_over_and_are_read_across(tmp_path, monkeypatch):
+    monkeypatch.setattr(column_store, "SEGMENT_ROWS", 3)
+    store = str(tmp_path)
+    column_store.append_records([_record(i) for i in range(7)], store)
+    column_store.append_records([_record(7)], store)
+
+    assert len(column_store._list_segments(store)) == 3
+    assert column_store.count_rows(store) == 8
+    assert [row[3] for row in column_store.fetch_recent(5, store)] == [157.0, 156.0, 155.0, 154.0, 153.0]
+    assert list(column_store.scan_column("roll_width", store)) == [150.0 + i for i in range(8)]
+
+
+def test_torn_append_is_ignored_and_overwritten(tmp_path):
+    store = str(tmp_path)
+    column_store.append_records([_record(0), _record(1)], store)
+    segment = column_store._list_segments(store)[0]
+    with open(column_store._column_path(segment, "waste_percent"), "ab") as f:
+        f.write(b"\x01\x02\x03")
+
+    assert column_store.count_rows(store) == 2
+    column_store.append_records([_record(2)], store)
+    assert list(column_store.scan_column("waste_percent", store)) == [1.0, 2.0, 3.0]
+
+
+def test_aggregate_rejects_text_columns(tmp_path):
+    with pytest.raises(ValueError):
+        column_store.aggregate("material_code", store_dir=str(tmp_path))
+
+
+def test_app_db_writes_through_and_both_backends_agree(tmp_path, monkeypatch):
+    monkeypatch.setenv(db.HISTORY_DB_ENV, str(tmp_path / "history.db"))
+    monkeypatch.delenv(db.HISTORY_PARTITIONS_ENV, raising=False)
+    monkeypatch.setattr(db, "get_spool_path", lambda: str(tmp_path / "spool.jsonl"))
+    monkeypatch.setattr(column_store, "get_column_store_dir", lambda: str(tmp_path / "columns"))
+    monkeypatch.setenv(db.HISTORY_COLUMNS_ENV, "1")
+    db.init_history_db()
+    for index in range(20):
+        db.insert_history(_record(index))
+
+    assert column_store.count_rows() == db.count_history() == 20
+    from_columns = db.aggregate_history("useful_area", group_by="material_code")
+    monkeypatch.delenv(db.HISTORY_COLUMNS_ENV)
+    from_sqlite = db.aggregate_history("useful_area", group_by="material_code")
+    assert from_columns == from_sqlite
+    assert from_sqlite[None]["count"] == 5
+
+    with pytest.raises(ValueError):
+        db.aggregate_history("useful_area; DROP TABLE history")
+    assert db.count_history() == 20
+
+
+def _full_record(index):
+    return dict(
+        _record(index),
+        main_count=6 + index % 2,
+        additional_width=None if index % 3 else 20.0,
+        order_rolls=None if index % 5 == 0 else 40 + index % 2,
+        machine=None if index % 4 == 0 else "default",
+        created_at_ms=None if index % 6 == 0 else 1_700_000_000_000 + index,
+    )
+
+
+@pytest.fixture
+def both_backends(tmp_path, monkeypatch):
+    monkeypatch.setenv(db.HISTORY_DB_ENV, str(tmp_path / "history.db"))
+    monkeypatch.delenv(db.HISTORY_PARTITIONS_ENV, raising=False)
+    monkeypatch.setattr(db, "get_spool_path", lambda: str(tmp_path / "spool.jsonl"))
+    monkeypatch.setattr(column_store, "get_column_store_dir", lambda: str(tmp_path / "columns"))
+    monkeypatch.setenv(db.HISTORY_COLUMNS_ENV, "1")
+    db.init_history_db()
+    for index in range(30):
+        db.insert_history(_full_record(index))
+
+    def aggregate(column, group_by=None):
+        monkeypatch.setenv(db.HISTORY_COLUMNS_ENV, "1")
+        from_columns = db.aggregate_history(column, group_by)
+        monkeypatch.delenv(db.HISTORY_COLUMNS_ENV)
+        from_sqlite = db.aggregate_history(column, group_by)
+        return from_columns, from_sqlite
+
+    return aggregate
+
+
+@pytest.mark.parametrize(
+    "column, group_by",
+    [
+        ("useful_area", "main_count"),
+        ("useful_area", "machine"),
+        ("waste_percent", "order_rolls"),
+        ("additional_width", "material_code"),
+        ("order_rolls", None),
+        ("created_at_ms", "additional_width"),
+    ],
+)
+def test_backends_agree_on_every_column(both_backends, column, group_by):
+    from_columns, from_sqlite = both_backends(column, group_by)
+    assert from_columns.keys() == from_sqlite.keys()
+    for key, bucket in from_sqlite.items():
+        assert from_columns[key]["count"] == bucket["count"]
+        assert from_columns[key]["sum"] == pytest.approx(bucket["sum"])
+
+
+@pytest.mark.parametrize(
+    "column, group_by", [("nope", None), ("useful_area", "nope"), ("machine", None)]
+)
+def test_backends_reject_the_same_names(both_backends, monkeypatch, column, group_by):
+    with pytest.raises(ValueError):
+        db.aggregate_history(column, group_by)
+    monkeypatch.delenv(db.HISTORY_COLUMNS_ENV)
+    with pytest.raises(ValueError):
+        db.aggregate_history(column, group_by)
+
+
+def test_segments_from_before_new_columns_read_as_null(tmp_path):
+    store = str(tmp_path)
+    column_store.append_records([_record(0), _record(1)], store)
+    segment = column_store._list_segments(store)[0]
+    for column in ("order_rolls", "machine", "created_at_ms"):
+        os.remove(column_store._column_path(segment, column))
+
+    assert column_store.count_rows(store) == 2
+    column_store.append_records([_full_record(1)], store)
+    assert list(column_store.scan_column("order_rolls", store)) == [None, None, 41]
+    assert list(column_store.scan_column("machine", store)) == [None, None, "default"]
+
+
+def test_dictionaries_are_read_once_per_store(tmp_path, monkeypatch):
+    store = str(tmp_path)
+    column_store.append_records([_record(0)], store)
+    loads = []
+    original = column_store._load_dictionary
+    monkeypatch.setattr(
+        column_store, "_load_dictionary", lambda *args: loads.append(args) or original(*args)
+    )
+    for index in range(1, 5):
+        column_store.append_records([_record(index)], store)
+
+    assert loads == []
+    assert list(column_store.scan_column("stock_number", store)) == [
+        f"{index:03d}/2026" for index in range(5)
+    ]
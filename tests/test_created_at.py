@@ -0,0 +1,135 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+
+MINSK = db.get_minsk_tz()
+STOCK = db.HISTORY_VIEW_KEYS.index("stock_number")
+
+
+def _at(day, hour, minute=0):
+    return datetime(2026, 3, day, hour, minute, tzinfo=MINSK)
+
+
+def _record(stock_number, created_at=None, timestamp="00:00"):
+    return {
+        "timestamp": timestamp,
+        "stock_number": stock_number,
+        "material_code": "M1",
+        "material_width": 910.0,
+        "useful_width": 900.0,
+        "big_roll_length": 6000.0,
+        "roll_width": 150.0,
+        "roll_length": 500.0,
+        "main_count": 6,
+        "additional_width": 0.0,
+        "total_rolls": 60,
+        "used_length_m": 5010.0,
+        "surplus_rolls": 0,
+        "surplus_main_rolls": 0,
+        "surplus_additional_rolls": 0,
+        "total_area": 4559.1,
+        "useful_area": 4500.0,
+        "waste_area": 59.1,
+        "waste_percent": 1.3,
+        "created_at_ms": None if created_at is None else db.to_epoch_ms(created_at),
+    }
+
+
+@pytest.fixture
+def history_db(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+    return db_path
+
+
+@pytest.fixture
+def foreign_host_zone(monkeypatch):
+    # A host clock far from Minsk shows whether naive datetimes leak its zone.
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.parametrize(
+    "when, start, end",
+    [
+        (_at(2, 0, 5), _at(1, 20), _at(2, 8)),
+        (_at(2, 7, 59), _at(1, 20), _at(2, 8)),
+        (_at(2, 8), _at(2, 8), _at(2, 20)),
+        (_at(2, 19, 59), _at(2, 8), _at(2, 20)),
+        (_at(2, 20), _at(2, 20), _at(3, 8)),
+        (_at(2, 23, 59), _at(2, 20), _at(3, 8)),
+    ],
+)
+def test_shift_bounds_switch_at_eight_and_twenty(when, start, end):
+    assert db.shift_bounds(when) == (start, end)
+
+
+def test_naive_datetimes_are_minsk_time(foreign_host_zone):
+    naive = datetime(2026, 3, 2, 8, 0)
+    aware = naive.replace(tzinfo=MINSK)
+
+    assert db.to_epoch_ms(naive) == db.to_epoch_ms(aware)
+    assert db.shift_bounds(naive) == db.shift_bounds(aware) == (_at(2, 8), _at(2, 20))
+    assert db.partition_name(datetime(2026, 3, 31, 23, 30)) == "2026_03"
+    assert db.last_days_bounds(1, naive) == (_at(1, 8), aware)
+
+
+def test_estimate_walks_back_across_midnight():
+    anchor = _at(2, 0, 30)
+
+    assert db._estimate_created_at(anchor, "00:10") == _at(2, 0, 10)
+    assert db._estimate_created_at(anchor, "00:30") == anchor
+    assert db._estimate_created_at(anchor, "23:50") == _at(1, 23, 50)
+    assert db._estimate_created_at(anchor, "bad") == anchor
+    assert db._estimate_created_at(anchor, None) == anchor
+
+
+def test_migration_dates_clock_only_rows_from_the_newest_known_time(history_db):
+    for timestamp in ("22:00", "23:30", "00:15", "01:00"):
+        db.insert_history(_record(timestamp, timestamp=timestamp), history_db)
+    db.insert_history(_record("known", _at(2, 1, 30), "01:30"), history_db)
+
+    assert db.migrate_created_at(history_db, batch_size=2) == 4
+    assert db.migrate_created_at(history_db) == 0
+
+    conn = sqlite3.connect(history_db)
+    rows = conn.execute("SELECT stock_number, created_at_ms FROM history ORDER BY id").fetchall()
+    conn.close()
+    assert rows == [
+        ("22:00", db.to_epoch_ms(_at(1, 22))),
+        ("23:30", db.to_epoch_ms(_at(1, 23, 30))),
+        ("00:15", db.to_epoch_ms(_at(2, 0, 15))),
+        ("01:00", db.to_epoch_ms(_at(2, 1))),
+        ("known", db.to_epoch_ms(_at(2, 1, 30))),
+    ]
+
+
+def test_range_filters_fetch_and_count(history_db, foreign_host_zone):
+    created = {
+        "night": _at(2, 7, 59),
+        "start": _at(2, 8),
+        "day": _at(2, 12),
+        "late": _at(2, 19, 59),
+        "evening": _at(2, 20),
+    }
+    for name, when in created.items():
+        db.insert_history(_record(name, when), history_db)
+
+    start, end = db.shift_bounds(_at(2, 12))
+    rows = db.fetch_history(10, history_db, start, end)
+    assert [row[STOCK] for row in rows] == ["late", "day", "start"]
+    assert db.count_history(history_db, start, end) == 3
+    assert db.count_history(history_db, start=start) == 4
+    assert db.count_history(history_db, end=end) == 4
+    assert [row[STOCK] for row in db.fetch_history(2, history_db, start, end)] == ["late", "day"]
+
+    naive_start, naive_end = (when.replace(tzinfo=None) for when in (start, end))
+    assert db.fetch_history(10, history_db, naive_start, naive_end) == rows
+    assert db.count_history(history_db, naive_start, naive_end + timedelta(minutes=1)) == 4
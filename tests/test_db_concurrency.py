@@ -0,0 +1,59 @@
+import sqlite3
+import time
+
+import pytest
+
+from app import db
+from app.db_stress import _sample_record, run_stress
+
+
+def test_concurrent_writers_lose_and_duplicate_nothing(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    report = run_stress(db_path, writers=4, readers=2, records_per_writer=100)
+
+    assert report["errors"] == []
+    assert report["inserted"] == report["expected"] == 400
+    conn = sqlite3.connect(db_path)
+    keys = conn.execute("SELECT material_code, stock_number FROM history").fetchall()
+    conn.close()
+    expected = {
+        (f"W{writer_id}", _sample_record(writer_id, index)["stock_number"])
+        for writer_id in range(4)
+        for index in range(100)
+    }
+    assert len(keys) == len(set(keys))
+    assert set(keys) == expected
+
+
+def test_write_wait_is_bounded(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+    monkeypatch.setattr(db, "WRITE_BUDGET_S", 0.5)
+    holder = sqlite3.connect(db_path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        with pytest.raises(sqlite3.OperationalError):
+            db.insert_history(_sample_record(0, 0), db_path)
+        assert time.monotonic() - started < 1.5
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+
+def test_unreachable_shared_db_spools_and_flushes_later(tmp_path, monkeypatch):
+    shared = tmp_path / "share" / "history.db"
+    monkeypatch.setenv(db.HISTORY_DB_ENV, str(shared))
+    monkeypatch.delenv(db.HISTORY_PARTITIONS_ENV, raising=False)
+    monkeypatch.setattr(db, "get_spool_path", lambda: str(tmp_path / "spool.jsonl"))
+
+    with pytest.raises(sqlite3.OperationalError):
+        db.init_history_db()
+    assert db.insert_history(_sample_record(0, 1)) is None
+    assert db.insert_history(_sample_record(0, 2)) is None
+
+    shared.parent.mkdir()
+    db.init_history_db()
+    assert db.flush_history_spool() == 2
+    assert db.flush_history_spool() == 0
+    assert db.count_history() == 2
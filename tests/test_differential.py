@@ -0,0 +1,25 @@
+from app import calculator_logic, differential
+
+
+def test_layout_table_matches_the_reference_exactly():
+    report = differential.run_differential("layout_table", count=4000, seed=1, workers=1)
+    assert report["mismatches"] == 0, report["reproducers"]
+    assert report["cases"] == 4000
+
+
+def test_a_wrong_candidate_is_reported_and_minimized(monkeypatch):
+    def off_by_one(*case):
+        result = calculator_logic.calculate(*case)
+        if result["main_count"] > 3:
+            result = dict(result, total_rolls=result["total_rolls"] + 1)
+        return result
+
+    monkeypatch.setitem(differential.CANDIDATES, "off_by_one", off_by_one)
+    mismatches, found = differential._run_chunk("off_by_one", 0, 0, 300, 0.1)
+    assert mismatches > 0
+    case, differences = found[0]
+    assert [key for key, _, _ in differences] == ["total_rolls"]
+
+    minimized = differential.minimize_case(off_by_one, case)
+    assert differential._mismatches(off_by_one, minimized)
+    assert all(value is None or value == round(value) for value in minimized)
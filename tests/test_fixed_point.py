@@ -0,0 +1,71 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+from app import calculator_logic, differential, fixed_point
+
+
+def _float_artifact(case, reference):
+    # Where the float path is inexact: floor division misses an exact
+    # multiple, a remainder lands on the wrong side of a range bound, or
+    # rounding a tie up makes the slits overrun the useful width.
+    useful, roll = case[1], case[2]
+    exact_count, exact_rest = divmod(Fraction(str(useful)), Fraction(str(roll)))
+    float_count = int(useful // roll)
+    float_rest = useful - float_count * roll
+    low, high = calculator_logic.RANGE_ROLL_WIDTH
+    return (
+        exact_count != float_count
+        or (low <= exact_rest <= high) != (low <= float_rest <= high)
+        or reference["remaining_width_mm"] < 0
+    )
+
+
+def test_mismatches_beyond_display_rounding_are_float_artifacts():
+    rng = random.Random(3)
+    checked = 0
+    for _ in range(10_000):
+        case = differential.generate_case(rng)
+        differences = differential._mismatches(
+            fixed_point.calculate_fixed, case, differential.DISPLAY_ROUNDING
+        )
+        if differences:
+            assert differences[0][0] != "outcome", (case, differences)
+            reference = differential.reference_calculate(*case)
+            assert _float_artifact(case, reference), (case, differences)
+            checked += 1
+    assert 0 < checked < 100
+
+
+@pytest.mark.parametrize(
+    "useful, roll",
+    [(849.0, 84.9), (127.8, 21.3), (310.5, 32.0), (381.0, 32.7), (385.1, 195.2)],
+)
+def test_slits_never_overrun_the_useful_width(useful, roll):
+    raw = fixed_point.calculate_raw(910, useful, roll, 500, 6000, 100)
+    used = raw["main_count"] * raw["roll_width"] + raw["additional_width"]
+    assert raw["remaining_width"] >= 0
+    assert used <= raw["useful_width"]
+    # 849 is exactly 10 x 84.9, which float floor division misses.
+    if (useful, roll) == (849.0, 84.9):
+        assert (raw["main_count"], raw["remaining_width"]) == (10, 0)
+
+
+def test_raw_values_are_integers_and_convert_back():
+    raw = fixed_point.calculate_raw(910, 900, 150, 500, 6000, 60)
+    key = fixed_point.raw_key(raw)
+    again = fixed_point.calculate_raw(910, 900, 150, 500, 6000, 60)
+    assert hash(key) == hash(fixed_point.raw_key(again))
+    assert all(isinstance(value, int) for value in key[:-1])
+
+    result = fixed_point.to_result(raw)
+    expected = calculator_logic.calculate(910, 900, 150, 500, 6000, 60)
+    assert result == expected
+
+
+def test_invalid_inputs_raise_like_calculate():
+    with pytest.raises(ValueError):
+        fixed_point.calculate_fixed(910, 900, 150, 500, 6000, 0)
+    with pytest.raises(ValueError):
+        fixed_point.calculate_fixed(910, 900, 150, 500, 6000, 60, 400)
@@ -0,0 +1,127 @@
+import pytest
+
+from app import db
+
+STOCK = db.HISTORY_VIEW_KEYS.index("stock_number")
+
+
+def _record(stock_number):
+    return {
+        "timestamp": "00:00",
+        "stock_number": stock_number,
+        "material_code": "M1",
+        "material_width": 910.0,
+        "useful_width": 900.0,
+        "big_roll_length": 6000.0,
+        "roll_width": 150.0,
+        "roll_length": 500.0,
+        "main_count": 6,
+        "additional_width": 0.0,
+        "total_rolls": 60,
+        "used_length_m": 5010.0,
+        "surplus_rolls": 0,
+        "surplus_main_rolls": 0,
+        "surplus_additional_rolls": 0,
+        "total_area": 4559.1,
+        "useful_area": 4500.0,
+        "waste_area": 59.1,
+        "waste_percent": 1.3,
+    }
+
+
+@pytest.fixture
+def history_db(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+    return db_path
+
+
+def _station(history_db, size=5):
+    cache = db.HistoryCache(size=size, db_path=history_db)
+    watcher = db.HistoryWatcher(history_db)
+    cache.reload()
+    watcher.poll()
+    return cache, watcher
+
+
+def _poll(cache, watcher):
+    rows = watcher.poll()
+    if watcher.rewound:
+        cache.reload()
+        return
+    cache.merge(watcher.path, rows)
+
+
+def _stock_numbers(cache):
+    return [row[STOCK] for row in cache.rows()]
+
+
+def _newest(history_db, size):
+    return [row[STOCK] for row in db.fetch_history(size, history_db)]
+
+
+def test_rows_from_other_stations_interleave_by_id(history_db):
+    cache, watcher = _station(history_db)
+    for number in range(3):
+        db.insert_history(_record(f"other-{number}"), history_db)
+    # Written here after the others but before this station polls them.
+    cache.insert(_record("own"))
+    db.insert_history(_record("other-3"), history_db)
+
+    _poll(cache, watcher)
+
+    assert _stock_numbers(cache) == ["other-3", "own", "other-2", "other-1", "other-0"]
+    assert cache.count == db.count_history(history_db) == 5
+
+
+def test_rows_older_than_the_cache_are_dropped(history_db):
+    cache, watcher = _station(history_db, size=3)
+    for number in range(3):
+        db.insert_history(_record(f"other-{number}"), history_db)
+    for number in range(3):
+        cache.insert(_record(f"own-{number}"))
+
+    _poll(cache, watcher)
+
+    assert _stock_numbers(cache) == ["own-2", "own-1", "own-0"]
+    assert cache.count == 6
+
+
+def test_clear_elsewhere_reloads_instead_of_merging_the_delta(history_db):
+    cache, watcher = _station(history_db)
+    for number in range(8):
+        cache.insert(_record(f"old-{number}"))
+    _poll(cache, watcher)
+
+    db.clear_history(history_db)
+    for number in range(7):
+        db.insert_history(_record(f"new-{number}"), history_db)
+    _poll(cache, watcher)
+
+    assert watcher.rewound
+    assert _stock_numbers(cache) == _newest(history_db, 5)
+    assert cache.count == 7
+
+    db.insert_history(_record("new-7"), history_db)
+    _poll(cache, watcher)
+    assert _stock_numbers(cache)[0] == "new-7"
+    assert cache.count == 8
+
+
+def test_count_follows_the_deltas_without_recounting(history_db, monkeypatch):
+    cache, watcher = _station(history_db)
+    cache.insert(_record("own"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("counted the table")
+
+    monkeypatch.setattr(db, "count_history", fail)
+    for number in range(4):
+        db.insert_history(_record(f"other-{number}"), history_db)
+    cache.insert(_record("own-2"))
+    _poll(cache, watcher)
+    _poll(cache, watcher)
+
+    assert cache.count == 6
+    monkeypatch.undo()
+    assert db.count_history(history_db) == 6
@@ -0,0 +1,53 @@
+import random
+
+from app import jumbos
+from app.calculator_logic import MAX_BIG_ROLL_LENGTH_M
+
+
+def _jumbo(stock_number, length_m, material_width=910.0, useful_width=900.0, material_code="A"):
+    return {
+        "stock_number": stock_number,
+        "material_code": material_code,
+        "material_width": material_width,
+        "useful_width": useful_width,
+        "length_m": length_m,
+    }
+
+
+def test_shortest_jumbo_that_covers_the_order_is_picked():
+    index = jumbos.JumboIndex(
+        [_jumbo("001/2026", 3000.0), _jumbo("002/2026", 6000.0), _jumbo("003/2026", 9000.0)]
+    )
+    # 60 rolls of 150 mm x 500 m: 10 cycles, 5010 m with setup.
+    jumbo, result = index.best_jumbo("A", 150, 500, 60)
+    assert jumbo["stock_number"] == "002/2026"
+    assert result["shortage_rolls"] == 0
+
+
+def test_invalid_longest_jumbo_does_not_hide_its_group():
+    index = jumbos.JumboIndex(
+        [
+            _jumbo("001/2026", 6000.0),
+            _jumbo("002/2026", MAX_BIG_ROLL_LENGTH_M + 1.0),
+            _jumbo("003/2026", 0.0),
+            _jumbo("004/2026", None),
+        ]
+    )
+    assert len(index) == 1
+    jumbo, _ = index.best_jumbo("A", 150, 500, 60)
+    assert jumbo["stock_number"] == "001/2026"
+
+
+def test_index_agrees_with_a_full_scan():
+    rng = random.Random(1)
+    widths = [(910.0, 900.0), (800.0, 780.0), (700.0, 690.0)]
+    stock = [
+        _jumbo(f"{number:03d}/2026", float(rng.randint(400, MAX_BIG_ROLL_LENGTH_M)), *rng.choice(widths))
+        for number in range(300)
+    ]
+    index = jumbos.JumboIndex(stock)
+    for _ in range(50):
+        order = (rng.uniform(20, 200), float(rng.randint(100, 500)), rng.randint(10, 900))
+        jumbo, result = index.best_jumbo("A", *order)
+        brute = jumbos._brute_force(stock, *order)
+        assert brute[0] == (result["shortage_rolls"], result["waste_percent"], jumbo["length_m"])
@@ -0,0 +1,85 @@
+import subprocess
+import sys
+
+import pytest
+
+from app import calculator_logic, layout_table
+
+
+@pytest.fixture
+def table_path(tmp_path, monkeypatch):
+    path = tmp_path / layout_table.TABLE_FILENAME
+    monkeypatch.setattr(layout_table, "get_layout_table_path", lambda: str(path))
+    monkeypatch.setattr(layout_table, "_table", None)
+    monkeypatch.setattr(layout_table, "_table_loaded", False)
+    return path
+
+
+def test_table_matches_computed_layouts(table_path):
+    layout_table.build_layout_table(str(table_path))
+    table = layout_table.LayoutTable(str(table_path))
+    try:
+        for useful in range(500, 911, 13):
+            for roll in range(20, 311, 7):
+                expected = calculator_logic._apply_roll_width_adjustment(float(useful), float(roll))
+                count, adjusted, tenths = table.lookup(useful, roll)
+                assert count == expected[1]
+                assert bool(adjusted) == expected[3]
+                if adjusted:
+                    assert tenths == round(expected[0] * 10)
+    finally:
+        table.close()
+
+
+def test_missing_table_is_built_on_first_use(table_path):
+    assert not table_path.exists()
+    table = layout_table.get_layout_table()
+    assert table is not None
+    assert table.rules == calculator_logic.layout_rules_digest()
+
+
+def _build_with_other_rules(path, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(calculator_logic, "layout_rules_digest", lambda: b"\0" * 20)
+        layout_table.build_layout_table(str(path))
+
+
+def test_table_from_other_rules_is_rebuilt(table_path, monkeypatch):
+    _build_with_other_rules(table_path, monkeypatch)
+
+    table = layout_table.get_layout_table()
+    assert table is not None
+    assert table.rules == calculator_logic.layout_rules_digest()
+
+
+def test_stale_table_is_not_served_when_frozen(table_path, monkeypatch):
+    _build_with_other_rules(table_path, monkeypatch)
+    monkeypatch.setattr(layout_table.sys, "frozen", True, raising=False)
+
+    assert layout_table.get_layout_table() is None
+
+
+def test_rules_signature_follows_the_layout_rules_and_code(monkeypatch):
+    signature = calculator_logic.rules_signature()
+    # Presets outlive the process, so the signature must not depend on it.
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from app import calculator_logic; print(calculator_logic.rules_signature())",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert completed.stdout.strip() == signature
+
+    with monkeypatch.context() as patch:
+        patch.setattr(calculator_logic, "layout_rules_digest", lambda: b"\0" * 20)
+        assert calculator_logic.rules_signature() != signature
+
+    def layout_step(useful_width_mm, roll_width_mm):
+        return calculator_logic._apply_roll_width_adjustment(useful_width_mm, roll_width_mm)
+
+    monkeypatch.setattr(calculator_logic, "_layout_step", layout_step)
+    assert calculator_logic.rules_signature() != signature
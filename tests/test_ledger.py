@@ -0,0 +1,51 @@
+import logging
+import sqlite3
+
+from app import db
+from app.db_stress import _sample_record
+
+
+def _execute(db_path, stock_number, big_roll_length, used_length_m):
+    record = _sample_record(0, 0)
+    record.update(
+        stock_number=stock_number, big_roll_length=big_roll_length, used_length_m=used_length_m
+    )
+    db.insert_history(record, db_path)
+
+
+def test_execution_shortens_a_registered_jumbo(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+    db.upsert_jumbos(
+        [{"stock_number": "001/2026", "material_code": "A", "material_width": 910.0,
+          "useful_width": 900.0, "length_m": 6000.0}],
+        db_path,
+    )
+
+    _execute(db_path, "001/2026", 6000.0, 2510.0)
+    _execute(db_path, "001/2026", 3490.0, 3500.0)
+
+    jumbo = db.get_jumbo("001/2026", db_path)
+    assert jumbo["length_m"] == 0.0
+    assert (jumbo["material_code"], jumbo["useful_width"]) == ("A", 900.0)
+    assert [row[4] for row in db.fetch_jumbo_ledger("001/2026", db_path)] == [3490.0, 0.0]
+
+
+def test_unregistered_stock_number_is_logged_not_invented(tmp_path, caplog):
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+
+    with caplog.at_level(logging.DEBUG, logger=db.__name__):
+        _execute(db_path, "777/2026", 6000.0, 2510.0)
+
+    assert db.get_jumbo("777/2026", db_path) is None
+    assert db.fetch_jumbos(db_path=db_path) == []
+    assert "777/2026" in caplog.text
+    assert all(record.levelno < logging.WARNING for record in caplog.records)
+    assert db.get_ledger_remaining("777/2026", db_path) == 3490.0
+    _execute(db_path, "777/2026", 3490.0, 1000.0)
+    assert db.get_ledger_remaining("777/2026", db_path) == 2490.0
+    assert db.get_ledger_remaining("778/2026", db_path) is None
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] == 2
+    conn.close()
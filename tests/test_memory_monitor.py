@@ -0,0 +1,73 @@
+import json
+import tracemalloc
+
+import pytest
+
+from app import memory_monitor
+
+
+@pytest.fixture
+def rss(monkeypatch):
+    readings = [1000]
+    monkeypatch.setattr(memory_monitor, "current_rss_bytes", lambda: readings[-1])
+    yield readings
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _monitor(tmp_path, **kwargs):
+    report_path = str(tmp_path / "memory_report.jsonl")
+    monitor = memory_monitor.MemoryMonitor(
+        counters=lambda: {"rows": 1}, report_path=report_path, rss_alert_bytes=100, **kwargs
+    )
+    monitor.start()
+    return monitor, report_path
+
+
+def _report(report_path):
+    with open(report_path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_alerts_once_per_threshold_crossed(tmp_path, rss):
+    monitor, _ = _monitor(tmp_path, trace=False)
+    alerts = []
+    for reading in (1050, 1100, 1150, 1199, 1350, 1380, 1400, 1200, 1520):
+        rss.append(reading)
+        alerts.append(monitor.sample()["alert"])
+
+    assert alerts == [False, True, False, False, True, False, True, False, True]
+    assert monitor._alerts == 5
+
+
+def test_tracing_switches_on_after_the_first_alert(tmp_path, rss):
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc already running")
+    monitor, _ = _monitor(tmp_path, trace=False)
+
+    rss.append(1050)
+    assert "top" not in monitor.sample()
+    assert not tracemalloc.is_tracing()
+
+    rss.append(1100)
+    entry = monitor.sample()
+    assert entry["alert"] and "top" not in entry
+    assert tracemalloc.is_tracing()
+
+    kept = [bytearray(1024) for _ in range(64)]
+    entry = monitor.sample()
+    assert entry["traced"] > 0
+    assert entry["top"] and entry["top"][0]["size_diff"] >= 64 * 1024
+    assert entry["counts"] == {"rows": 1}
+    del kept
+
+
+def test_report_keeps_the_latest_lines(tmp_path, rss, monkeypatch):
+    monkeypatch.setattr(memory_monitor, "REPORT_KEEP", 3)
+    monitor, report_path = _monitor(tmp_path, trace=False)
+    for reading in range(1001, 1006):
+        rss.append(reading)
+        monitor.sample()
+
+    assert [entry["rss"] for entry in _report(report_path)] == [1003, 1004, 1005]
+    assert [entry["rss_growth"] for entry in _report(report_path)] == [3, 4, 5]
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import db
+from app.db_stress import _sample_record
+
+
+@pytest.fixture
+def partitioned(tmp_path, monkeypatch):
+    monkeypatch.setenv(db.HISTORY_DB_ENV, str(tmp_path / "history.db"))
+    monkeypatch.setenv(db.HISTORY_PARTITIONS_ENV, "1")
+    monkeypatch.setattr(db, "get_spool_path", lambda: str(tmp_path / "spool.jsonl"))
+    monkeypatch.setattr(db, "_initialized_partitions", set())
+    db.init_history_db()
+
+
+def _fill(monkeypatch, month, stock_numbers):
+    # Writes go to "this month's" partition, so pin this month.
+    original = db.partition_name
+    with monkeypatch.context() as patch:
+        patch.setattr(db, "partition_name", lambda when=None: original(when or month))
+        for index, stock_number in enumerate(stock_numbers):
+            record = _sample_record(0, index)
+            record["stock_number"] = stock_number
+            db.insert_history(record)
+
+
+def test_partition_month_follows_minsk_time():
+    # 21:30 UTC on 31 January is already February in Minsk (UTC+3).
+    late_utc = datetime(2026, 1, 31, 21, 30, tzinfo=timezone.utc)
+    assert db.partition_name(late_utc) == "2026_02"
+    assert db.partition_name(late_utc.replace(tzinfo=None)) == "2026_01"
+    assert db.partition_name(datetime(2026, 2, 1, 0, 30, tzinfo=timezone(timedelta(hours=3)))) == "2026_02"
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("12", ["123/2026", "122/2026", "124/2026", "121/2026", "120/2026"]),
+        ("/20", ["123/2026", "301/2026", "122/2026", "124/2026", "300/2026", "121/2026", "120/2026"]),
+    ],
+)
+def test_search_pages_across_partitions_newest_first(partitioned, monkeypatch, query, expected):
+    _fill(monkeypatch, datetime(2026, 1, 15), ["120/2026", "121/2026", "300/2026"])
+    _fill(monkeypatch, datetime(2026, 3, 15), ["122/2026", "301/2026", "123/2026"])
+    _fill(monkeypatch, datetime(2026, 2, 15), ["124/2026"])
+
+    found, before = [], None
+    while True:
+        page = db.search_history(query, limit=2, before_id=before)
+        found.extend(row[2] for row in page)
+        if len(page) < 2:
+            break
+        before = page[-1][0]
+    assert found == expected
@@ -0,0 +1,45 @@
+import json
+import logging
+
+import pytest
+
+from app import rate_tables
+
+
+def test_machine_file_is_merged_over_the_defaults(tmp_path):
+    path = tmp_path / rate_tables.RATE_TABLES_FILENAME
+    spec = {
+        "width": {"breaks": [[100, "ge"]], "rates": [9, 7]},
+        "length": {"breaks": [], "rates": [None]},
+    }
+    path.write_text(json.dumps({"slitter-2": spec}), encoding="utf-8")
+
+    tables = rate_tables.load_rate_tables(str(path))
+    assert sorted(tables) == [rate_tables.DEFAULT_MACHINE, "slitter-2"]
+    assert tables["slitter-2"].cycles_per_hour(99.9, 500) == 9
+    assert tables["slitter-2"].cycles_per_hour(100, 500) == 7
+    assert tables[rate_tables.DEFAULT_MACHINE].cycles_per_hour(150, 300) == 12
+    assert tables[rate_tables.DEFAULT_MACHINE].cycles_per_hour(150.1, 300.1) == 11
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "{not json",
+        "[1, 2]",
+        json.dumps({"slitter-2": {"width": {"breaks": [], "rates": [1]}}}),
+        json.dumps({"slitter-2": {"width": {"breaks": [[1, "ge"]], "rates": [1]}, "length": {}}}),
+        json.dumps({"slitter-2": "fast"}),
+    ],
+)
+def test_malformed_file_falls_back_to_the_built_in_tables(tmp_path, caplog, content):
+    path = tmp_path / rate_tables.RATE_TABLES_FILENAME
+    path.write_text(content, encoding="utf-8")
+
+    with caplog.at_level(logging.ERROR, logger=rate_tables.__name__):
+        tables = rate_tables.load_rate_tables(str(path))
+    assert sorted(tables) == [rate_tables.DEFAULT_MACHINE]
+    assert str(path) in caplog.text
+
+    with pytest.raises((ValueError, KeyError, TypeError)):
+        rate_tables.load_rate_tables(str(path), strict=True)
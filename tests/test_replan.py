@@ -0,0 +1,101 @@
+import csv
+import logging
+
+import pytest
+
+from app import calculator_logic, db, replan
+
+
+def _record(useful, roll, additional=None):
+    result = calculator_logic.calculate(910, useful, roll, 500, 6000, 40, additional)
+    return {
+        "timestamp": "00:00",
+        "stock_number": f"{useful}/{roll}",
+        "material_code": "M1",
+        "material_width": 910,
+        "useful_width": useful,
+        "big_roll_length": 6000,
+        "roll_width": roll,
+        "roll_length": 500,
+        "main_count": result["main_count"],
+        "additional_width": result["additional_width_mm"] or 0,
+        "total_rolls": result["total_rolls"],
+        "used_length_m": result["used_length_m"],
+        "surplus_rolls": result["surplus_rolls"],
+        "surplus_main_rolls": result["surplus_main_rolls"],
+        "surplus_additional_rolls": result["surplus_additional_rolls"],
+        "total_area": result["total_area_m2"],
+        "useful_area": result["useful_area_m2"],
+        "waste_area": result["waste_area_m2"],
+        "waste_percent": result["waste_percent"],
+        "order_rolls": 40,
+        "machine": None,
+    }
+
+
+@pytest.fixture
+def history_db(tmp_path):
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+    return db_path
+
+
+def _report(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_checkpoint_resumes_only_the_same_run(history_db, tmp_path, caplog):
+    for roll in (150, 170, 190):
+        db.insert_history(_record(900, roll), history_db)
+    report_path = str(tmp_path / "report.csv")
+    rules = {"SETUP_LENGTH_M": 20.0}
+
+    assert replan.replan_history(rules, report_path, db_path=history_db, workers=1) == 3
+    with caplog.at_level(logging.WARNING, logger=replan.__name__):
+        assert replan.replan_history(rules, report_path, db_path=history_db, workers=1) == 0
+    assert "--restart" in caplog.text
+
+    db.insert_history(_record(900, 210), history_db)
+    assert replan.replan_history(rules, report_path, db_path=history_db, workers=1) == 1
+    assert len(_report(report_path)) == 4
+
+    with pytest.raises(ValueError):
+        replan.replan_history({"SETUP_LENGTH_M": 30.0}, report_path, db_path=history_db, workers=1)
+    with pytest.raises(ValueError):
+        replan.replan_history(rules, report_path, db_path=str(tmp_path / "other.db"), workers=1)
+
+    assert replan.replan_history(
+        {"SETUP_LENGTH_M": 30.0}, report_path, db_path=history_db, workers=1, restart=True
+    ) == 4
+    assert len(_report(report_path)) == 4
+
+
+def test_entered_additional_width_is_kept(history_db, tmp_path):
+    # 900 // 200 leaves 100 mm; the operator cut 60 mm of it as the additional roll.
+    db.insert_history(_record(900, 200, additional=60), history_db)
+    db.insert_history(_record(900, 200), history_db)
+    report_path = str(tmp_path / "report.csv")
+
+    replan.replan_history({}, report_path, db_path=history_db, workers=1)
+
+    entered, derived = _report(report_path)
+    assert entered["error"] == derived["error"] == ""
+    assert entered["waste_percent_delta"] == derived["waste_percent_delta"] == "0.0"
+    assert float(entered["waste_percent_old"]) > float(derived["waste_percent_old"])
+
+
+def test_a_new_width_reduction_reaches_table_served_layouts(history_db, tmp_path):
+    # 600 / 61 fits 9; the 3% reduction narrows the rolls to 60 mm for a tenth.
+    db.insert_history(_record(600, 61), history_db)
+    assert calculator_logic.calculate(910, 600, 61, 500, 6000, 40)["main_count"] == 10
+    report_path = str(tmp_path / "report.csv")
+
+    replan.replan_history(
+        {"MAX_ROLL_WIDTH_REDUCTION": 0.0}, report_path, db_path=history_db, workers=1
+    )
+
+    (row,) = _report(report_path)
+    assert row["error"] == ""
+    assert int(row["total_rolls_old"]) == 40
+    assert int(row["total_rolls_new"]) == 50
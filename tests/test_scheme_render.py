@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("PySide6")
+
+from app import calculator_logic, scheme_render  # noqa: E402
+
+RESULT = calculator_logic.calculate(910, 900, 150, 500, 6000, 60)
+
+
+def _render(path):
+    scheme_render.render_scheme(RESULT, str(path))
+    return path.read_bytes()
+
+
+def test_render_does_not_load_the_gui_script(tmp_path):
+    # A frozen build has no importable main module to fall back on.
+    code = (
+        "import sys\n"
+        "from app import calculator_logic, scheme_render\n"
+        "result = calculator_logic.calculate(910, 900, 150, 500, 6000, 60)\n"
+        f"scheme_render.render_scheme(result, {str(tmp_path / 'scheme.png')!r})\n"
+        "print('main' in sys.modules)\n"
+    )
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    completed = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, env=env, check=False
+    )
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == "False"
+    assert (tmp_path / "scheme.png").exists()
+
+
+def test_font_pixel_size_changes_the_drawing(tmp_path, monkeypatch):
+    small = _render(tmp_path / "small.png")
+    monkeypatch.setattr(scheme_render, "FONT_PIXEL_SIZE", 24)
+    large = _render(tmp_path / "large.png")
+    assert small != large
+
+
+def test_font_changes_miss_the_scheme_cache(tmp_path, monkeypatch):
+    key = scheme_render.layout_key(RESULT)
+    cache_dir = str(tmp_path / "cache")
+    small = scheme_render.render_batch([("a", RESULT)], str(tmp_path / "small"), cache_dir=cache_dir)
+
+    monkeypatch.setattr(scheme_render, "FONT_PIXEL_SIZE", 24)
+    assert scheme_render.layout_key(RESULT) != key
+    large = scheme_render.render_batch([("a", RESULT)], str(tmp_path / "large"), cache_dir=cache_dir)
+    larger_key = scheme_render.layout_key(RESULT)
+    monkeypatch.setattr(scheme_render, "FONT_FAMILY", "DejaVu Sans")
+    assert scheme_render.layout_key(RESULT) not in (key, larger_key)
+
+    with open(small[0], "rb") as f, open(large[0], "rb") as g:
+        assert f.read() != g.read()
+    assert len(os.listdir(cache_dir)) == 2
@@ -0,0 +1,73 @@
+import random
+import sqlite3
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "SEARCH_RECENT_WINDOW", 100)
+    db_path = str(tmp_path / "history.db")
+    db.init_history_db(db_path)
+    rnd = random.Random(0)
+    rows = [
+        (f"{rnd.randrange(1000):03d}/{2020 + rnd.randrange(7)}", rnd.choice(["Ma1", "mB2", "XZ", None]))
+        for _ in range(2000)
+    ]
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO history(timestamp, stock_number, material_code) VALUES ('00:00', ?, ?)", rows
+    )
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _expected(db_path, matches):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT id, stock_number, material_code FROM history ORDER BY id DESC").fetchall()
+    conn.close()
+    return [row[0] for row in rows if matches(row[1] or "") or matches(row[2] or "")]
+
+
+def _all_pages(db_path, query, limit=7):
+    ids, before_id = [], None
+    while True:
+        page = db.search_history(query, limit=limit, before_id=before_id, db_path=db_path)
+        ids.extend(row[0] for row in page)
+        if len(page) < limit:
+            return ids
+        before_id = page[-1][0]
+
+
+@pytest.mark.parametrize("query", ["1", "12", "99", "m", "MB", "x", "zz", "%", "_"])
+def test_short_queries_match_prefix_case_insensitively(history_db, query):
+    expected = _expected(history_db, lambda value: value.lower().startswith(query.lower()))
+    assert _all_pages(history_db, query) == expected
+
+
+@pytest.mark.parametrize("query", ["/2021", "23/", "ma1"])
+def test_longer_queries_match_fragments(history_db, query):
+    conn = sqlite3.connect(history_db)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name='history_search'").fetchone() is None:
+        pytest.skip("SQLite without FTS5 trigram")
+    conn.close()
+    expected = _expected(history_db, lambda value: query.lower() in value.lower())
+    assert _all_pages(history_db, query) == expected
+
+
+def test_rare_prefix_is_served_by_the_nocase_indexes(history_db):
+    conn = sqlite3.connect(history_db)
+    for column, index in (
+        ("stock_number", "idx_history_stock_nocase"),
+        ("material_code", "idx_history_material_nocase"),
+    ):
+        plan = conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT id FROM history"
+            f" WHERE {column} >= ? COLLATE NOCASE AND {column} < ? COLLATE NOCASE AND id < ?",
+            ("zz", "z{", 10**9),
+        ).fetchall()
+        assert any(index in step[3] for step in plan), plan
+    conn.close()
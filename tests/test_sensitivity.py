@@ -0,0 +1,66 @@
+import random
+
+from app import calculator_logic
+from app.calculator_logic import _find_discontinuities, _layout_probe, _nearest_change, sensitivity
+
+
+def _linear_nearest_change(value, step, limit, probe):
+    base = probe(value)
+    found = {}
+    for direction, key in ((1, "up"), (-1, "down")):
+        found[key] = None
+        n = 1
+        while n * step <= limit:
+            candidate = round(value + direction * n * step, 1)
+            current = probe(candidate)
+            if current is None:
+                break
+            if current != base:
+                found[key] = (candidate, base, current)
+                break
+            n += 1
+    return found
+
+
+def test_bisection_finds_the_same_changes_as_a_linear_scan():
+    rng = random.Random(7)
+    rate_table = calculator_logic.get_rate_table(None)
+    for _ in range(200):
+        useful = round(rng.uniform(540, 900), 1)
+        roll = round(rng.uniform(20, 310), 1)
+        length = rng.choice((30, 100, 250, 500, 800, 1100))
+        probes = (
+            (useful, 50, lambda value: _layout_probe(value, roll)),
+            (roll, 50, lambda value: _layout_probe(useful, value)),
+            (length, 200, lambda value: rate_table.cycles_per_hour(roll, value)),
+        )
+        for value, limit, probe in probes:
+            assert _nearest_change(value, 0.1, limit, probe) == _linear_nearest_change(
+                value, 0.1, limit, probe
+            )
+
+
+def test_probe_count_is_logarithmic():
+    calls = []
+
+    def probe(value):
+        calls.append(value)
+        return value >= 1150.0
+
+    found = _nearest_change(1000.0, 0.1, 200, probe)
+    assert found["up"][0] == 1150.0
+    assert found["down"] is None
+    assert len(calls) < 60
+
+
+def test_discontinuities_follow_the_additional_width_override():
+    # With a strip width given, calculate never adjusts the roll width.
+    items = _find_discontinuities(880, 150, 500, additional_width_mm=100)
+    assert all(item["kind"] != "adjustment" for item in items)
+    assert any(item["kind"] == "adjustment" for item in _find_discontinuities(880, 150, 500))
+
+
+def test_sensitivity_grid_keeps_the_override():
+    report = sensitivity(910, 880, 150, 500, 6000, 100, 100)
+    assert report["base"]["additional_width_mm"] == 100
+    assert len(report["grid"]) == 49
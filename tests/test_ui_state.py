@@ -0,0 +1,40 @@
+import json
+import os
+
+from app import ui_state
+
+
+def test_flush_writes_once_and_keeps_images_out_of_the_state(tmp_path):
+    path = str(tmp_path / "ui_state.json")
+    changes = []
+    state = ui_state.UiState(path, on_change=lambda: changes.append(1))
+    image = b"\x89PNG" + bytes(range(256)) * 400
+
+    name = state.store_image(image)
+    state.set_value("presets/A", {"inputs": {}, "image": name})
+    state.set_value("jamba/stock_number", "1")
+    state.set_value("jamba/stock_number", "1")
+    assert len(changes) == 2
+    assert not os.path.exists(path)
+
+    assert state.flush()
+    assert os.path.getsize(path) < 200
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["presets/A"]["image"] == name
+
+    reloaded = ui_state.UiState(path)
+    assert reloaded.read_image(reloaded.value("presets/A")["image"]) == image
+    assert reloaded.read_image(None) is None
+    assert reloaded.read_image("missing.png") is None
+
+
+def test_prune_keeps_only_referenced_images(tmp_path):
+    state = ui_state.UiState(str(tmp_path / "ui_state.json"))
+    kept = state.store_image(b"kept")
+    dropped = state.store_image(b"dropped")
+    assert state.store_image(b"kept") == kept
+
+    state.prune_images({kept, None})
+
+    assert state.read_image(kept) == b"kept"
+    assert state.read_image(dropped) is None
@@ -0,0 +1,79 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("PySide6")
+
+from app import updater  # noqa: E402
+
+ETAG = '"v2"'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Set per test: "ok", "not_modified" (always 304) or "slow".
+    mode = "ok"
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        if self.mode == "slow":
+            time.sleep(1.0)
+        if self.mode == "not_modified" or self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = b"2.0\n"
+        self.send_response(200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.mode = "ok"
+    _Handler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/version.txt"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_200_is_cached_and_reported(server, tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    assert updater.fetch_latest_version(server, cache_path) == "2.0"
+    assert updater.check_update(server, cache_path, attempts=1) is True
+    assert _Handler.requests_seen[0].get("If-None-Match") is None
+
+
+def test_304_reuses_cached_version(server, tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    updater.fetch_latest_version(server, cache_path)
+    assert updater.fetch_latest_version(server, cache_path) == "2.0"
+    assert _Handler.requests_seen[-1].get("If-None-Match") == ETAG
+
+
+def test_304_without_cache_is_not_an_update(server, tmp_path):
+    _Handler.mode = "not_modified"
+    cache_path = str(tmp_path / "cache.json")
+    assert updater.fetch_latest_version(server, cache_path) is None
+    assert updater.check_update(server, cache_path, attempts=1) is False
+
+
+def test_timeout_is_retried_then_reported_as_no_update(server, tmp_path, monkeypatch):
+    _Handler.mode = "slow"
+    monkeypatch.setattr(updater, "READ_TIMEOUT_S", 0.2)
+    sleeps = []
+    assert updater.check_update(
+        server, str(tmp_path / "cache.json"), attempts=2, sleep=sleeps.append
+    ) is False
+    assert sleeps == [updater.BACKOFF_BASE_S]